@@ -1,7 +1,48 @@
 # admin.py - ЗАМЕНИ НА ЭТО
 from django.contrib import admin
 from django.utils.html import format_html
+from .admin_tools import PerformanceAdminMixin, RangeListFilter
+from .manufacturers import brand_stats
 from .models import *
+from .search import search
+
+
+class FullTextSearchMixin:
+    """
+    Поиск в списке объектов через полнотекстовый индекс (cars.search)
+    вместо LIKE '%...%' по каждому полю из search_fields
+    """
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return super().get_search_results(request, queryset, search_term)
+        return search(queryset, search_term), False
+
+
+class PriceRangeFilter(RangeListFilter):
+    title = "Цена"
+    parameter_name = 'price_range'
+    field_name = 'price'
+    ranges = (
+        ("до $20 000", None, 20000),
+        ("$20 000 - $50 000", 20000, 50000),
+        ("$50 000 - $100 000", 50000, 100000),
+        ("$100 000 - $250 000", 100000, 250000),
+        ("от $250 000", 250000, None),
+    )
+
+
+class YearRangeFilter(RangeListFilter):
+    title = "Год выпуска"
+    parameter_name = 'year_range'
+    field_name = 'year'
+    ranges = (
+        ("до 1990", None, 1990),
+        ("1990-е", 1990, 2000),
+        ("2000-е", 2000, 2010),
+        ("2010-е", 2010, 2020),
+        ("2020-е", 2020, None),
+    )
 
 
 @admin.register(Category)
@@ -11,29 +52,29 @@ class AdminCategory(admin.ModelAdmin):
     list_filter = ["created", "updated"]
     search_fields = ["title", "description"]
     prepopulated_fields = {'slug': ('title',)}
-    readonly_fields = ['created', 'updated']
-
-    # ДОБАВЬ ЭТОТ МЕТОД:
-    def cars_count(self, obj):
-        return obj.cars_set.count()
-
-    cars_count.short_description = "Количество машин"
+    readonly_fields = ['cars_count', 'created', 'updated']
+    list_select_related = ['parent']
 
 
 @admin.register(Cars)
-class AdminCars(admin.ModelAdmin):
+class AdminCars(PerformanceAdminMixin, FullTextSearchMixin, admin.ModelAdmin):
     list_display = ["name", "year", "price", "horsepower", "category_link", "is_active", "created"]
     list_display_links = ["name"]
-    list_filter = ["year", "price", "is_active", "created", "cat"]
+    list_filter = [YearRangeFilter, PriceRangeFilter, "is_active", "created", "cat", "manufacturer"]
+    list_select_related = ['cat']
+    # Курсор по индексу created
+    keyset_ordering = ('-created', '-id')
     search_fields = ["name", "description"]
     prepopulated_fields = {'slug': ('name',)}
-    readonly_fields = ['views', 'created', 'updated', 'image_preview']
-    filter_horizontal = ['likes']  # Для удобного выбора лайков
+    readonly_fields = ['views', 'likes_count', 'photos_count', 'comments_count',
+                       'created', 'updated', 'image_preview']
+    # Выбор через поиск вместо выпадающих списков со всеми строками таблицы
+    autocomplete_fields = ['cat', 'manufacturer', 'author', 'likes']
 
     # ДОБАВЬ ЭТИ ПОЛЯ В fieldsets для красивого отображения:
     fieldsets = (
         ('Основная информация', {
-            'fields': ('name', 'slug', 'description', 'cat', 'author', 'is_active')
+            'fields': ('name', 'slug', 'description', 'cat', 'manufacturer', 'author', 'is_active')
         }),
         ('Технические характеристики', {
             'fields': ('year', 'price', 'engine_volume', 'horsepower',
@@ -43,7 +84,8 @@ class AdminCars(admin.ModelAdmin):
             'fields': ('image', 'image_preview')
         }),
         ('Статистика', {
-            'fields': ('views', 'likes', 'created', 'updated')
+            'fields': ('views', 'likes', 'likes_count', 'photos_count', 'comments_count',
+                       'created', 'updated')
         }),
     )
 
@@ -51,7 +93,7 @@ class AdminCars(admin.ModelAdmin):
     def category_link(self, obj):
         if obj.cat:
             return format_html('<a href="/admin/cars/category/{}/change/">{}</a>',
-                               obj.cat.id, obj.cat.title)
+                               obj.cat_id, obj.cat.title)
         return "-"
 
     category_link.short_description = "Категория"
@@ -72,13 +114,18 @@ class AdminManufacturer(admin.ModelAdmin):
     prepopulated_fields = {'slug': ('name',)}
 
     def cars_count(self, obj):
-        return Cars.objects.filter(name__icontains=obj.name).count()
+        # Сводка по всем брендам - один GROUP BY на страницу, а не запрос на строку
+        return brand_stats().get(obj.pk, {}).get('cars', 0)
+
+    cars_count.short_description = "Машин"
 
 
 @admin.register(CarPhoto)
-class AdminCarPhoto(admin.ModelAdmin):
+class AdminCarPhoto(PerformanceAdminMixin, admin.ModelAdmin):
     list_display = ["car", "title", "is_main", "image_preview", "created"]
     list_filter = ["is_main", "created"]
+    list_select_related = ['car']
+    autocomplete_fields = ['car']
 
     def image_preview(self, obj):
         if obj.image:
@@ -87,20 +134,24 @@ class AdminCarPhoto(admin.ModelAdmin):
 
 
 @admin.register(Article)
-class AdminArticle(admin.ModelAdmin):
-    list_display = ["title", "author", "views", "is_published", "created"]
-    list_filter = ["is_published", "created", "author"]
+class AdminArticle(PerformanceAdminMixin, FullTextSearchMixin, admin.ModelAdmin):
+    list_display = ["title", "author", "views", "comments_count", "is_published", "created"]
+    list_filter = ["is_published", "created"]
     search_fields = ["title", "content"]
     prepopulated_fields = {'slug': ('title',)}
-    filter_horizontal = ['cars']
-    readonly_fields = ['views', 'created', 'updated']
+    list_select_related = ['author']
+    autocomplete_fields = ['author', 'cars']
+    readonly_fields = ['views', 'comments_count', 'created', 'updated']
 
 
 @admin.register(Comment)
-class AdminComment(admin.ModelAdmin):
+class AdminComment(PerformanceAdminMixin, admin.ModelAdmin):
     list_display = ["user", "short_content", "car", "article", "is_active", "created"]
-    list_filter = ["is_active", "created", "user"]
+    # Автора ищут поиском по имени: фильтр по user выводил бы всех пользователей
+    list_filter = ["is_active", "created"]
     search_fields = ["content", "user__username"]
+    list_select_related = ['user', 'car', 'article']
+    autocomplete_fields = ['user', 'car', 'article', 'parent']
 
     def short_content(self, obj):
         return obj.content[:50] + "..." if len(obj.content) > 50 else obj.content
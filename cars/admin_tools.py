@@ -0,0 +1,137 @@
+"""
+Режим производительности админки для больших таблиц.
+
+PerformanceAdminMixin подмешивается к ModelAdmin и меняет три вещи:
+
+- число строк: вместо COUNT(*) по отфильтрованному списку берётся оценка
+  планировщика PostgreSQL (pg_class.reltuples для всей таблицы, EXPLAIN
+  для отфильтрованной), если она не меньше ADMIN_LARGE_TABLE_ROWS;
+  второй COUNT(*) без фильтров («всего N») не выполняется совсем;
+- страницы: когда в списке не меньше ADMIN_LARGE_TABLE_ROWS строк и
+  пользователь не выбрал сортировку по колонке, страницы листаются
+  курсором по keyset_ordering (cars/pagination.py), а не OFFSET;
+- фильтры по числовым полям - RangeListFilter с фиксированными
+  диапазонами вместо SELECT DISTINCT по всей колонке.
+
+Связанные объекты в списке подтягиваются list_select_related, а поля
+ForeignKey/ManyToMany в формах - autocomplete_fields (задаются в cars/admin.py).
+"""
+import json
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+from .pagination import InvalidCursor, KeysetPaginator
+from .stats import table_estimate
+
+CURSOR_VAR = 'cursor'
+
+
+def estimate_count(queryset):
+    """Оценка числа строк queryset планировщиком PostgreSQL или None"""
+    if connections[queryset.db].vendor != 'postgresql':
+        return None
+    if not queryset.query.has_filters():
+        return table_estimate(queryset.model)
+    plan = json.loads(queryset.explain(format='json'))
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator, который для больших списков берёт оценку вместо COUNT(*)"""
+    estimated = False
+
+    @cached_property
+    def count(self):
+        estimate = estimate_count(self.object_list)
+        if estimate is not None and estimate >= settings.ADMIN_LARGE_TABLE_ROWS:
+            self.estimated = True
+            return estimate
+        return super().count
+
+
+class KeysetChangeList(ChangeList):
+    """
+    Список объектов, который на больших таблицах листается курсором.
+    cl.keyset_page - страница KeysetPage в этом режиме, иначе None
+    (тогда работает обычная нумерация страниц).
+    """
+
+    def __init__(self, request, *args, **kwargs):
+        self.cursor = request.GET.get(CURSOR_VAR)
+        self.keyset_page = None
+        super().__init__(request, *args, **kwargs)
+        # Ссылки сортировки и фильтров начинают список с первой страницы
+        self.params.pop(CURSOR_VAR, None)
+        self.filter_params.pop(CURSOR_VAR, None)
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def get_results(self, request):
+        super().get_results(request)
+        if (self.params.get(ORDER_VAR) or (self.show_all and self.can_show_all)
+                or self.result_count < settings.ADMIN_LARGE_TABLE_ROWS):
+            return
+        paginator = KeysetPaginator(self.queryset, self.list_per_page,
+                                    ordering=self.model_admin.keyset_ordering)
+        try:
+            self.keyset_page = paginator.get_page(self.cursor)
+        except InvalidCursor:
+            raise IncorrectLookupParameters
+        self.result_list = self.keyset_page.object_list
+        self.multi_page = self.keyset_page.has_other_pages()
+        self.can_show_all = False
+
+    def next_page_url(self):
+        return self.get_query_string({CURSOR_VAR: self.keyset_page.next_cursor})
+
+    def first_page_url(self):
+        return self.get_query_string(remove=[CURSOR_VAR])
+
+
+class PerformanceAdminMixin:
+    """
+    Подмешивается первым. keyset_ordering - поля курсорной сортировки,
+    последнее уникальное; нужен индекс, который её покрывает.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    keyset_ordering = ('-id',)
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+
+class RangeListFilter(admin.SimpleListFilter):
+    """
+    Фильтр по диапазонам числового поля: варианты заданы заранее, поэтому
+    боковая панель не делает SELECT DISTINCT по колонке.
+    ranges - кортежи (подпись, нижняя граница включительно, верхняя не включительно),
+    None - граница не задана.
+    """
+    field_name = None
+    ranges = ()
+
+    @staticmethod
+    def range_value(low, high):
+        return f"{'' if low is None else low}-{'' if high is None else high}"
+
+    def lookups(self, request, model_admin):
+        return [(self.range_value(low, high), label) for label, low, high in self.ranges]
+
+    def queryset(self, request, queryset):
+        for _, low, high in self.ranges:
+            if self.value() == self.range_value(low, high):
+                if low is not None:
+                    queryset = queryset.filter(**{f'{self.field_name}__gte': low})
+                if high is not None:
+                    queryset = queryset.filter(**{f'{self.field_name}__lt': high})
+        return queryset
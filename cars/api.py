@@ -0,0 +1,338 @@
+"""
+JSON API каталога только для чтения (/api/v1/).
+
+Ответы собираются из .values_list() - без создания объектов моделей:
+поле API задаётся путём ORM, поэтому JOIN (аналог select_related) попадает
+в запрос, только если клиент запросил поле связанной таблицы (?fields=).
+Списки фото, видео и машин статьи догружаются вторым запросом на всю
+страницу (аналог prefetch_related) и тоже только по запросу.
+
+Списки листаются курсором по индексированным колонкам (cars/pagination.py).
+ETag считается по версиям моделей из кеша страниц (cars/page_cache.py) и
+адресу запроса, поэтому проверка If-None-Match не трогает БД; готовое тело
+ответа кешируется под той же версией. Счётчики лайков и комментариев сами
+сдвигают версию модели (cars/counters.py), а просмотры - отдельную версию,
+которая входит в ключ, только если поле views есть в ответе. Ответы
+сжимаются gzip.
+"""
+import hashlib
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.decorators import method_decorator
+from django.utils.http import quote_etag
+from django.views import View
+from django.views.decorators.gzip import gzip_page
+
+from . import db_router, page_cache
+from .models import Article, CarPhoto, CarVideo, Cars, Category, Manufacturer
+from .pagination import InvalidCursor, KeysetPaginator
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+class ApiError(Exception):
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def image_url(name):
+    return default_storage.url(name) if name else None
+
+
+class Resource:
+    """
+    Описание ресурса API. fields - поле API -> путь ORM для values_list();
+    related - поле API -> функция, которая по списку id возвращает
+    {id: [значения]} одним запросом.
+    """
+    model = None
+    fields = {}
+    image_fields = ()
+    related = {}
+    list_fields = ()
+    ordering = ('-created', '-id')
+    lookup = 'slug'
+    cache_models = ()
+
+    def get_queryset(self, request):
+        return self.model._base_manager.all()
+
+    def filter_list(self, queryset, request):
+        return queryset
+
+    def requested_fields(self, request, default):
+        """Поля из ?fields= как есть, без проверки"""
+        raw = request.GET.get('fields')
+        if not raw:
+            return list(default)
+        return [name.strip() for name in raw.split(',') if name.strip()]
+
+    def parse_fields(self, request, default):
+        names = self.requested_fields(request, default)
+        unknown = [name for name in names if name not in self.fields and name not in self.related]
+        if unknown:
+            raise ApiError(f"Неизвестные поля: {', '.join(unknown)}")
+        return list(dict.fromkeys(names))
+
+    def columns(self, names):
+        """
+        (колонки для values_list, служебные колонки): id нужен для догрузки
+        связанных списков, поля сортировки - для курсора; в ответ они
+        попадают, только если их запросили
+        """
+        columns = [name for name in names if name in self.fields]
+        if 'id' not in columns and any(name in self.related for name in names):
+            columns.append('id')
+        for name in self.ordering:
+            if name.lstrip('-') not in columns:
+                columns.append(name.lstrip('-'))
+        return columns, [name for name in columns if name not in names]
+
+    def serialize(self, queryset, names):
+        """Словари с полями API: одна выборка values_list и по запросу на связанный список"""
+        columns, _ = self.columns(names)
+        paths = [self.fields.get(name, name) for name in columns]
+        images = [name for name in columns if name in self.image_fields]
+
+        rows = []
+        for values in queryset.values_list(*paths):
+            row = dict(zip(columns, values))
+            for name in images:
+                row[name] = image_url(row[name])
+            rows.append(row)
+
+        ids = [row['id'] for row in rows] if 'id' in columns else []
+        for name in names:
+            if name in self.related:
+                related = self.related[name](ids)
+                for row, pk in zip(rows, ids):
+                    row[name] = related.get(pk, [])
+        return rows
+
+    def strip(self, rows, names):
+        """Убирает служебные колонки после того, как по ним построен курсор"""
+        _, hidden = self.columns(names)
+        for row in rows:
+            for name in hidden:
+                del row[name]
+        return rows
+
+
+def grouped(queryset, key, *columns, images=()):
+    """{внешний ключ: [словарь колонок]} одним запросом"""
+    result = defaultdict(list)
+    for values in queryset.values_list(key, *columns):
+        item = dict(zip(columns, values[1:]))
+        for name in images:
+            item[name] = image_url(item[name])
+        result[values[0]].append(item)
+    return result
+
+
+def car_photos(ids):
+    return grouped(CarPhoto.objects.filter(car_id__in=ids), 'car_id', 'image', 'title', 'is_main',
+                   images=('image',))
+
+
+def car_videos(ids):
+    return grouped(CarVideo.objects.filter(car_id__in=ids).order_by('pk'), 'car_id',
+                   'title', 'youtube_url', 'duration', 'views')
+
+
+def article_cars(ids):
+    links = (Article.cars.through.objects.filter(article_id__in=ids, cars__is_active=True)
+             .order_by('pk').values_list('article_id', 'cars__slug'))
+    result = defaultdict(list)
+    for article_id, slug in links:
+        result[article_id].append(slug)
+    return result
+
+
+class CarsResource(Resource):
+    model = Cars
+    fields = {
+        'id': 'id',
+        'name': 'name',
+        'slug': 'slug',
+        'description': 'description',
+        'price': 'price',
+        'year': 'year',
+        'horsepower': 'horsepower',
+        'engine_volume': 'engine_volume',
+        'acceleration_0_100': 'acceleration_0_100',
+        'top_speed': 'top_speed',
+        'image': 'image',
+        'category': 'cat__slug',
+        'category_title': 'cat__title',
+        'manufacturer': 'manufacturer__slug',
+        'likes': 'likes_count',
+        'photos_count': 'photos_count',
+        'comments_count': 'comments_count',
+        'views': 'views',
+        'created': 'created',
+        'updated': 'updated',
+    }
+    image_fields = ('image',)
+    related = {'photos': car_photos, 'videos': car_videos}
+    list_fields = ('id', 'name', 'slug', 'price', 'year', 'horsepower', 'image', 'category', 'likes')
+    cache_models = (Cars, Category, CarPhoto, CarVideo, Manufacturer)
+
+    def get_queryset(self, request):
+        return Cars.objects.filter(is_active=True)
+
+    def filter_list(self, queryset, request):
+        slug = request.GET.get('category')
+        if slug:
+            category = Category.objects.filter(slug=slug).only('pk', 'path').first()
+            if category is None:
+                raise ApiError("Категория не найдена", status=404)
+            if request.GET.get('subcategories') == '1':
+                queryset = queryset.filter(cat__path__startswith=category.path)
+            else:
+                queryset = queryset.filter(cat=category)
+        manufacturer = request.GET.get('manufacturer')
+        if manufacturer:
+            queryset = queryset.filter(manufacturer__slug=manufacturer)
+        return queryset
+
+
+class CategoryResource(Resource):
+    model = Category
+    fields = {
+        'id': 'id',
+        'title': 'title',
+        'slug': 'slug',
+        'description': 'description',
+        'image': 'image',
+        'parent': 'parent__slug',
+        'depth': 'depth',
+        'cars_count': 'cars_count',
+        'created': 'created',
+        'updated': 'updated',
+    }
+    image_fields = ('image',)
+    list_fields = ('id', 'title', 'slug', 'parent', 'depth', 'cars_count', 'image')
+    # Порядок обхода дерева: родитель, затем его потомки
+    ordering = ('path', 'id')
+    cache_models = (Category,)
+
+    def filter_list(self, queryset, request):
+        parent = request.GET.get('parent')
+        if parent:
+            queryset = queryset.filter(parent__slug=parent)
+        return queryset
+
+
+class ArticleResource(Resource):
+    model = Article
+    fields = {
+        'id': 'id',
+        'title': 'title',
+        'slug': 'slug',
+        'excerpt': 'excerpt',
+        'content': 'content',
+        'image': 'image',
+        'author': 'author__username',
+        'views': 'views',
+        'comments_count': 'comments_count',
+        'created': 'created',
+        'updated': 'updated',
+    }
+    image_fields = ('image',)
+    related = {'cars': article_cars}
+    list_fields = ('id', 'title', 'slug', 'excerpt', 'image', 'created')
+    cache_models = (Article, Cars)
+
+    def get_queryset(self, request):
+        return Article.objects.filter(is_published=True)
+
+
+@method_decorator(gzip_page, name='dispatch')
+class ResourceView(View):
+    """Список (detail=False) или один объект ресурса по слагу"""
+    http_method_names = ['get', 'head']
+    resource = None
+    detail = False
+
+    def default_fields(self):
+        resource = self.resource
+        return [*resource.fields, *resource.related] if self.detail else resource.list_fields
+
+    def get_version(self, request):
+        keys = [page_cache.version_key(model) for model in self.resource.cache_models]
+        if 'views' in self.resource.requested_fields(request, self.default_fields()):
+            keys.append(page_cache.views_key(self.resource.model))
+        return page_cache.get_key_versions(*keys)
+
+    def get(self, request, *args, **kwargs):
+        version = self.get_version(request)
+        etag = self.make_etag(request, version)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            key = page_cache.page_key(request, version)
+            content = cache.get(key)
+            if content is None:
+                try:
+                    payload = self.get_payload(request, kwargs.get('slug'))
+                except ApiError as error:
+                    return JsonResponse({'error': str(error)}, status=error.status,
+                                        json_dumps_params={'ensure_ascii': False})
+                content = JsonResponse(payload, encoder=DjangoJSONEncoder,
+                                       json_dumps_params={'ensure_ascii': False}).content
+                # Как и для страниц: ответ, собранный с отстающей реплики, не кешируем
+                if not (db_router.using_replica()
+                        and page_cache.recently_written(settings.REPLICA_PIN_SECONDS)):
+                    cache.set(key, content, settings.PAGE_CACHE_TIMEOUT)
+            response = HttpResponse(content, content_type='application/json')
+        response['ETag'] = etag
+        patch_cache_control(response, public=True, max_age=0, must_revalidate=True)
+        return response
+
+    @staticmethod
+    def make_etag(request, version):
+        raw = f"{settings.RELEASE_VERSION}:{version}:{request.get_full_path()}"
+        return 'W/' + quote_etag(hashlib.md5(raw.encode()).hexdigest())
+
+    def get_payload(self, request, slug):
+        resource = self.resource
+        queryset = resource.get_queryset(request)
+        if self.detail:
+            names = resource.parse_fields(request, self.default_fields())
+            rows = resource.serialize(queryset.filter(**{resource.lookup: slug})[:1], names)
+            if not rows:
+                raise ApiError("Не найдено", status=404)
+            return resource.strip(rows, names)[0]
+
+        names = resource.parse_fields(request, self.default_fields())
+        try:
+            limit = min(max(int(request.GET.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+        except ValueError:
+            raise ApiError("limit должен быть числом")
+        paginator = KeysetPaginator(resource.filter_list(queryset, request), limit,
+                                    ordering=resource.ordering)
+        try:
+            page = paginator.get_page(request.GET.get('cursor'),
+                                      load=lambda rows: resource.serialize(rows, names))
+        except InvalidCursor:
+            raise ApiError("Некорректный курсор")
+        return {
+            'results': resource.strip(page.object_list, names),
+            'next': self.next_url(request, page.next_cursor),
+        }
+
+    @staticmethod
+    def next_url(request, cursor):
+        if cursor is None:
+            return None
+        query = request.GET.copy()
+        query['cursor'] = cursor
+        return request.build_absolute_uri(f"{request.path}?{query.urlencode()}")
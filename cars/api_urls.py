@@ -0,0 +1,20 @@
+from django.urls import path
+
+from .api import ArticleResource, CarsResource, CategoryResource, ResourceView
+
+app_name = 'api'
+
+cars = CarsResource()
+categories = CategoryResource()
+articles = ArticleResource()
+
+urlpatterns = [
+    path("categories/", ResourceView.as_view(resource=categories), name='category_list'),
+    path("categories/<slug:slug>/", ResourceView.as_view(resource=categories, detail=True),
+         name='category_detail'),
+    path("cars/", ResourceView.as_view(resource=cars), name='car_list'),
+    path("cars/<slug:slug>/", ResourceView.as_view(resource=cars, detail=True), name='car_detail'),
+    path("articles/", ResourceView.as_view(resource=articles), name='article_list'),
+    path("articles/<slug:slug>/", ResourceView.as_view(resource=articles, detail=True),
+         name='article_detail'),
+]
@@ -1,5 +1,24 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
+
+
+def restore_search_triggers(using, **kwargs):
+    from django.db import connections
+
+    from .search import restore_triggers
+    restore_triggers(connections[using])
 
 
 class CarsConfig(AppConfig):
     name = 'cars'
+
+    def ready(self):
+        # Регистрируем обработчики сигналов приложения
+        from . import signals  # noqa: F401
+        # Миграции SQLite, пересоздающие таблицы, удаляют триггеры поиска
+        post_migrate.connect(restore_search_triggers, sender=self)
+        # Учёт запросов track_queries: обёртка ставится на каждое новое
+        # соединение, в том числе открытое в потоке sync_to_async
+        from .query_budget import install_collector
+        connection_created.connect(install_collector)
@@ -0,0 +1,137 @@
+"""
+Асинхронные версии страниц каталога для запуска под ASGI (config/asgi.py).
+
+Логика и контекст те же, что в cars.views, но запросы к БД идут через
+асинхронный ORM (aget, afirst, aexists, async for), а независимые
+запросы страницы запускаются вместе через asyncio.gather. Django пока
+выполняет асинхронные запросы ORM в одном потоке на соединение, так что
+сами запросы идут по очереди, но поток сервера не занят ожиданием БД.
+Шаблон рендерится обработчиком Django в потоке (sync_to_async).
+
+Включаются настройкой ASYNC_VIEWS (см. cars/urls.py).
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.db.models import prefetch_related_objects
+from django.http import Http404
+
+from . import likes, views
+from .models import Category, Cars
+from .pagination import InvalidCursor, KeysetPaginator
+from .similar import asimilar_cars
+from .stats import aget_stats
+from .view_counter import record_view
+
+
+async def alist(queryset):
+    return [obj async for obj in queryset]
+
+
+class Template(views.Template):
+    '''Главная страница'''
+
+    async def get(self, request, *args, **kwargs):
+        return self.render_to_response(self.get_context_data(**kwargs))
+
+
+class CategoryList(views.CategoryList):
+    '''Список категорий'''
+
+    async def get(self, request, *args, **kwargs):
+        categories, stats = await asyncio.gather(alist(self.get_queryset()), aget_stats())
+        self.object_list = categories
+        return self.render_to_response({
+            'view': self,
+            'object_list': categories,
+            'category': categories,
+            'total_cars': stats.cars,
+            'cache_version': self.get_cache_version(),
+            'cache_timeout': self.get_cache_timeout(),
+        })
+
+
+class CarsList(views.CarsList):
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            self.category = await Category.objects.aget(slug=self.kwargs.get('cat_slug'))
+        except Category.DoesNotExist:
+            raise Http404("Категория не найдена")
+        if self.include_subcategories():
+            queryset = self.category.subtree_cars()
+        else:
+            queryset = Cars.objects.filter(cat=self.category)
+        paginator = KeysetPaginator(queryset, self.paginate_by, ordering=self.ordering)
+        user = await request.auser()
+
+        try:
+            page, ancestors, has_subcategories = await asyncio.gather(
+                paginator.aget_page(request.GET.get('cursor')),
+                alist(self.category.get_ancestors()),
+                self.category.children.aexists(),
+            )
+        except InvalidCursor:
+            raise Http404("Некорректный курсор страницы")
+        self.object_list = page.object_list
+
+        return self.render_to_response({
+            'view': self,
+            'paginator': paginator,
+            'page_obj': page,
+            'is_paginated': page.has_other_pages(),
+            'object_list': page.object_list,
+            'cars': page.object_list,
+            'category': self.category,
+            'liked_ids': await likes.aliked_car_ids(user, page.object_list),
+            'category_ancestors': ancestors,
+            'has_subcategories': has_subcategories,
+            'include_subcategories': self.include_subcategories(),
+            'cache_version': self.get_cache_version(),
+            'cache_timeout': self.get_cache_timeout(),
+        })
+
+
+class CarDetail(views.CarDetail):
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            car = await self.get_queryset().aget(slug=self.kwargs.get(self.slug_url_kwarg))
+        except Cars.DoesNotExist:
+            raise Http404("Автомобиль не найден")
+        self.object = car
+        user = await request.auser()
+
+        ancestors, liked_ids, related_cars, comments, _ = await asyncio.gather(
+            alist(car.cat.get_ancestors()),
+            likes.aliked_car_ids(user, [car]),
+            asimilar_cars(car),
+            sync_to_async(self.get_comments)(),
+            # Галерея в шаблоне читается из уже загруженного списка
+            sync_to_async(prefetch_related_objects)([car], 'photos'),
+        )
+        car.views += await sync_to_async(record_view)(car)
+
+        return self.render_to_response({
+            'view': self,
+            'object': car,
+            'car': car,
+            'category_ancestors': ancestors,
+            'is_liked': bool(liked_ids),
+            'related_cars': related_cars,
+            'comments': comments,
+        })
+
+
+class AboutView(views.AboutView):
+
+    async def get(self, request, *args, **kwargs):
+        stats = await aget_stats()
+        return self.render_to_response({
+            'view': self,
+            'total_cars': stats.cars,
+            'total_categories': stats.categories,
+            'total_articles': stats.articles,
+            'cache_version': self.get_cache_version(),
+            'cache_timeout': self.get_cache_timeout(),
+        })
@@ -0,0 +1,277 @@
+"""
+Потоковый импорт и экспорт каталога машин в CSV и JSON Lines.
+
+Экспорт читает таблицу курсором (.iterator(chunk_size=...)) и отдаёт
+строки генератором, поэтому память не растёт с размером каталога.
+Импорт идёт пачками фиксированного размера: на пачку - один запрос
+за существующими слагами, bulk_update для найденных машин и bulk_create
+для новых, всё в одной транзакции. Категории сопоставляются по слагу
+из словаря, загруженного один раз. Ошибочные строки (в том числе битый
+JSON) пропускаются и попадают в отчёт с номером строки файла.
+
+bulk_create/bulk_update не вызывают сигналы, поэтому после импорта
+счётчики категорий, статистика сайта и версии кеша страниц
+пересчитываются одним проходом (finish_import).
+"""
+import csv
+import json
+from dataclasses import dataclass, field
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.validators import MaxLengthValidator, validate_slug
+from django.db import transaction
+from django.db.models import FileField
+from django.utils import timezone
+
+from . import counters, page_cache, stats
+from .facets import facet_index
+from .models import Cars, Category
+from .slugs import SlugAllocator
+
+# Колонка файла -> поле в .values(); категория выгружается слагом
+EXPORT_FIELDS = {
+    'name': 'name',
+    'slug': 'slug',
+    'category': 'cat__slug',
+    'description': 'description',
+    'price': 'price',
+    'year': 'year',
+    'horsepower': 'horsepower',
+    'engine_volume': 'engine_volume',
+    'acceleration_0_100': 'acceleration_0_100',
+    'top_speed': 'top_speed',
+    'is_active': 'is_active',
+    'image': 'image',
+}
+
+# Поля модели, которые импорт может менять
+IMPORT_FIELDS = [
+    'name', 'description', 'price', 'year', 'horsepower', 'engine_volume',
+    'acceleration_0_100', 'top_speed', 'is_active', 'image',
+]
+
+FORMATS = ('csv', 'jsonl')
+
+
+def detect_format(path, default='csv'):
+    if path and path.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    if path and path.endswith('.csv'):
+        return 'csv'
+    return default
+
+
+# Экспорт
+
+def export_rows(chunk_size=2000):
+    """Словари строк каталога в порядке первичного ключа"""
+    rows = (Cars._base_manager
+            .order_by('pk')
+            .values_list(*EXPORT_FIELDS.values())
+            .iterator(chunk_size=chunk_size))
+    columns = list(EXPORT_FIELDS)
+    for row in rows:
+        yield dict(zip(columns, row))
+
+
+class _Echo:
+    """Псевдофайл для csv.writer: write() возвращает строку, а не пишет её"""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.DictWriter(_Echo(), fieldnames=list(EXPORT_FIELDS))
+    yield writer.writeheader()
+    for row in rows:
+        yield writer.writerow({key: '' if value is None else value for key, value in row.items()})
+
+
+def jsonl_lines(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False, default=str) + '\n'
+
+
+def serialize(rows, fmt):
+    """Генератор строк файла выбранного формата"""
+    if fmt == 'jsonl':
+        return jsonl_lines(rows)
+    return csv_lines(rows)
+
+
+# Импорт
+
+def read_rows(stream, fmt):
+    """
+    Пары (номер строки файла, словарь строки) из текстового потока; читает
+    файл построчно. Вместо строки JSON, которую не удалось разобрать,
+    отдаётся ValidationError - импорт запишет её в ошибки и пойдёт дальше.
+    """
+    if fmt == 'jsonl':
+        for number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield number, json.loads(line)
+            except ValueError as error:
+                yield number, ValidationError(f"некорректный JSON: {error}")
+    else:
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+
+
+@dataclass
+class ImportResult:
+    created: int = 0
+    updated: int = 0
+    skipped: int = 0
+    errors: list = field(default_factory=list)
+
+    # Первые ошибки для вывода; остальные только считаются
+    MAX_ERRORS = 20
+
+    def error(self, line, message):
+        self.skipped += 1
+        if len(self.errors) < self.MAX_ERRORS:
+            self.errors.append(f"строка {line}: {message}")
+
+
+def _value(raw, name):
+    """
+    Значение колонки: строка без пробелов по краям, bool или None. Числа из
+    JSON приводятся к строке (их разберёт to_python поля), списки и объекты
+    отклоняются.
+    """
+    value = raw.get(name)
+    if value is None or isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return str(value)
+    if not isinstance(value, str):
+        raise ValidationError(f"поле «{name}»: ожидалось простое значение")
+    return value.strip()
+
+
+def _parse(raw, categories):
+    """
+    Значения полей модели из строки файла; ValidationError при ошибке.
+    Кроме разбора значения проходят валидаторы полей (длина, диапазон,
+    число цифр), чтобы строку, которую не примет БД, отбросить здесь,
+    а не уронить bulk_create всей пачки.
+    """
+    if isinstance(raw, ValidationError):
+        raise raw
+    if not isinstance(raw, dict):
+        raise ValidationError("строка должна быть объектом JSON")
+    cat_slug = _value(raw, 'category') or ''
+    if cat_slug not in categories:
+        raise ValidationError(f"неизвестная категория «{cat_slug}»")
+    slug = _value(raw, 'slug') or ''
+    if slug:
+        validate_slug(slug)
+        Cars._meta.get_field('slug').run_validators(slug)
+    values = {'cat_id': categories[cat_slug]}
+    for name in IMPORT_FIELDS:
+        model_field = Cars._meta.get_field(name)
+        value = _value(raw, name)
+        if value in (None, ''):
+            if name == 'is_active':
+                value = True
+            elif not model_field.null:
+                value = ''
+            else:
+                value = None
+        if value is not None:
+            try:
+                value = model_field.to_python(value)
+                model_field.run_validators(value)
+                # У FileField нет валидатора длины, а колонка - varchar
+                if isinstance(model_field, FileField):
+                    MaxLengthValidator(model_field.max_length)(value)
+            except ValidationError as error:
+                raise ValidationError(f"поле «{name}»: {'; '.join(error.messages)}")
+        values[name] = value
+    if not values['name']:
+        raise ValidationError("пустое название")
+    return slug, values
+
+
+def _import_batch(batch, categories, allocator, result):
+    parsed = []
+    for line, raw in batch:
+        try:
+            parsed.append(_parse(raw, categories))
+        except (ValidationError, ValueError, TypeError) as error:
+            message = '; '.join(error.messages) if isinstance(error, ValidationError) else str(error)
+            result.error(line, message)
+
+    given = {slug for slug, _ in parsed if slug}
+    allocator.reserve(given)
+    existing = {car.slug: car for car in Cars._base_manager.filter(slug__in=given).order_by('pk')}
+
+    now = timezone.now()
+    to_update, to_create, unnamed = {}, {}, []
+    for slug, values in parsed:
+        car = existing.get(slug) or to_create.get(slug)
+        if car is not None:
+            # Повтор слага в файле: побеждает последняя строка
+            for name, value in values.items():
+                setattr(car, name, value)
+            if car.pk:
+                car.updated = now
+                to_update[car.pk] = car
+        elif slug:
+            to_create[slug] = Cars(slug=slug, **values)
+        else:
+            unnamed.append(Cars(**values))
+
+    for car, slug in zip(unnamed, allocator.allocate([car.name for car in unnamed])):
+        car.slug = slug
+    to_create = [*to_create.values(), *unnamed]
+
+    with transaction.atomic():
+        if to_update:
+            Cars._base_manager.bulk_update(list(to_update.values()),
+                                           [*IMPORT_FIELDS, 'cat', 'updated'])
+        if to_create:
+            Cars._base_manager.bulk_create(to_create)
+    result.updated += len(to_update)
+    result.created += len(to_create)
+
+
+def import_rows(rows, batch_size=1000):
+    """
+    Загружает пары (номер строки, строка) из read_rows пачками по batch_size.
+    Ошибочные строки пропускаются и попадают в result.errors. Машина со слагом, который уже
+    есть в каталоге, обновляется; без слага или с новым слагом - создаётся
+    (пустой слаг генерируется из названия с суффиксом -2, -3, ...).
+    """
+    categories = dict(Category._base_manager.values_list('slug', 'pk'))
+    allocator = SlugAllocator(Cars, fallback='car')
+    result = ImportResult()
+    rows = iter(rows)
+    while batch := list(islice(rows, batch_size)):
+        _import_batch(batch, categories, allocator, result)
+    if result.created or result.updated:
+        finish_import()
+    return result
+
+
+def finish_import():
+    """Пересчёт того, что обычно двигают сигналы сохранения машин"""
+    Category._base_manager.update(cars_count=counters.count_subquery(Cars, 'cat'))
+    stats.reconcile()
+    page_cache.bump_version(Cars)
+    page_cache.bump_version(Category)
+    if facet_index.is_built:
+        facet_index.build()
+
+
+def import_file(path, fmt=None, batch_size=1000):
+    fmt = fmt or detect_format(path)
+    with open(path, encoding='utf-8-sig', newline='') as stream:
+        return import_rows(read_rows(stream, fmt), batch_size=batch_size)
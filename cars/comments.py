@@ -0,0 +1,44 @@
+"""
+Загрузка веток комментариев.
+
+Страница комментариев верхнего уровня выбирается курсором (created, id),
+а все ответы к ним - вторым запросом по root_id. Дерево собирается
+в памяти: у каждого комментария появляется список children.
+"""
+from .models import Comment
+from .pagination import KeysetPaginator
+
+
+def load_thread(car=None, article=None, cursor=None, per_page=20, max_depth=4):
+    """
+    Возвращает KeysetPage с комментариями верхнего уровня (новые сверху),
+    у каждого - children с ответами (старые сверху) не глубже max_depth.
+    Ответы на скрытые комментарии не показываются вместе с ними.
+    """
+    comments = Comment.objects.filter(is_active=True).select_related('user')
+    if car is not None:
+        comments = comments.filter(car=car)
+    else:
+        comments = comments.filter(article=article)
+
+    paginator = KeysetPaginator(comments.filter(parent__isnull=True), per_page)
+    page = paginator.get_page(cursor)
+
+    nodes = {}
+    for comment in page:
+        comment.children = []
+        nodes[comment.pk] = comment
+
+    if nodes:
+        replies = (comments
+                   .filter(root_id__in=list(nodes), depth__lte=max_depth)
+                   .order_by('created', 'id'))
+        # Родитель всегда создан раньше ответа, поэтому уже есть в nodes
+        for reply in replies:
+            parent = nodes.get(reply.parent_id)
+            if parent is None:
+                continue
+            reply.children = []
+            nodes[reply.pk] = reply
+            parent.children.append(reply)
+    return page
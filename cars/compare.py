@@ -0,0 +1,120 @@
+"""
+Сравнение машин (/compare/?cars=a,b,c).
+
+Таблица характеристик собирается за фиксированное число запросов: машины
+с категорией (select_related) и главные фото всех машин одним запросом.
+Готовая таблица кешируется. Ключ - отсортированный набор слагов с метками
+updated и числом лайков самих машин (их достаёт один лёгкий запрос; лайки
+меняются UPDATE без updated) и версии Category и CarPhoto из кеша страниц,
+поэтому популярное сравнение стоит одного запроса, а правка любой машины
+из набора даёт новый ключ.
+
+В кеше колонки лежат в каноническом порядке (по слагу), под порядок
+из адреса они переставляются при выдаче.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch
+
+from . import page_cache
+from .models import CarPhoto, Cars, Category
+
+CACHE_PREFIX = 'compare:'
+
+# Поле, подпись, единица измерения и какое значение лучше: 'max', 'min'
+# или None (строка не подсвечивается)
+SPEC_ROWS = (
+    ('price', "Цена", '$', 'min'),
+    ('year', "Год выпуска", '', 'max'),
+    ('horsepower', "Мощность", 'л.с.', 'max'),
+    ('engine_volume', "Объём двигателя", 'л', None),
+    ('acceleration_0_100', "Разгон 0-100 км/ч", 'с', 'min'),
+    ('top_speed', "Максимальная скорость", 'км/ч', 'max'),
+    ('likes_count', "Лайки", '', 'max'),
+)
+
+
+def parse_slugs(raw, limit):
+    """Слаги из ?cars=a,b,c без повторов, не больше limit"""
+    slugs = dict.fromkeys(slug.strip() for slug in raw.split(',') if slug.strip())
+    return list(slugs)[:limit]
+
+
+def cache_key(slugs):
+    """Ключ таблицы по набору машин, их updated и лайкам; None, если ни одной машины нет"""
+    stamps = sorted(Cars.objects.filter(slug__in=slugs, is_active=True)
+                    .values_list('slug', 'updated', 'likes_count'))
+    if not stamps:
+        return None
+    raw = ';'.join(f"{slug}@{updated.isoformat()}:{likes}" for slug, updated, likes in stamps)
+    version = page_cache.get_version(Category, CarPhoto)
+    return f"{CACHE_PREFIX}{hashlib.md5(raw.encode()).hexdigest()}:{version}"
+
+
+def spec_row(field, label, unit, better, cars):
+    values = [getattr(car, field) for car in cars]
+    known = [value for value in values if value is not None]
+    best = worst = None
+    # Подсвечиваем, только если значения различаются
+    if better and len(set(known)) > 1:
+        best, worst = (max(known), min(known)) if better == 'max' else (min(known), max(known))
+    return {
+        'label': label,
+        'unit': unit,
+        'cells': [{'value': value,
+                   'best': value is not None and value == best,
+                   'worst': value is not None and value == worst} for value in values],
+    }
+
+
+def build_table(slugs):
+    """Таблица сравнения: два запроса независимо от числа машин"""
+    cars = (Cars.objects.filter(slug__in=slugs, is_active=True)
+            .select_related('cat')
+            .prefetch_related(Prefetch('photos', queryset=CarPhoto.objects.filter(is_main=True),
+                                       to_attr='main_photos'))
+            .order_by('slug', 'pk'))
+    # Слаг в схеме не уникален: из дублей берём первую машину
+    unique = {}
+    for car in cars:
+        unique.setdefault(car.slug, car)
+    cars = list(unique.values())
+
+    columns = []
+    for car in cars:
+        photo = car.main_photos[0].image if car.main_photos else car.image
+        columns.append({
+            'name': car.name,
+            'slug': car.slug,
+            'image': photo.url if photo else None,
+            'category': car.cat.title,
+            'category_slug': car.cat.slug,
+        })
+    return {
+        'cars': columns,
+        'rows': [spec_row(*spec, cars) for spec in SPEC_ROWS],
+    }
+
+
+def reorder(table, slugs):
+    """Колонки в порядке слагов из запроса"""
+    position = {slug: index for index, slug in enumerate(slugs)}
+    order = sorted(range(len(table['cars'])), key=lambda index: position[table['cars'][index]['slug']])
+    return {
+        'cars': [table['cars'][index] for index in order],
+        'rows': [dict(row, cells=[row['cells'][index] for index in order]) for row in table['rows']],
+    }
+
+
+def get_comparison(slugs):
+    """Таблица сравнения из кеша или заново; None, если машин не нашлось"""
+    key = cache_key(slugs)
+    if key is None:
+        return None
+    table = cache.get(key)
+    if table is None:
+        table = build_table(slugs)
+        cache.set(key, table, settings.PAGE_CACHE_TIMEOUT)
+    return reorder(table, slugs)
@@ -0,0 +1,80 @@
+"""
+Условные GET-запросы (ETag) для страниц каталога.
+
+Представление описывает свои валидаторы одним агрегирующим запросом
+(максимальный updated, число строк, денормализованные счётчики) и
+добавляет к ним «пользовательскую» часть: кто смотрит страницу и версию
+его лайков. Если клиент прислал совпадающий If-None-Match, ответ 304
+отдаётся до загрузки объектов и рендера шаблона.
+
+Last-Modified не отправляется: время изменения не покрывает счётчики,
+версии связанных моделей и лайки пользователя, и клиент, присылающий
+только If-Modified-Since, получал бы 304 с устаревшей страницей.
+"""
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+
+from . import likes
+
+
+class ConditionalGetMixin:
+    """
+    Подмешивается первым, раньше кеша страниц. Наследник реализует
+    get_validators() -> (last_modified: datetime | None, parts: tuple)
+    или возвращает None, если объекта нет и нужен обычный ответ (404).
+    Обе части входят только в ETag.
+    """
+
+    def get_validators(self):
+        raise NotImplementedError
+
+    def get_user_validator(self):
+        user = self.request.user
+        if not user.is_authenticated:
+            return ('anon',)
+        return (user.pk, likes.user_likes_version(user))
+
+    def make_etag(self, last_modified, parts):
+        raw = ':'.join(str(part) for part in (settings.RELEASE_VERSION, last_modified, *parts,
+                                              *self.get_user_validator()))
+        return 'W/' + quote_etag(hashlib.md5(raw.encode()).hexdigest())
+
+    def not_modified(self, request):
+        """Хук для побочных эффектов просмотра, которые нужны и при 304"""
+
+    def evaluate_conditional(self, request):
+        """(ответ 304 или None, etag); etag None - объекта нет, валидатор не ставится"""
+        validators = self.get_validators()
+        if validators is None:
+            return None, None
+        etag = self.make_etag(*validators)
+        response = get_conditional_response(request, etag=etag)
+        if response is not None:
+            self.not_modified(request)
+        return response, etag
+
+    @staticmethod
+    def set_validators(response, etag):
+        if etag is not None and response.status_code in (200, 304):
+            response['ETag'] = etag
+        return response
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return super().dispatch(request, *args, **kwargs)
+        if self.view_is_async:
+            return self._conditional_dispatch_async(request, *args, **kwargs)
+        response, etag = self.evaluate_conditional(request)
+        if response is None:
+            response = super().dispatch(request, *args, **kwargs)
+        return self.set_validators(response, etag)
+
+    async def _conditional_dispatch_async(self, request, *args, **kwargs):
+        response, etag = await sync_to_async(self.evaluate_conditional)(request)
+        if response is None:
+            response = await super().dispatch(request, *args, **kwargs)
+        return self.set_validators(response, etag)
@@ -0,0 +1,85 @@
+"""
+Денормализованные счётчики каталога.
+
+Количество машин в категории, лайков/фото/комментариев у машины и
+комментариев у статьи хранится прямо в строках, чтобы списки и админка
+не делали COUNT(*) на каждую запись. Счётчики двигаются сигналами
+(cars.signals) через F()-выражения в той же транзакции, что и изменение,
+а reconcile() пересчитывает их целиком одним UPDATE на счётчик
+(команда reconcile_counters).
+
+UPDATE не вызывает post_save, поэтому после фиксации транзакции здесь же
+увеличивается версия модели в кеше страниц (cars/page_cache.py) - иначе
+списки показывали бы старые числа лайков и машин до конца PAGE_CACHE_TIMEOUT.
+"""
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from . import page_cache
+from .models import Article, CarPhoto, Cars, Category, Comment
+
+
+def bump_cache_version(model):
+    transaction.on_commit(lambda: page_cache.bump_version(model))
+
+
+def bump(model, pk, field, delta):
+    """Сдвигает счётчик одной строки на delta, не опуская его ниже нуля"""
+    if pk is None or not delta:
+        return
+    model._base_manager.filter(pk=pk).update(**{field: Greatest(F(field) + delta, 0)})
+    bump_cache_version(model)
+
+
+def bump_many(model, pks, field, delta):
+    """То же для набора строк, одним UPDATE"""
+    if pks and delta:
+        model._base_manager.filter(pk__in=pks).update(**{field: Greatest(F(field) + delta, 0)})
+        bump_cache_version(model)
+
+
+def count_subquery(model, fk, **filters):
+    """Коррелированный подзапрос COUNT(*) для UPDATE ... SET counter = (...)"""
+    rows = (model._base_manager
+            .filter(**{fk: OuterRef('pk')}, **filters)
+            .order_by()
+            .values(fk)
+            .annotate(total=Count('pk'))
+            .values('total'))
+    return Coalesce(Subquery(rows), 0)
+
+
+def likes_subquery():
+    through = Cars.likes.through
+    return count_subquery(through, 'cars')
+
+
+# (модель, поле счётчика, выражение для пересчёта)
+COUNTERS = (
+    (Category, 'cars_count', lambda: count_subquery(Cars, 'cat')),
+    (Cars, 'likes_count', likes_subquery),
+    (Cars, 'photos_count', lambda: count_subquery(CarPhoto, 'car')),
+    (Cars, 'comments_count', lambda: count_subquery(Comment, 'car', is_active=True)),
+    (Article, 'comments_count', lambda: count_subquery(Comment, 'article', is_active=True)),
+)
+
+
+def recount_likes(car_ids):
+    """Точный пересчёт лайков для набора машин (после remove/clear в M2M)"""
+    if car_ids:
+        Cars._base_manager.filter(pk__in=car_ids).update(likes_count=likes_subquery())
+        bump_cache_version(Cars)
+
+
+def reconcile():
+    """
+    Пересчитывает все счётчики set-based запросами.
+    Возвращает [(модель, поле, число обновлённых строк)].
+    """
+    results = []
+    for model, field, expression in COUNTERS:
+        updated = model._base_manager.update(**{field: expression()})
+        bump_cache_version(model)
+        results.append((model, field, updated))
+    return results
@@ -0,0 +1,136 @@
+"""
+Чтение каталога с реплик БД.
+
+ReplicaRoutingMiddleware решает для каждого запроса, откуда читать: GET/HEAD
+к страницам приложения cars идут на случайную живую реплику из
+DATABASE_REPLICAS, всё остальное (запись, вход и профиль users, админка) -
+на основную БД. Выбор хранится в ContextVar, его читает ReplicaRouter,
+поэтому он работает и в асинхронных представлениях.
+
+После запроса, который мог что-то записать (POST и прочие небезопасные
+методы), клиент получает cookie и REPLICA_PIN_SECONDS читает только
+с основной БД - так он видит свои изменения, даже если реплика отстаёт.
+
+Реплика, к которой не удалось подключиться, на REPLICA_RETRY_SECONDS
+исключается из выбора, запросы в это время читают с основной БД.
+"""
+import random
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+PIN_COOKIE = 'db_pin'
+
+# Эти приложения всегда читаются с основной БД: сессии, пользователи и
+# права должны быть свежими сразу после входа и смены пароля
+PRIMARY_APPS = {'auth', 'sessions', 'contenttypes', 'admin', 'users'}
+
+# Приложения (пространства имён URL), страницы которых можно отдавать с реплики
+REPLICA_APPS = {'cars', 'api'}
+
+_read_alias = ContextVar('read_alias', default=None)
+_unhealthy = {}
+
+
+def read_alias():
+    """Псевдоним БД для чтения в текущем запросе (None - основная)"""
+    return _read_alias.get()
+
+
+def using_replica():
+    return _read_alias.get() not in (None, DEFAULT_DB_ALIAS)
+
+
+def is_healthy(alias):
+    """Проверяет соединение с репликой; упавшая реплика откладывается на время"""
+    if _unhealthy.get(alias, 0) > time.monotonic():
+        return False
+    try:
+        connections[alias].ensure_connection()
+    except DatabaseError:
+        _unhealthy[alias] = time.monotonic() + settings.REPLICA_RETRY_SECONDS
+        return False
+    _unhealthy.pop(alias, None)
+    return True
+
+
+def choose_replica():
+    """Случайная живая реплика или None, если ни одна не отвечает"""
+    replicas = list(settings.DATABASE_REPLICAS)
+    random.shuffle(replicas)
+    for alias in replicas:
+        if is_healthy(alias):
+            return alias
+    return None
+
+
+def is_pinned(request):
+    return PIN_COOKIE in request.COOKIES
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in PRIMARY_APPS:
+            return DEFAULT_DB_ALIAS
+        return _read_alias.get() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики - копии основной БД, связи между их объектами допустимы
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Ставится до SessionMiddleware. Выбор БД делается в process_view, когда
+    уже известно, к какому приложению относится страница.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = _read_alias.set(None)
+        try:
+            response = self.get_response(request)
+        finally:
+            _read_alias.reset(token)
+        return self.pin(request, response)
+
+    async def __acall__(self, request):
+        token = _read_alias.set(None)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _read_alias.reset(token)
+        return self.pin(request, response)
+
+    def pin(self, request, response):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE') and settings.DATABASE_REPLICAS:
+            response.set_cookie(PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                                httponly=True, samesite='Lax')
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (settings.DATABASE_REPLICAS
+                and request.method in ('GET', 'HEAD')
+                and request.resolver_match.app_name in REPLICA_APPS
+                and not is_pinned(request)):
+            _read_alias.set(choose_replica())
+        return None
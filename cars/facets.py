@@ -0,0 +1,223 @@
+"""
+Колоночный фасетный индекс по характеристикам автомобилей.
+
+Активные машины хранятся в памяти процесса в виде NumPy-массивов
+(по колонке на характеристику). Фильтр по диапазонам и подсчёт фасетов
+(корзины цены и года, число машин по категориям) - это несколько
+векторных операций над массивами вместо серии GROUP BY-запросов.
+
+Индекс строится лениво при первом запросе, обновляется точечно по сигналам
+сохранения/удаления Cars и полностью перестраивается раз в FACET_INDEX_TTL
+секунд, чтобы подхватить изменения, сделанные другими процессами.
+"""
+import math
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+# Числовые характеристики, по которым можно фильтровать
+RANGE_FIELDS = ('price', 'year', 'horsepower', 'engine_volume', 'acceleration_0_100', 'top_speed')
+
+# Поля, по которым можно сортировать выдачу
+SORT_FIELDS = ('created', 'price', 'year', 'horsepower', 'acceleration_0_100', 'top_speed')
+
+# Границы корзин для гистограмм: [edges[i], edges[i + 1])
+PRICE_BUCKETS = (0, 20_000, 50_000, 100_000, 200_000, 500_000, math.inf)
+YEAR_BUCKETS = (0, 1990, 2000, 2010, 2015, 2020, 2025, math.inf)
+
+_COLUMNS = ('created',) + RANGE_FIELDS
+
+
+def _float(value):
+    return math.nan if value is None else float(value)
+
+
+class FacetResult:
+    def __init__(self, ids, total, facets):
+        self.ids = ids
+        self.total = total
+        self.facets = facets
+
+
+class FacetIndex:
+    """
+    Колоночное хранилище активных машин.
+    Строки не удаляются физически: удалённые помечаются в маске alive,
+    а при большой доле "мёртвых" строк индекс уплотняется.
+    """
+
+    def __init__(self, ttl=None):
+        self._lock = threading.RLock()
+        self._ttl = ttl
+        self._built_at = None
+        self._size = 0
+        self._rows = {}
+        self.ids = np.empty(0, dtype=np.int64)
+        self.cat = np.empty(0, dtype=np.int64)
+        self.alive = np.empty(0, dtype=bool)
+        self.columns = {name: np.empty(0, dtype=np.float64) for name in _COLUMNS}
+
+    @property
+    def ttl(self):
+        if self._ttl is not None:
+            return self._ttl
+        return getattr(settings, 'FACET_INDEX_TTL', 300)
+
+    @property
+    def is_built(self):
+        return self._built_at is not None
+
+    def __len__(self):
+        return len(self._rows)
+
+    # Построение и обновление
+
+    def build(self):
+        """Полностью перестраивает индекс одним проходом по таблице"""
+        from .models import Cars
+
+        rows = (Cars.objects.filter(is_active=True)
+                .order_by()
+                .values_list('pk', 'cat_id', *_COLUMNS)
+                .iterator(chunk_size=5000))
+        ids, cats = [], []
+        values = {name: [] for name in _COLUMNS}
+        for pk, cat_id, *row in rows:
+            ids.append(pk)
+            cats.append(cat_id)
+            for name, value in zip(_COLUMNS, row):
+                values[name].append(value.timestamp() if name == 'created' else _float(value))
+
+        with self._lock:
+            self._size = len(ids)
+            self.ids = np.array(ids, dtype=np.int64)
+            self.cat = np.array(cats, dtype=np.int64)
+            self.alive = np.ones(self._size, dtype=bool)
+            self.columns = {name: np.array(values[name], dtype=np.float64) for name in _COLUMNS}
+            self._rows = {pk: row for row, pk in enumerate(ids)}
+            self._built_at = time.monotonic()
+
+    def ensure_fresh(self):
+        if not self.is_built or time.monotonic() - self._built_at >= self.ttl:
+            self.build()
+
+    def _grow(self):
+        capacity = max(16, len(self.ids) * 2)
+        extra = capacity - len(self.ids)
+        self.ids = np.concatenate([self.ids, np.zeros(extra, dtype=np.int64)])
+        self.cat = np.concatenate([self.cat, np.zeros(extra, dtype=np.int64)])
+        self.alive = np.concatenate([self.alive, np.zeros(extra, dtype=bool)])
+        for name in _COLUMNS:
+            self.columns[name] = np.concatenate(
+                [self.columns[name], np.full(extra, math.nan)])
+
+    def upsert(self, car):
+        """Добавляет или обновляет машину; неактивные машины удаляются"""
+        if not self.is_built:
+            return
+        if not car.is_active:
+            self.remove(car.pk)
+            return
+        with self._lock:
+            row = self._rows.get(car.pk)
+            if row is None:
+                if self._size == len(self.ids):
+                    self._grow()
+                row = self._size
+                self._size += 1
+                self._rows[car.pk] = row
+            self.ids[row] = car.pk
+            self.cat[row] = car.cat_id
+            self.alive[row] = True
+            for name in _COLUMNS:
+                value = getattr(car, name)
+                self.columns[name][row] = value.timestamp() if name == 'created' else _float(value)
+
+    def remove(self, pk):
+        if not self.is_built:
+            return
+        with self._lock:
+            row = self._rows.pop(pk, None)
+            if row is None:
+                return
+            self.alive[row] = False
+            if len(self._rows) < self._size // 2:
+                self._compact()
+
+    def _compact(self):
+        keep = np.flatnonzero(self.alive[:self._size])
+        self.ids = self.ids[keep]
+        self.cat = self.cat[keep]
+        self.alive = np.ones(len(keep), dtype=bool)
+        for name in _COLUMNS:
+            self.columns[name] = self.columns[name][keep]
+        self._size = len(keep)
+        self._rows = {int(pk): row for row, pk in enumerate(self.ids)}
+
+    # Запросы
+
+    def _masks(self, ranges, categories):
+        """Отдельная маска на каждый активный фильтр"""
+        size = self._size
+        masks = {}
+        for name, (low, high) in ranges.items():
+            column = self.columns[name][:size]
+            mask = np.ones(size, dtype=bool)
+            if low is not None:
+                mask &= column >= low
+            if high is not None:
+                mask &= column <= high
+            masks[name] = mask
+        if categories:
+            masks['cat'] = np.isin(self.cat[:size], list(categories))
+        return masks
+
+    def _combine(self, masks, skip=None):
+        mask = self.alive[:self._size].copy()
+        for name, other in masks.items():
+            if name != skip:
+                mask &= other
+        return mask
+
+    def _histogram(self, name, mask, edges):
+        values = self.columns[name][:self._size][mask]
+        counts, _ = np.histogram(values[~np.isnan(values)], bins=np.array(edges, dtype=np.float64))
+        return [
+            {'from': low, 'to': None if math.isinf(high) else high, 'count': int(count)}
+            for low, high, count in zip(edges, edges[1:], counts)
+        ]
+
+    def query(self, ranges=None, categories=None, sort='-created', offset=0, limit=24):
+        """
+        ranges - {поле: (min, max)} с включительными границами (None - без границы),
+        categories - набор id категорий.
+        Каждый фасет считается без учёта собственного фильтра, чтобы показывать,
+        сколько машин добавится при расширении этого фильтра.
+        """
+        ranges = {name: bounds for name, bounds in (ranges or {}).items() if bounds != (None, None)}
+        self.ensure_fresh()
+        with self._lock:
+            masks = self._masks(ranges, categories)
+            mask = self._combine(masks)
+            rows = np.flatnonzero(mask)
+
+            descending = sort.startswith('-')
+            column = self.columns[sort.lstrip('-')][:self._size][rows]
+            # NaN всегда в конце выдачи, независимо от направления сортировки
+            key = np.where(np.isnan(column), -np.inf if descending else np.inf, column)
+            order = np.argsort(-key if descending else key, kind='stable')
+            page = self.ids[rows[order[offset:offset + limit]]].tolist()
+
+            cat_mask = self._combine(masks, skip='cat')
+            cat_ids, cat_counts = np.unique(self.cat[:self._size][cat_mask], return_counts=True)
+            facets = {
+                'price': self._histogram('price', self._combine(masks, skip='price'), PRICE_BUCKETS),
+                'year': self._histogram('year', self._combine(masks, skip='year'), YEAR_BUCKETS),
+                'category': {int(pk): int(count) for pk, count in zip(cat_ids, cat_counts)},
+            }
+        return FacetResult(page, len(rows), facets)
+
+
+facet_index = FacetIndex()
@@ -0,0 +1,54 @@
+from django import forms
+
+from .facets import RANGE_FIELDS, SORT_FIELDS
+
+
+class IntegerListField(forms.Field):
+    """
+    Список целых чисел из повторяющегося GET-параметра (?cat=1&cat=2)
+    """
+    widget = forms.MultipleHiddenInput
+
+    def to_python(self, value):
+        if not value:
+            return []
+        try:
+            return [int(item) for item in value]
+        except (TypeError, ValueError):
+            raise forms.ValidationError("Некорректный список значений")
+
+
+class CarFilterForm(forms.Form):
+    """
+    Форма подбора автомобилей по характеристикам
+    Для каждой характеристики есть пара полей <поле>_min / <поле>_max
+    """
+    price_min = forms.FloatField(required=False, min_value=0, label='Цена от')
+    price_max = forms.FloatField(required=False, min_value=0, label='Цена до')
+    year_min = forms.IntegerField(required=False, label='Год от')
+    year_max = forms.IntegerField(required=False, label='Год до')
+    horsepower_min = forms.IntegerField(required=False, min_value=0, label='Мощность от')
+    horsepower_max = forms.IntegerField(required=False, min_value=0, label='Мощность до')
+    engine_volume_min = forms.FloatField(required=False, min_value=0, label='Объём от')
+    engine_volume_max = forms.FloatField(required=False, min_value=0, label='Объём до')
+    acceleration_0_100_min = forms.FloatField(required=False, min_value=0, label='Разгон от')
+    acceleration_0_100_max = forms.FloatField(required=False, min_value=0, label='Разгон до')
+    top_speed_min = forms.IntegerField(required=False, min_value=0, label='Скорость от')
+    top_speed_max = forms.IntegerField(required=False, min_value=0, label='Скорость до')
+
+    cat = IntegerListField(required=False, label='Категории')
+    sort = forms.ChoiceField(
+        required=False,
+        choices=[(f'{prefix}{name}', f'{prefix}{name}')
+                 for name in SORT_FIELDS for prefix in ('-', '')],
+        label='Сортировка'
+    )
+    page = forms.IntegerField(required=False, min_value=1, label='Страница')
+
+    def get_ranges(self):
+        """Диапазоны в формате FacetIndex.query: {поле: (min, max)}"""
+        data = self.cleaned_data
+        return {
+            name: (data.get(f'{name}_min'), data.get(f'{name}_max'))
+            for name in RANGE_FIELDS
+        }
@@ -0,0 +1,78 @@
+"""
+Лайки машин.
+
+Лайк/анлайк работают напрямую с промежуточной таблицей Cars.likes:
+вставка защищена уникальным ключом (cars_id, user_id), а счётчик
+Cars.likes_count сдвигается на ±1 только если строка реально появилась
+или исчезла. Так повторные клики идемпотентны и не требуют COUNT(*).
+"""
+from django.db import IntegrityError, transaction
+
+from . import counters, page_cache
+from .models import Cars
+
+LikeThrough = Cars.likes.through
+
+
+def user_likes_key(user_id):
+    return f"{page_cache.VERSION_PREFIX}likes:{user_id}"
+
+
+def user_likes_version(user):
+    """Версия набора лайков пользователя - для ETag страниц с кнопками лайка"""
+    if not user.is_authenticated:
+        return ''
+    return page_cache.get_key_versions(user_likes_key(user.pk))
+
+
+def bump_user_likes(user_id):
+    transaction.on_commit(lambda: page_cache.bump_key_version(user_likes_key(user_id)))
+
+
+def like(car_id, user):
+    """Ставит лайк; возвращает True, если лайка ещё не было"""
+    try:
+        with transaction.atomic():
+            LikeThrough.objects.create(cars_id=car_id, user_id=user.pk)
+            counters.bump(Cars, car_id, 'likes_count', 1)
+            bump_user_likes(user.pk)
+    except IntegrityError:
+        return False
+    return True
+
+
+def unlike(car_id, user):
+    """Снимает лайк; возвращает True, если лайк был"""
+    with transaction.atomic():
+        deleted, _ = LikeThrough.objects.filter(cars_id=car_id, user_id=user.pk).delete()
+        if deleted:
+            counters.bump(Cars, car_id, 'likes_count', -deleted)
+            bump_user_likes(user.pk)
+    return bool(deleted)
+
+
+def liked_car_ids(user, cars):
+    """
+    id машин из набора, которые лайкнул пользователь - одним запросом
+    для всей страницы списка
+    """
+    if not user.is_authenticated:
+        return set()
+    car_ids = [car.pk for car in cars]
+    if not car_ids:
+        return set()
+    return set(LikeThrough.objects
+               .filter(user_id=user.pk, cars_id__in=car_ids)
+               .values_list('cars_id', flat=True))
+
+
+async def aliked_car_ids(user, cars):
+    """То же для асинхронных представлений"""
+    if not user.is_authenticated:
+        return set()
+    car_ids = [car.pk for car in cars]
+    if not car_ids:
+        return set()
+    return {car_id async for car_id in (LikeThrough.objects
+                                         .filter(user_id=user.pk, cars_id__in=car_ids)
+                                         .values_list('cars_id', flat=True))}
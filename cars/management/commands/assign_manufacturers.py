@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from cars import manufacturers, page_cache
+from cars.models import Cars
+
+
+class Command(BaseCommand):
+    help = "Проставляет производителя машинам без него - по названию бренда в названии машины"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=manufacturers.BATCH_SIZE,
+                            help="Машин в одной транзакции")
+
+    def handle(self, *args, **options):
+        assigned = manufacturers.backfill(batch_size=options['batch_size'])
+        # UPDATE без сигналов: сбрасываем кеш страниц и сводку брендов вручную
+        page_cache.bump_version(Cars)
+        self.stdout.write(self.style.SUCCESS(f"Производитель проставлен машинам: {assigned}"))
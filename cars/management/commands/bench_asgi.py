@@ -0,0 +1,79 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+from cars.models import Cars, Category
+
+NO_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+class Command(BaseCommand):
+    help = ("Сравнивает запросы в секунду для страниц каталога через WSGI- и ASGI-обработчик Django "
+            "(асинхронные страницы включаются ASYNC_VIEWS=1)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help="Запросов на страницу")
+        parser.add_argument('--concurrency', type=int, default=16, help="Одновременных запросов")
+        parser.add_argument('--url', action='append', dest='urls', help="Адрес страницы (можно несколько)")
+        parser.add_argument('--no-cache', action='store_true',
+                            help="Отключить кеш, чтобы мерить сами представления")
+
+    def default_urls(self):
+        urls = [reverse('cars:index'), reverse('cars:category'), reverse('cars:about')]
+        category = Category.objects.exclude(slug='').order_by('-cars_count').first()
+        if category is not None:
+            urls.append(reverse('cars:cars', args=[category.slug]))
+        car = Cars.objects.filter(is_active=True).exclude(slug='').first()
+        if car is not None:
+            urls.append(reverse('cars:car_detail', args=[car.slug]))
+        return urls
+
+    def handle(self, *args, **options):
+        total, concurrency = options['requests'], options['concurrency']
+        urls = options['urls'] or self.default_urls()
+        self.stdout.write(f"Представления: {'асинхронные' if settings.ASYNC_VIEWS else 'синхронные'}, "
+                          f"{total} запросов, {concurrency} одновременно")
+        self.stdout.write(f"{'Страница':40} {'WSGI, rps':>10} {'ASGI, rps':>10}")
+
+        with override_settings(CACHES=NO_CACHE) if options['no_cache'] else nullcontext():
+            for url in urls:
+                wsgi = self.bench_wsgi(url, total, concurrency)
+                asgi = async_to_sync(self.bench_asgi)(url, total, concurrency)
+                self.stdout.write(f"{url:40} {wsgi:10.1f} {asgi:10.1f}")
+
+    def bench_wsgi(self, url, total, concurrency):
+        def worker(count):
+            client = Client(headers={'host': 'localhost'})
+            for _ in range(count):
+                self.check_response(url, client.get(url))
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(worker, self.split(total, concurrency)))
+        return total / (time.perf_counter() - started)
+
+    async def bench_asgi(self, url, total, concurrency):
+        async def worker(count):
+            client = AsyncClient(headers={'host': 'localhost'})
+            for _ in range(count):
+                self.check_response(url, await client.get(url))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(count) for count in self.split(total, concurrency)))
+        return total / (time.perf_counter() - started)
+
+    @staticmethod
+    def split(total, workers):
+        return [total // workers + (1 if index < total % workers else 0) for index in range(workers)]
+
+    @staticmethod
+    def check_response(url, response):
+        if response.status_code != 200:
+            raise RuntimeError(f"{url}: ответ {response.status_code}")
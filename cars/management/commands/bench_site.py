@@ -0,0 +1,317 @@
+import json
+import random
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from decimal import Decimal
+from pathlib import Path
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from cars import catalog_io
+from cars.models import Cars, Category
+from cars.query_budget import track_queries
+from cars.slugs import SlugAllocator
+
+NO_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+# Маршрут -> вес в смеси запросов
+DEFAULT_MIX = {
+    'cars:index': 10,
+    'cars:category': 10,
+    'cars:cars': 30,
+    'cars:car_detail': 40,
+    'cars:about': 4,
+    'users:login': 3,
+    'users:register': 1,
+    'users:password_reset': 1,
+    'users:profile': 2,
+    'users:profile_edit': 1,
+}
+
+# Страницы, которые открываются от имени пользователя
+LOGIN_REQUIRED = {'users:profile', 'users:profile_edit'}
+
+BENCH_USER = 'bench'
+
+
+def percentile(values, fraction):
+    """Перцентиль по уже отсортированному списку (ближайший ранг)"""
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, round(fraction * len(values)) - 1))
+    return round(values[index], 2)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ("Нагрузочный прогон публичных страниц: взвешенная смесь запросов в несколько потоков, "
+            "задержки p50/p95/p99, пропускная способность и SQL-запросы на страницу; результат в JSON")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000, help="Всего запросов")
+        parser.add_argument('--concurrency', type=int, default=8, help="Одновременных потоков")
+        parser.add_argument('--mix', action='append', metavar='МАРШРУТ=ВЕС',
+                            help="Вес маршрута, например cars:car_detail=50 (можно несколько)")
+        parser.add_argument('--allow-writes', action='store_true',
+                            help="Разрешить запись в настроенную БД: досоздание данных (--seed-cars) "
+                                 "и пользователь bench для страниц со входом")
+        parser.add_argument('--seed-cars', type=int, default=0,
+                            help="Досоздать машин, пока их не станет столько (нужен --allow-writes)")
+        parser.add_argument('--seed-categories', type=int, default=10,
+                            help="Категорий при досоздании данных")
+        parser.add_argument('--server', default=None,
+                            help="Адрес запущенного сервера (http://127.0.0.1:8000) вместо тестового клиента; "
+                                 "SQL-запросы тогда берутся из заголовка X-DB-Queries (DEBUG)")
+        parser.add_argument('--no-cache', action='store_true', help="Отключить кеш (только тестовый клиент)")
+        parser.add_argument('--random-seed', type=int, default=0, help="Зерно выбора страниц")
+        parser.add_argument('--output', default=None,
+                            help="JSON с результатами (по умолчанию benchmarks/<время>-<коммит>.json)")
+        parser.add_argument('--compare', default=None, help="Сравнить с прошлым JSON-результатом")
+
+    def handle(self, *args, **options):
+        # Прогон пишет в ту БД, что настроена: продакшен трогать нельзя
+        if not settings.DEBUG:
+            raise CommandError("Нагрузочный прогон запускается только при DEBUG")
+        if options['seed_cars'] and not options['allow_writes']:
+            raise CommandError("--seed-cars создаёт категории и машины: добавьте --allow-writes")
+
+        mix = self.parse_mix(options['mix'])
+        skipped = self.skipped_routes(mix, options)
+        for name, reason in skipped.items():
+            self.stdout.write(f"Пропущен {name}: {reason}")
+        mix = {name: weight for name, weight in mix.items() if name not in skipped}
+        if not mix:
+            raise CommandError("Все маршруты смеси пропущены")
+        if options['seed_cars']:
+            self.seed(options['seed_cars'], options['seed_categories'])
+        targets = self.load_targets()
+        if not targets['cars']:
+            raise CommandError("В каталоге нет машин: запустите с --seed-cars --allow-writes")
+
+        plan = self.make_plan(mix, targets, options['requests'], random.Random(options['random_seed']))
+        self.stdout.write(f"Машин: {targets['total_cars']}, категорий: {len(targets['categories'])}; "
+                          f"{len(plan)} запросов в {options['concurrency']} потоков")
+
+        if options['server']:
+            worker = self.server_worker(options['server'])
+        else:
+            self.user = None
+            if LOGIN_REQUIRED & mix.keys():
+                self.user, _ = User.objects.get_or_create(username=BENCH_USER)
+            worker = self.client_worker
+        with override_settings(CACHES=NO_CACHE) if options['no_cache'] else nullcontext():
+            samples, elapsed = self.run(plan, options['concurrency'], worker)
+
+        results = self.summarize(samples, elapsed, options, targets)
+        results['skipped_routes'] = skipped
+        self.report(results)
+        if options['compare']:
+            self.compare(results, json.loads(Path(options['compare']).read_text(encoding='utf-8')))
+        self.save(results, options['output'])
+
+    # Подготовка
+
+    def parse_mix(self, items):
+        if not items:
+            return dict(DEFAULT_MIX)
+        mix = {}
+        for item in items:
+            name, _, weight = item.partition('=')
+            if name not in DEFAULT_MIX:
+                raise CommandError(f"Неизвестный маршрут {name}; доступны: {', '.join(DEFAULT_MIX)}")
+            try:
+                mix[name] = int(weight or 1)
+            except ValueError:
+                raise CommandError(f"Вес должен быть целым числом: {item}")
+        return mix
+
+    @staticmethod
+    def skipped_routes(mix, options):
+        """{маршрут: причина} для страниц со входом, которые нельзя открыть в этом режиме"""
+        if options['server']:
+            reason = "сервер опрашивается без входа"
+        elif not options['allow_writes']:
+            reason = "вход пользователя bench пишет в БД, нужен --allow-writes"
+        else:
+            return {}
+        return {name: reason for name in mix if name in LOGIN_REQUIRED}
+
+    def seed(self, total_cars, total_categories):
+        """Простые данные для прогона: категории и машины пачками bulk_create"""
+        categories = list(Category.objects.all())
+        for index in range(len(categories), total_categories):
+            category = Category(title=f"Bench {index}", description="Категория для нагрузочного прогона",
+                                parent=categories[0] if categories and index % 3 else None)
+            category.save()
+            categories.append(category)
+
+        missing = total_cars - Cars.objects.count()
+        if missing <= 0:
+            return
+        allocator = SlugAllocator(Cars, fallback='car')
+        rng = random.Random(total_cars)
+        for start in range(0, missing, 1000):
+            batch = [Cars(name=f"Bench car {start + index}", description="Машина для нагрузочного прогона",
+                          price=Decimal(rng.randrange(5000, 300000)), year=rng.randrange(1990, 2026),
+                          horsepower=rng.randrange(70, 800), top_speed=rng.randrange(150, 350),
+                          engine_volume=Decimal(rng.randrange(10, 60)) / 10,
+                          acceleration_0_100=Decimal(rng.randrange(25, 150)) / 10,
+                          cat=rng.choice(categories), image='cars/bench.jpg', updated=timezone.now())
+                     for index in range(min(1000, missing - start))]
+            for car, slug in zip(batch, allocator.allocate([car.name for car in batch])):
+                car.slug = slug
+            Cars.objects.bulk_create(batch)
+        catalog_io.finish_import()
+        self.stdout.write(f"Создано машин: {missing}")
+
+    def load_targets(self):
+        return {
+            'categories': list(Category.objects.exclude(slug='').values_list('slug', flat=True)),
+            'cars': list(Cars.objects.filter(is_active=True).exclude(slug='')
+                         .values_list('slug', flat=True)[:5000]),
+            'total_cars': Cars.objects.count(),
+        }
+
+    @staticmethod
+    def make_plan(mix, targets, total, rng):
+        """Список (маршрут, адрес) в случайном порядке согласно весам"""
+        names = [name for name in mix if name != 'cars:cars' or targets['categories']]
+        weights = [mix[name] for name in names]
+        plan = []
+        for name in rng.choices(names, weights, k=total):
+            if name == 'cars:cars':
+                url = reverse(name, args=[rng.choice(targets['categories'])])
+            elif name == 'cars:car_detail':
+                url = reverse(name, args=[rng.choice(targets['cars'])])
+            else:
+                url = reverse(name)
+            plan.append((name, url))
+        return plan
+
+    # Прогон
+
+    def run(self, plan, concurrency, worker):
+        chunks = [plan[index::concurrency] for index in range(concurrency)]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            samples = [sample for chunk in pool.map(worker, chunks) for sample in chunk]
+        return samples, time.perf_counter() - started
+
+    def client_worker(self, chunk):
+        # Ошибка страницы - это ответ 500 в статистике, а не остановка прогона
+        anonymous = Client(headers={'host': 'localhost'}, raise_request_exception=False)
+        authenticated = Client(headers={'host': 'localhost'}, raise_request_exception=False)
+        if self.user is not None:
+            authenticated.force_login(self.user)
+        samples = []
+        try:
+            for name, url in chunk:
+                client = authenticated if name in LOGIN_REQUIRED else anonymous
+                with track_queries() as queries:
+                    started = time.perf_counter()
+                    response = client.get(url)
+                    elapsed = time.perf_counter() - started
+                samples.append((name, elapsed, queries.count, response.status_code))
+        finally:
+            connections.close_all()
+        return samples
+
+    def server_worker(self, base_url):
+        base_url = base_url.rstrip('/')
+
+        def worker(chunk):
+            samples = []
+            for name, url in chunk:
+                started = time.perf_counter()
+                try:
+                    with urlopen(Request(base_url + url)) as response:
+                        response.read()
+                        status, header = response.status, response.headers.get('X-DB-Queries')
+                except HTTPError as error:
+                    status, header = error.code, error.headers.get('X-DB-Queries')
+                elapsed = time.perf_counter() - started
+                samples.append((name, elapsed, int(header) if header else None, status))
+            return samples
+        return worker
+
+    # Результаты
+
+    @staticmethod
+    def route_stats(samples, elapsed):
+        latencies = sorted(sample[1] * 1000 for sample in samples)
+        queries = [sample[2] for sample in samples if sample[2] is not None]
+        return {
+            'requests': len(samples),
+            'errors': sum(1 for sample in samples if sample[3] >= 400),
+            'throughput_rps': round(len(samples) / elapsed, 1) if elapsed else None,
+            'mean_ms': round(sum(latencies) / len(latencies), 2) if latencies else None,
+            'p50_ms': percentile(latencies, 0.50),
+            'p95_ms': percentile(latencies, 0.95),
+            'p99_ms': percentile(latencies, 0.99),
+            'queries_mean': round(sum(queries) / len(queries), 2) if queries else None,
+            'queries_max': max(queries) if queries else None,
+        }
+
+    def summarize(self, samples, elapsed, options, targets):
+        routes = {}
+        for name in dict.fromkeys(sample[0] for sample in samples):
+            routes[name] = self.route_stats([sample for sample in samples if sample[0] == name], elapsed)
+        total = self.route_stats(samples, elapsed)
+        return {
+            'commit': git_commit(),
+            'started': timezone.now().isoformat(),
+            'mode': 'server' if options['server'] else 'client',
+            'concurrency': options['concurrency'],
+            'cache': not options['no_cache'],
+            'async_views': settings.ASYNC_VIEWS,
+            'database': connections['default'].vendor,
+            'dataset': {'cars': targets['total_cars'], 'categories': len(targets['categories'])},
+            'elapsed_s': round(elapsed, 3),
+            'total': total,
+            'routes': routes,
+        }
+
+    def report(self, results):
+        self.stdout.write(f"{'Маршрут':20} {'запр.':>6} {'ош.':>4} {'p50, мс':>8} {'p95, мс':>8} "
+                          f"{'p99, мс':>8} {'SQL':>6}")
+        for name, stats in [*results['routes'].items(), ('итого', results['total'])]:
+            queries = '-' if stats['queries_mean'] is None else f"{stats['queries_mean']:.1f}"
+            self.stdout.write(f"{name:20} {stats['requests']:6} {stats['errors']:4} {stats['p50_ms']:8.2f} "
+                              f"{stats['p95_ms']:8.2f} {stats['p99_ms']:8.2f} {queries:>6}")
+        self.stdout.write(f"Пропускная способность: {results['total']['throughput_rps']} запросов/с")
+
+    def compare(self, results, previous):
+        self.stdout.write(f"Сравнение с {previous.get('commit') or 'прошлым прогоном'} (p95 и SQL):")
+        for name, stats in results['routes'].items():
+            old = previous.get('routes', {}).get(name)
+            if not old or not old.get('p95_ms'):
+                continue
+            change = (stats['p95_ms'] - old['p95_ms']) / old['p95_ms'] * 100
+            self.stdout.write(f"{name:20} p95 {old['p95_ms']:8.2f} -> {stats['p95_ms']:8.2f} ({change:+.0f}%), "
+                              f"SQL {old.get('queries_mean')} -> {stats['queries_mean']}")
+
+    def save(self, results, output):
+        if output is None:
+            stamp = timezone.now().strftime('%Y%m%d-%H%M%S')
+            output = Path(settings.BASE_DIR) / 'benchmarks' / f"{stamp}-{results['commit'] or 'local'}.json"
+        output = Path(output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding='utf-8')
+        self.stdout.write(self.style.SUCCESS(f"Результаты записаны в {output}"))
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from cars import similar
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает таблицу похожих машин по характеристикам"
+
+    def add_arguments(self, parser):
+        parser.add_argument('-k', type=int, default=None,
+                            help="Соседей на машину (по умолчанию SIMILAR_CARS_COUNT)")
+        parser.add_argument('--stale', action='store_true',
+                            help="Только машины, изменённые после прошлого пересчёта (для запуска по расписанию)")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        if options['stale']:
+            count = similar.refresh_stale(options['k'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Пересчитано машин: {count} за {time.monotonic() - started:.1f} с"
+            ))
+            return
+        total = similar.rebuild(options['k'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Записано пар: {total} за {time.monotonic() - started:.1f} с"
+        ))
@@ -0,0 +1,27 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from cars import catalog_io
+
+
+class Command(BaseCommand):
+    help = "Выгружает каталог машин в CSV или JSON Lines, читая таблицу курсором"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', '-o', default=None, help="Файл (по умолчанию stdout)")
+        parser.add_argument('--format', choices=catalog_io.FORMATS, default=None,
+                            help="Формат файла (по умолчанию по расширению, иначе csv)")
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help="Строк, читаемых из БД за раз")
+
+    def handle(self, *args, **options):
+        path = options['output']
+        fmt = options['format'] or catalog_io.detect_format(path)
+        lines = catalog_io.serialize(catalog_io.export_rows(options['chunk_size']), fmt)
+        if path is None:
+            sys.stdout.writelines(lines)
+            return
+        with open(path, 'w', encoding='utf-8', newline='') as stream:
+            stream.writelines(lines)
+        self.stderr.write(self.style.SUCCESS(f"Каталог выгружен в {path}"))
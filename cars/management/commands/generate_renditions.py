@@ -0,0 +1,42 @@
+import logging
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from cars import renditions
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Строит уменьшенные копии и WebP для уже загруженных изображений"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help="Пересоздать копии, даже если они уже есть")
+
+    def handle(self, *args, **options):
+        for label, fields in renditions.RENDITION_FIELDS.items():
+            model = apps.get_model(label)
+            done = failed = 0
+            for instance in model._base_manager.only('pk', *fields).iterator(chunk_size=500):
+                for field in fields:
+                    field_file = getattr(instance, field)
+                    if not field_file:
+                        continue
+                    if options['force']:
+                        try:
+                            renditions.generate(field_file)
+                            meta = True
+                        except Exception:
+                            logger.exception("Не удалось построить копии для %s pk=%s (%s)",
+                                             label, instance.pk, field_file.name)
+                            meta = None
+                    else:
+                        meta = renditions.get_meta(field_file)
+                    if meta:
+                        done += 1
+                    else:
+                        failed += 1
+            self.stdout.write(f"{label}: готово {done}, ошибок {failed}")
+        self.stdout.write(self.style.SUCCESS("Копии изображений построены"))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from cars import catalog_io
+
+
+class Command(BaseCommand):
+    help = ("Загружает машины из CSV или JSON Lines пачками: существующие (по слагу) обновляются, "
+            "новые создаются")
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Файл каталога")
+        parser.add_argument('--format', choices=catalog_io.FORMATS, default=None,
+                            help="Формат файла (по умолчанию по расширению)")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Строк в одной пачке")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size должен быть положительным")
+        try:
+            result = catalog_io.import_file(options['path'], options['format'], options['batch_size'])
+        except OSError as error:
+            raise CommandError(f"Не удалось прочитать файл: {error}")
+
+        for message in result.errors:
+            self.stderr.write(message)
+        self.stdout.write(f"Создано: {result.created}, обновлено: {result.updated}, "
+                          f"пропущено: {result.skipped}")
+        if result.created or result.updated:
+            self.stdout.write("Похожие машины пересчитываются командой compute_similar_cars")
+        self.stdout.write(self.style.SUCCESS("Импорт завершён"))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from cars import counters, stats
+
+
+class Command(BaseCommand):
+    help = ("Пересчитывает денормализованные счётчики каталога (машины, лайки, фото, комментарии) "
+            "и статистику сайта")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--estimate-threshold', type=int, default=None,
+            help="Для таблиц больше этого числа строк брать оценку планировщика PostgreSQL "
+                 "(по умолчанию SITE_STATS_ESTIMATE_THRESHOLD)",
+        )
+
+    def handle(self, *args, **options):
+        for model, field, updated in counters.reconcile():
+            self.stdout.write(f"{model._meta.label}.{field}: обновлено строк {updated}")
+        site_stats = stats.reconcile(options['estimate_threshold'])
+        self.stdout.write(f"Статистика сайта: машин {site_stats.cars}, категорий {site_stats.categories}, "
+                          f"статей {site_stats.articles}")
+        self.stdout.write(self.style.SUCCESS("Счётчики пересчитаны"))
@@ -0,0 +1,103 @@
+"""
+Производители и их машины.
+
+Раньше производитель машины угадывался на лету по вхождению названия
+бренда в название машины (LIKE '%...%' на каждую строку админки), что
+сканировало всю таблицу и путало бренды с пересекающимися названиями.
+Теперь связь хранится во внешнем ключе Cars.manufacturer; BrandMatcher
+заполняет его для существующих машин (миграция 0009 и команда
+assign_manufacturers) - пачками по первичному ключу.
+
+Сводка по брендам (число машин, разброс цен, средняя мощность) считается
+одним GROUP BY по всем производителям и кешируется под версией моделей
+Cars и Manufacturer из кеша страниц, так что любое изменение каталога
+её сбрасывает.
+"""
+import re
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Avg, Count, Max, Min
+
+from . import page_cache
+from .models import Cars, Manufacturer
+
+BATCH_SIZE = 2000
+STATS_PREFIX = 'manufacturer-stats:'
+
+EMPTY_STATS = {'cars': 0, 'price_min': None, 'price_max': None, 'horsepower_avg': None}
+
+
+class BrandMatcher:
+    """
+    Производитель по названию машины: бренд должен входить в название
+    отдельным словом. Из нескольких подходящих берётся тот, что стоит
+    раньше, а при равенстве - более длинный ("Mercedes-AMG", а не "Mercedes").
+    """
+
+    def __init__(self, brands):
+        brands = sorted(((pk, name.strip().casefold()) for pk, name in brands if name.strip()),
+                        key=lambda brand: -len(brand[1]))
+        self.patterns = [(pk, re.compile(rf'(?<!\w){re.escape(name)}(?!\w)')) for pk, name in brands]
+
+    def __bool__(self):
+        return bool(self.patterns)
+
+    def match(self, car_name):
+        text = car_name.casefold()
+        best = None
+        for pk, pattern in self.patterns:
+            found = pattern.search(text)
+            if found and (best is None or found.start() < best[0]):
+                best = (found.start(), pk)
+        return best[1] if best else None
+
+
+def backfill(cars_model=Cars, manufacturer_model=Manufacturer, batch_size=BATCH_SIZE,
+             using=DEFAULT_DB_ALIAS):
+    """
+    Проставляет производителя машинам, у которых его нет. Машины читаются
+    пачками по первичному ключу, каждая пачка пишется своей транзакцией -
+    по UPDATE на производителя. Модели передаются параметрами, чтобы
+    функцию можно было вызвать из миграции. Возвращает число машин,
+    получивших производителя.
+    """
+    matcher = BrandMatcher(manufacturer_model._base_manager.using(using).values_list('pk', 'name'))
+    if not matcher:
+        return 0
+    cars = cars_model._base_manager.using(using).filter(manufacturer__isnull=True).order_by('pk')
+    last_pk, assigned = 0, 0
+    while True:
+        rows = list(cars.filter(pk__gt=last_pk).values_list('pk', 'name')[:batch_size])
+        if not rows:
+            return assigned
+        last_pk = rows[-1][0]
+        groups = defaultdict(list)
+        for pk, name in rows:
+            brand = matcher.match(name)
+            if brand is not None:
+                groups[brand].append(pk)
+        with transaction.atomic(using=using):
+            for brand, pks in groups.items():
+                assigned += cars_model._base_manager.using(using).filter(pk__in=pks).update(manufacturer_id=brand)
+
+
+def brand_stats():
+    """{id производителя: сводка} по активным машинам одним запросом с кешем"""
+    key = STATS_PREFIX + page_cache.get_version(Cars, Manufacturer)
+    stats = cache.get(key)
+    if stats is None:
+        rows = (Cars.objects.filter(is_active=True, manufacturer__isnull=False)
+                .order_by()
+                .values('manufacturer')
+                .annotate(cars=Count('pk'), price_min=Min('price'), price_max=Max('price'),
+                          horsepower_avg=Avg('horsepower')))
+        stats = {row.pop('manufacturer'): row for row in rows}
+        cache.set(key, stats, settings.PAGE_CACHE_TIMEOUT)
+    return stats
+
+
+def brand_summary(manufacturer):
+    return brand_stats().get(manufacturer.pk, EMPTY_STATS)
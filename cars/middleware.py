@@ -0,0 +1,117 @@
+import mimetypes
+import os
+import re
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+# Имя с хешем от ManifestStaticFilesStorage: base.3f2a9c1b7e4d.css
+HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+DEFAULT_CACHE = 'public, max-age=3600'
+
+# Порядок предпочтения сжатых копий, см. CompressedManifestStaticFilesStorage
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def accepted_encodings(request):
+    """Кодировки из Accept-Encoding, кроме явно запрещённых через q=0"""
+    accepted = set()
+    for part in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        coding, *params = part.split(';')
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+class StaticFilesMiddleware:
+    """
+    Отдаёт собранную collectstatic статику из STATIC_ROOT без обращения
+    к URL-маршрутам: файлы с хешем в имени - с заголовком immutable на год,
+    остальные - на час. Если клиент принимает br/gzip и рядом лежит
+    сжатая копия, отдаётся она.
+
+    Пока STATIC_ROOT не собран, запросы проходят дальше (в DEBUG статику
+    раздаёт runserver из STATICFILES_DIRS).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.prefix = '/' + settings.STATIC_URL.lstrip('/') if settings.STATIC_URL else None
+        self.root = Path(settings.STATIC_ROOT) if settings.STATIC_ROOT else None
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        name = self.static_name(request)
+        if name is not None:
+            response = self.serve(request, name)
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        name = self.static_name(request)
+        if name is not None:
+            # Проверка и открытие файла - блокирующий ввод-вывод
+            response = await sync_to_async(self.serve)(request, name)
+            if response is not None:
+                return response
+        return await self.get_response(request)
+
+    def static_name(self, request):
+        """Имя файла относительно STATIC_ROOT или None, если запрос не к статике"""
+        if (self.prefix and self.root and request.method in ('GET', 'HEAD')
+                and request.path_info.startswith(self.prefix)):
+            return request.path_info[len(self.prefix):]
+        return None
+
+    def serve(self, request, name):
+        try:
+            path = safe_join(self.root, name)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(path) or path.endswith(('.gz', '.br')):
+            return None
+
+        content_type, _ = mimetypes.guess_type(path)
+        encoding, served = None, path
+        accepted = accepted_encodings(request)
+        for coding, suffix in ENCODINGS:
+            if coding in accepted and os.path.isfile(path + suffix):
+                encoding, served = coding, path + suffix
+                break
+
+        stat = os.stat(served)
+        if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), stat.st_mtime):
+            response = HttpResponseNotModified()
+        else:
+            response = FileResponse(open(served, 'rb'), filename=os.path.basename(path),
+                                    content_type=content_type or 'application/octet-stream')
+            if encoding:
+                response['Content-Encoding'] = encoding
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        response['Cache-Control'] = IMMUTABLE_CACHE if HASHED_NAME_RE.search(name) else DEFAULT_CACHE
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-18 02:01
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cars',
+            index=models.Index(fields=['cat', '-created', '-id'], name='cars_cat_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 6.0 on 2026-10-18 02:02
+
+from django.db import migrations, models
+
+
+def build_paths(apps, schema_editor):
+    """Заполняет path/depth для уже существующих категорий обходом в ширину"""
+    Category = apps.get_model('cars', 'Category')
+    parents = dict(Category.objects.values_list('pk', 'parent_id'))
+    children = {}
+    for pk, parent_id in parents.items():
+        children.setdefault(parent_id, []).append(pk)
+
+    paths = {}
+    queue = [(pk, '', 0) for pk in children.get(None, [])]
+    while queue:
+        pk, prefix, depth = queue.pop()
+        path = f"{prefix}{pk:010d}/"
+        paths[pk] = (path, depth)
+        queue.extend((child, path, depth + 1) for child in children.get(pk, []))
+
+    categories = list(Category.objects.filter(pk__in=paths))
+    for category in categories:
+        category.path, category.depth = paths[category.pk]
+    Category.objects.bulk_update(categories, ['path', 'depth'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0002_cars_cat_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Уровень вложенности'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255, verbose_name='Путь в дереве'),
+        ),
+        migrations.RunPython(build_paths, migrations.RunPython.noop),
+    ]
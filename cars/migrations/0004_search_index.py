@@ -0,0 +1,24 @@
+# Generated by Django 6.0 on 2026-10-18 02:40
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    from cars.search import create_index
+    create_index(schema_editor)
+
+
+def drop_search_index(apps, schema_editor):
+    from cars.search import drop_index
+    drop_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0003_category_tree_path'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 6.0 on 2026-10-18 02:50
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    """Первичное заполнение счётчиков по существующим данным"""
+    Category = apps.get_model('cars', 'Category')
+    Cars = apps.get_model('cars', 'Cars')
+    CarPhoto = apps.get_model('cars', 'CarPhoto')
+    Article = apps.get_model('cars', 'Article')
+    Comment = apps.get_model('cars', 'Comment')
+
+    def count(model, fk, **filters):
+        rows = (model.objects.filter(**{fk: OuterRef('pk')}, **filters).order_by()
+                .values(fk).annotate(total=Count('pk')).values('total'))
+        return Coalesce(Subquery(rows), 0)
+
+    Category.objects.update(cars_count=count(Cars, 'cat'))
+    Cars.objects.update(
+        likes_count=count(Cars.likes.through, 'cars'),
+        photos_count=count(CarPhoto, 'car'),
+        comments_count=count(Comment, 'car', is_active=True),
+    )
+    Article.objects.update(comments_count=count(Comment, 'article', is_active=True))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0004_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество комментариев'),
+        ),
+        migrations.AddField(
+            model_name='cars',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество комментариев'),
+        ),
+        migrations.AddField(
+            model_name='cars',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество лайков'),
+        ),
+        migrations.AddField(
+            model_name='cars',
+            name='photos_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество фото'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='cars_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество машин'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
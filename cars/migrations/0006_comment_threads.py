@@ -0,0 +1,60 @@
+# Generated by Django 6.0 on 2026-10-18 03:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_threads(apps, schema_editor):
+    """Проставляет root/depth существующим ответам обходом от корней"""
+    Comment = apps.get_model('cars', 'Comment')
+    parents = dict(Comment.objects.values_list('pk', 'parent_id'))
+    children = {}
+    for pk, parent_id in parents.items():
+        if parent_id is not None:
+            children.setdefault(parent_id, []).append(pk)
+
+    values = {}
+    stack = [(pk, None, 0) for pk, parent_id in parents.items() if parent_id is None]
+    while stack:
+        pk, root_id, depth = stack.pop()
+        if depth:
+            values[pk] = (root_id, depth)
+        stack.extend((child, root_id or pk, depth + 1) for child in children.get(pk, []))
+
+    pks = list(values)
+    for start in range(0, len(pks), 1000):
+        batch = list(Comment.objects.filter(pk__in=pks[start:start + 1000]))
+        for comment in batch:
+            comment.root_id, comment.depth = values[comment.pk]
+        Comment.objects.bulk_update(batch, ['root', 'depth'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0005_catalog_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Уровень вложенности'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='root',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='thread', to='cars.comment', verbose_name='Корневой комментарий'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['car', 'is_active', 'created'], name='comment_car_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['article', 'is_active', 'created'], name='comment_article_active_idx'),
+        ),
+        migrations.RunPython(fill_threads, migrations.RunPython.noop),
+    ]
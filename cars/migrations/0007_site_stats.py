@@ -0,0 +1,41 @@
+# Generated by Django 6.0 on 2026-10-18 03:40
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_stats(apps, schema_editor):
+    """Первая строка статистики по существующим данным"""
+    SiteStats = apps.get_model('cars', 'SiteStats')
+    SiteStats.objects.create(
+        pk=1,
+        cars=apps.get_model('cars', 'Cars').objects.count(),
+        categories=apps.get_model('cars', 'Category').objects.count(),
+        articles=apps.get_model('cars', 'Article').objects.count(),
+        reconciled=timezone.now(),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0006_comment_threads'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SiteStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cars', models.PositiveIntegerField(default=0, verbose_name='Машин')),
+                ('categories', models.PositiveIntegerField(default=0, verbose_name='Категорий')),
+                ('articles', models.PositiveIntegerField(default=0, verbose_name='Статей')),
+                ('reconciled', models.DateTimeField(blank=True, null=True, verbose_name='Последний пересчёт')),
+            ],
+            options={
+                'verbose_name': 'Статистика сайта',
+                'verbose_name_plural': 'Статистика сайта',
+            },
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 6.0 on 2026-10-18 04:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0007_site_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarCar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='Сходство')),
+                ('car', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_cars', to='cars.cars', verbose_name='Машина')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='cars.cars', verbose_name='Похожая машина')),
+            ],
+            options={
+                'verbose_name': 'Похожая машина',
+                'verbose_name_plural': 'Похожие машины',
+                'indexes': [models.Index(fields=['car', '-score'], name='similar_car_score_idx')],
+                'constraints': [models.UniqueConstraint(fields=('car', 'similar'), name='similar_car_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 6.0 on 2026-10-18 06:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def assign_manufacturers(apps, schema_editor):
+    """Производитель существующих машин по названию, пачками"""
+    from cars.manufacturers import backfill
+
+    backfill(apps.get_model('cars', 'Cars'), apps.get_model('cars', 'Manufacturer'),
+             using=schema_editor.connection.alias)
+
+
+class Migration(migrations.Migration):
+    # Каждая пачка заполнения коммитится отдельно, а не одной транзакцией
+    # на всю таблицу
+    atomic = False
+
+    dependencies = [
+        ('cars', '0008_similar_cars'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cars',
+            name='manufacturer',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='cars', to='cars.manufacturer', verbose_name='Производитель'),
+        ),
+        migrations.AddIndex(
+            model_name='cars',
+            index=models.Index(fields=['manufacturer', '-created', '-id'], name='cars_brand_created_id_idx'),
+        ),
+        migrations.RunPython(assign_manufacturers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 6.0 on 2026-10-18 07:20
+
+from django.db import migrations
+
+
+def restore_search_triggers(apps, schema_editor):
+    """0005 и 0009 пересоздают cars_cars в SQLite, и триггеры FTS5 пропадают"""
+    from cars.search import restore_triggers
+    restore_triggers(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0009_cars_manufacturer'),
+    ]
+
+    operations = [
+        migrations.RunPython(restore_search_triggers, migrations.RunPython.noop),
+    ]
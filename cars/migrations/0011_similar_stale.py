@@ -0,0 +1,22 @@
+# Generated by Django 6.0 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0010_restore_search_triggers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cars',
+            name='similar_stale',
+            field=models.BooleanField(default=True, editable=False, verbose_name='Похожие устарели'),
+        ),
+        migrations.AddIndex(
+            model_name='cars',
+            index=models.Index(condition=models.Q(('similar_stale', True)), fields=['id'], name='cars_similar_stale_idx'),
+        ),
+    ]
@@ -1,9 +1,31 @@
 from django.contrib.auth.models import User
-from django.db import models
-from django.utils.text import slugify
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Substr
 
+from .slugs import unique_slug
 
-class Category(models.Model):
+
+class CounterFieldsMixin:
+    """
+    Денормализованные счётчики (cars/counters.py), просмотры
+    (cars/view_counter.py) и подобные служебные поля меняются только
+    UPDATE. Обычный save() уже загруженного объекта записал бы их значения
+    на момент загрузки и затёр чужие изменения, поэтому эти поля в него
+    не попадают.
+    """
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (not self._state.adding and not args and kwargs.get('update_fields') is None
+                and not kwargs.get('force_insert')):
+            kwargs['update_fields'] = [field.name for field in self._meta.concrete_fields
+                                       if not field.primary_key and field.name not in self.counter_fields]
+        super().save(*args, **kwargs)
+
+
+class Category(CounterFieldsMixin, models.Model):
     title = models.CharField(max_length=100, verbose_name="Название категории")
     slug = models.SlugField(max_length=100, verbose_name="Слаг")
     description = models.TextField(verbose_name="Описание категории")
@@ -11,14 +33,87 @@ class Category(models.Model):
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
     parent = models.ForeignKey('self',on_delete=models.CASCADE, null=True,blank=True, related_name='children',verbose_name="Родительская категория")
+    # Материализованный путь: id всех предков и самой категории, например "0000000001/0000000007/"
+    path = models.CharField(max_length=255, db_index=True, editable=False, default='', verbose_name="Путь в дереве")
+    depth = models.PositiveSmallIntegerField(default=0, editable=False, verbose_name="Уровень вложенности")
+    # Денормализованный счётчик, см. cars/counters.py
+    cars_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Количество машин")
+
+    PATH_STEP = 10
+    counter_fields = ('cars_count',)
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def path_segment(cls, pk):
+        return f"{pk:0{cls.PATH_STEP}d}/"
+
+    def clean(self):
+        super().clean()
+        if self.pk and self.parent_id and self.parent_id in self.subtree_ids():
+            raise ValidationError({'parent': "Категория не может быть вложена сама в себя"})
+
     def save(self, *args, **kwargs):
         if not self.slug:
-            self.slug = slugify(self.title)
-        super().save(*args, **kwargs)
+            self.slug = unique_slug(Category, self.title, exclude_pk=self.pk, fallback='category')
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'parent' not in update_fields:
+            super().save(*args, **kwargs)
+            return
+
+        prefix, depth = '', 0
+        if self.parent_id:
+            parent_path, parent_depth = (Category.objects
+                                         .values_list('path', 'depth')
+                                         .get(pk=self.parent_id))
+            if self.path and parent_path.startswith(self.path):
+                raise ValueError("Категория не может быть вложена сама в себя")
+            prefix, depth = parent_path, parent_depth + 1
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self._update_path(prefix, depth)
+
+    def _update_path(self, prefix, depth):
+        """
+        Пересчитывает путь категории после сохранения. При переносе в другую
+        ветку пути всех потомков переписываются одним UPDATE.
+        """
+        new_path = prefix + self.path_segment(self.pk)
+        old_path, old_depth = self.path, self.depth
+        if new_path == old_path and depth == old_depth:
+            return
+
+        Category.objects.filter(pk=self.pk).update(path=new_path, depth=depth)
+        if old_path:
+            (Category.objects
+             .filter(path__startswith=old_path)
+             .exclude(pk=self.pk)
+             .update(path=Concat(Value(new_path), Substr('path', len(old_path) + 1)),
+                     depth=F('depth') + (depth - old_depth)))
+        self.path, self.depth = new_path, depth
+
+    def ancestor_ids(self):
+        """id предков от корня к непосредственному родителю"""
+        return [int(part) for part in self.path.split('/')[:-2]]
+
+    def get_ancestors(self):
+        """Предки от корня вниз, одним запросом по первичному ключу"""
+        return Category.objects.filter(pk__in=self.ancestor_ids()).order_by('depth')
+
+    def get_descendants(self, include_self=False):
+        """Все потомки на любой глубине, одним запросом по индексу path"""
+        queryset = Category.objects.filter(path__startswith=self.path)
+        if not include_self:
+            queryset = queryset.exclude(pk=self.pk)
+        return queryset
+
+    def subtree_ids(self):
+        return set(self.get_descendants(include_self=True).values_list('pk', flat=True))
+
+    def subtree_cars(self):
+        """Машины категории и всех её подкатегорий"""
+        return Cars.objects.filter(cat__path__startswith=self.path)
 
     class Meta:
         verbose_name = 'Категория'
@@ -27,7 +122,7 @@ class Category(models.Model):
 
 
 
-class Cars(models.Model):
+class Cars(CounterFieldsMixin, models.Model):
     name = models.CharField(max_length=100, verbose_name='Название машины')
     slug = models.SlugField(max_length=100, verbose_name="Слаг")
     description =  models.TextField(verbose_name='Описание')
@@ -45,13 +140,23 @@ class Cars(models.Model):
     likes = models.ManyToManyField(User,related_name='car_likes',blank=True,verbose_name='Лайки')
     views = models.PositiveIntegerField(default=0, verbose_name='Просмотры')
     cat = models.ForeignKey(Category, on_delete=models.CASCADE)
+    manufacturer = models.ForeignKey('Manufacturer', on_delete=models.SET_NULL, null=True, blank=True,
+                                     related_name='cars', verbose_name='Производитель')
+    # Денормализованные счётчики, см. cars/counters.py
+    likes_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество лайков')
+    photos_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество фото')
+    comments_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество комментариев')
+    # Соседей машины нужно пересчитать (cars/similar.py, compute_similar_cars --stale)
+    similar_stale = models.BooleanField(default=True, editable=False, verbose_name='Похожие устарели')
+
+    counter_fields = ('views', 'likes_count', 'photos_count', 'comments_count', 'similar_stale')
 
     def __str__(self):
         return self.name
 
     def save(self, *args, **kwargs):
         if not self.slug:
-            self.slug = slugify(self.name)
+            self.slug = unique_slug(Cars, self.name, exclude_pk=self.pk, fallback='car')
         super().save(*args, **kwargs)
 
     class Meta:
@@ -63,6 +168,9 @@ class Cars(models.Model):
             models.Index(fields=['created']),
             models.Index(fields=['price']),
             models.Index(fields=['year']),
+            models.Index(fields=['cat', '-created', '-id'], name='cars_cat_created_id_idx'),
+            models.Index(fields=['manufacturer', '-created', '-id'], name='cars_brand_created_id_idx'),
+            models.Index(fields=['id'], condition=models.Q(similar_stale=True), name='cars_similar_stale_idx'),
         ]
 
 
@@ -108,7 +216,7 @@ class CarVideo(models.Model):
         verbose_name_plural = 'Видео обзоры'
 
 
-class Article(models.Model):
+class Article(CounterFieldsMixin, models.Model):
     title = models.CharField(max_length=200, verbose_name="Заголовок")
     slug = models.SlugField(max_length=200, unique=True)
     content = models.TextField(verbose_name="Содержание")
@@ -118,9 +226,12 @@ class Article(models.Model):
     cars = models.ManyToManyField(Cars, blank=True, verbose_name="Связанные автомобили")
     views = models.PositiveIntegerField(default=0, verbose_name="Просмотры")
     is_published = models.BooleanField(default=True, verbose_name="Опубликовано")
+    comments_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Количество комментариев")
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
 
+    counter_fields = ('views', 'comments_count')
+
     def __str__(self):
         return self.title
 
@@ -139,19 +250,65 @@ class Comment(models.Model):
                                 related_name='comments', verbose_name="Статья")
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True,
                                related_name='replies', verbose_name="Ответ на комментарий")
+    # Корень ветки и глубина - чтобы загрузить всё дерево ответов одним запросом
+    root = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, editable=False,
+                             related_name='thread', verbose_name="Корневой комментарий")
+    depth = models.PositiveSmallIntegerField(default=0, editable=False, verbose_name="Уровень вложенности")
     is_active = models.BooleanField(default=True, verbose_name="Активен")
     created = models.DateTimeField(auto_now_add=True)
 
+    def save(self, *args, **kwargs):
+        if self.parent_id:
+            parent_root_id, parent_depth = (Comment.objects
+                                            .values_list('root_id', 'depth')
+                                            .get(pk=self.parent_id))
+            self.root_id = parent_root_id or self.parent_id
+            self.depth = parent_depth + 1
+        else:
+            self.root_id, self.depth = None, 0
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
         ordering = ['-created']
+        indexes = [
+            models.Index(fields=['car', 'is_active', 'created'], name='comment_car_active_idx'),
+            models.Index(fields=['article', 'is_active', 'created'], name='comment_article_active_idx'),
+        ]
 
 
+class SimilarCar(models.Model):
+    """
+    Предрасчитанные похожие машины (cars/similar.py): для каждой машины -
+    до SIMILAR_CARS_COUNT соседей по характеристикам со степенью сходства
+    """
+    car = models.ForeignKey(Cars, on_delete=models.CASCADE, related_name='similar_cars', verbose_name="Машина")
+    similar = models.ForeignKey(Cars, on_delete=models.CASCADE, related_name='+', verbose_name="Похожая машина")
+    score = models.FloatField(verbose_name="Сходство")
 
+    class Meta:
+        verbose_name = 'Похожая машина'
+        verbose_name_plural = 'Похожие машины'
+        constraints = [
+            models.UniqueConstraint(fields=['car', 'similar'], name='similar_car_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['car', '-score'], name='similar_car_score_idx'),
+        ]
 
 
+class SiteStats(models.Model):
+    """
+    Общая статистика сайта одной строкой (pk=1). Сдвигается сигналами
+    при создании/удалении записей, пересчитывается командой
+    reconcile_counters - чтобы страницы не делали COUNT(*) по большим таблицам.
+    """
+    cars = models.PositiveIntegerField(default=0, verbose_name="Машин")
+    categories = models.PositiveIntegerField(default=0, verbose_name="Категорий")
+    articles = models.PositiveIntegerField(default=0, verbose_name="Статей")
+    reconciled = models.DateTimeField(null=True, blank=True, verbose_name="Последний пересчёт")
 
-
-
-
+    class Meta:
+        verbose_name = 'Статистика сайта'
+        verbose_name_plural = 'Статистика сайта'
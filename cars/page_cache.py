@@ -0,0 +1,166 @@
+"""
+Кеш страниц каталога с инвалидацией по версиям моделей.
+
+У каждой модели каталога в кеше лежит номер версии, который сигналы
+(cars.signals) увеличивают после сохранения или удаления записи.
+Версии всех моделей, от которых зависит страница, входят в ключ кеша,
+поэтому после изменения данных старые записи просто перестают
+использоваться и вытесняются сами - угадывать TTL не нужно.
+
+Анонимные пользователи получают ответ целиком из кеша. Для
+авторизованных страница собирается заново, а тяжёлые куски шаблона
+кешируются тегом {% cache %} с тем же cache_version; пользовательские
+части (лайки, меню) остаются вне кешируемых блоков.
+
+Версии меняются не только сигналами: счётчики, которые двигаются через
+UPDATE (cars/counters.py), увеличивают версию модели сами.
+
+Версии и страницы должны лежать в общем для всех процессов кеше
+(Redis, Memcached - настройка CACHE_BACKEND). С LocMemCache по умолчанию
+у каждого воркера своя копия: запись в одном процессе сбрасывает версию
+только в нём, а остальные отдают старые страницы до PAGE_CACHE_TIMEOUT.
+Так можно работать только с одним процессом (runserver, тесты).
+"""
+import hashlib
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+
+from . import db_router
+
+VERSION_PREFIX = 'version:'
+PAGE_PREFIX = 'page:'
+LAST_WRITE_KEY = VERSION_PREFIX + 'last-write'
+
+
+def version_key(model):
+    return VERSION_PREFIX + model._meta.label_lower
+
+
+def initial_version():
+    # Версия после вытеснения ключа не должна совпасть с уже использованной
+    return int(time.time() * 1000)
+
+
+def views_key(model):
+    """
+    Версия просмотров модели. Буфер просмотров (cars/view_counter.py) пишет
+    их каждые несколько секунд; сбрасывать из-за этого все страницы модели
+    незачем, поэтому у просмотров своя версия - для ответов, где они видны
+    """
+    return VERSION_PREFIX + 'views:' + model._meta.label_lower
+
+
+def get_key_versions(*keys):
+    """Текущие номера версий по ключам; отсутствующие заводятся заново"""
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, initial_version(), None)
+            versions[key] = cache.get(key)
+    return '.'.join(str(versions[key]) for key in keys)
+
+
+def bump_key_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, initial_version(), None)
+
+
+def get_version(*models):
+    """Общая версия набора моделей - строка для ключа кеша"""
+    return get_key_versions(*(version_key(model) for model in models))
+
+
+def bump_version(model):
+    bump_key_version(version_key(model))
+    cache.set(LAST_WRITE_KEY, time.time(), None)
+
+
+def recently_written(seconds):
+    """Менялся ли каталог за последние seconds секунд"""
+    return time.time() - cache.get(LAST_WRITE_KEY, 0) < seconds
+
+
+def page_key(request, version):
+    url = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    return f"{PAGE_PREFIX}{request.method}:{url}:{version}"
+
+
+def is_cacheable(request):
+    """
+    Целиком кешируются только GET/HEAD анонимов без ожидающих
+    flash-сообщений (они лежат в cookie и показываются один раз)
+    """
+    return (request.method in ('GET', 'HEAD')
+            and not request.user.is_authenticated
+            and CookieStorage.cookie_name not in request.COOKIES)
+
+
+class CachedPageMixin:
+    """
+    Кеш страницы для анонимов и cache_version/cache_timeout в контексте
+    для фрагментного кеширования. cache_models - модели, от которых
+    зависит содержимое страницы.
+    """
+    cache_models = ()
+    cache_timeout = None
+
+    def get_cache_timeout(self):
+        if self.cache_timeout is not None:
+            return self.cache_timeout
+        return settings.PAGE_CACHE_TIMEOUT
+
+    def get_cache_version(self):
+        if not hasattr(self, '_cache_version'):
+            self._cache_version = get_version(*self.cache_models)
+        return self._cache_version
+
+    def get_cached_response(self, request):
+        """(ключ, ответ из кеша или None); ключ None - страница не кешируется"""
+        # Версия нужна и для фрагментного кеша авторизованных - берём её здесь
+        version = self.get_cache_version()
+        if not is_cacheable(request):
+            return None, None
+        key = page_key(request, version)
+        return key, cache.get(key)
+
+    def store_response(self, key, response):
+        if key is None or response.status_code != 200 or response.streaming:
+            return
+        # Реплика может ещё не догнать только что сделанную запись: такую
+        # страницу не кладём в кеш под новой версией
+        if db_router.using_replica() and recently_written(settings.REPLICA_PIN_SECONDS):
+            return
+        timeout = self.get_cache_timeout()
+        if hasattr(response, 'render') and not response.is_rendered:
+            response.add_post_render_callback(lambda rendered: cache.set(key, rendered, timeout))
+        else:
+            cache.set(key, response, timeout)
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.view_is_async:
+            return self._cached_dispatch_async(request, *args, **kwargs)
+        key, response = self.get_cached_response(request)
+        if response is None:
+            response = super().dispatch(request, *args, **kwargs)
+            self.store_response(key, response)
+        return response
+
+    async def _cached_dispatch_async(self, request, *args, **kwargs):
+        # request.user и кеш версий - синхронный код, уводим его в поток
+        key, response = await sync_to_async(self.get_cached_response)(request)
+        if response is None:
+            response = await super().dispatch(request, *args, **kwargs)
+            self.store_response(key, response)
+        return response
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['cache_version'] = self.get_cache_version()
+        context['cache_timeout'] = self.get_cache_timeout()
+        return context
@@ -0,0 +1,128 @@
+"""
+Keyset (курсорная) пагинация.
+
+Вместо OFFSET страница выбирается условием по ключу сортировки
+(например, created + id), поэтому глубокие страницы стоят столько же,
+сколько первая. Вместо COUNT(*) запрашивается на одну запись больше,
+чем нужно, - по ней понятно, есть ли следующая страница.
+"""
+import base64
+import binascii
+import json
+from types import SimpleNamespace
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPage:
+    """Страница keyset-пагинации (по интерфейсу похожа на django Page)"""
+
+    def __init__(self, object_list, paginator, cursor, next_cursor):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Пагинатор по набору полей сортировки, последнее поле должно быть
+    уникальным (обычно id), например ordering=('-created', '-id').
+    """
+
+    def __init__(self, queryset, per_page, ordering=('-created', '-id')):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self.fields = [name.lstrip('-') for name in self.ordering]
+
+    def encode_cursor(self, obj):
+        # Строки .values() (словари) кодируются так же, как объекты модели
+        if isinstance(obj, dict):
+            obj = SimpleNamespace(**{self.queryset.model._meta.get_field(name).attname: obj[name]
+                                     for name in self.fields})
+        values = []
+        for name in self.fields:
+            field = self.queryset.model._meta.get_field(name)
+            values.append(field.value_to_string(obj))
+        raw = json.dumps(values, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        except (binascii.Error, ValueError, UnicodeDecodeError):
+            raise InvalidCursor(cursor)
+        # encode_cursor пишет только строки, а поля сортировки не бывают NULL
+        if (not isinstance(values, list) or len(values) != len(self.fields)
+                or not all(isinstance(value, str) for value in values)):
+            raise InvalidCursor(cursor)
+        try:
+            values = [
+                self.queryset.model._meta.get_field(name).to_python(value)
+                for name, value in zip(self.fields, values)
+            ]
+        except (ValidationError, TypeError, ValueError):
+            raise InvalidCursor(cursor)
+        if any(value is None for value in values):
+            raise InvalidCursor(cursor)
+        return values
+
+    def _after(self, values):
+        """
+        Условие "строго после курсора" в порядке self.ordering:
+        (a > x) OR (a = x AND b > y) OR ...
+        """
+        condition = Q()
+        equal = {}
+        for order, name, value in zip(self.ordering, self.fields, values):
+            lookup = 'lt' if order.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    def get_page(self, cursor=None, load=list):
+        """
+        Возвращает страницу после курсора. Некорректный курсор
+        приводит к InvalidCursor. load превращает queryset страницы
+        в список строк (по умолчанию - объекты модели)
+        """
+        return self._make_page(load(self._page_queryset(cursor)), cursor)
+
+    async def aget_page(self, cursor=None):
+        """То же для асинхронных представлений"""
+        return self._make_page([obj async for obj in self._page_queryset(cursor)], cursor)
+
+    def _page_queryset(self, cursor):
+        queryset = self.queryset.order_by(*self.ordering)
+        if cursor:
+            queryset = queryset.filter(self._after(self.decode_cursor(cursor)))
+        return queryset[:self.per_page + 1]
+
+    def _make_page(self, rows, cursor):
+        next_cursor = None
+        if len(rows) > self.per_page:
+            rows = rows[:self.per_page]
+            next_cursor = self.encode_cursor(rows[-1])
+        return KeysetPage(rows, self, cursor, next_cursor)
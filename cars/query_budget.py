@@ -0,0 +1,152 @@
+"""
+Учёт SQL-запросов на один HTTP-запрос.
+
+track_queries() собирает число запросов, суммарное время в БД и повторы
+одного и того же SQL (признак N+1: одинаковый запрос с разными
+параметрами). Работает без DEBUG, поэтому годится и для продакшена, и для
+тестов.
+
+Обёртка execute_wrapper ставится на каждое соединение при его открытии
+(сигнал connection_created), а активные счётчики хранятся в ContextVar.
+Поэтому учитываются и запросы асинхронных представлений: ORM выполняет их
+в потоке sync_to_async, куда копируется контекст запроса.
+
+QueryBudgetMiddleware считает запросы каждого представления: при DEBUG
+отдаёт их в заголовках X-DB-*, а при превышении порогов
+(QUERY_BUDGET_LOG_QUERIES, QUERY_BUDGET_LOG_TIME_MS) пишет предупреждение
+в лог cars.query_budget.
+"""
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Счётчики track_queries, активные в текущем контексте
+_active = ContextVar('query_budget_stats', default=())
+
+
+class QueryStats:
+    """Накопленные запросы: SQL без параметров и время выполнения"""
+
+    def __init__(self, using=None):
+        self.using = using
+        self.statements = Counter()
+        self.count = 0
+        self.duration = 0.0
+
+    def add(self, alias, sql, duration):
+        if self.using and alias != self.using:
+            return
+        self.duration += duration
+        self.count += 1
+        self.statements[sql] += 1
+
+    @property
+    def duration_ms(self):
+        return self.duration * 1000
+
+    @property
+    def duplicates(self):
+        """{SQL: сколько раз выполнен} для запросов, повторённых больше одного раза"""
+        return {sql: times for sql, times in self.statements.items() if times > 1}
+
+    @property
+    def duplicate_count(self):
+        """Сколько выполнений были лишними повторами"""
+        return sum(times - 1 for times in self.duplicates.values())
+
+    def summary(self, limit=3):
+        lines = [f"{self.count} запросов, {self.duration_ms:.1f} мс, повторов {self.duplicate_count}"]
+        for sql, times in Counter(self.duplicates).most_common(limit):
+            lines.append(f"  x{times}: {sql[:200]}")
+        return '\n'.join(lines)
+
+
+@contextmanager
+def track_queries(using=None):
+    """
+    Считает запросы внутри блока:
+
+        with track_queries() as queries:
+            ...
+        queries.count, queries.duration_ms, queries.duplicates
+    """
+    stats = QueryStats(using)
+    token = _active.set(_active.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _active.reset(token)
+
+
+def collect(execute, sql, params, many, context):
+    """Обёртка execute_wrapper: передаёт запрос активным счётчикам"""
+    active = _active.get()
+    if not active:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        for stats in active:
+            stats.add(context['connection'].alias, sql, duration)
+
+
+def install_collector(connection, **kwargs):
+    """Обработчик connection_created: ставит collect на соединение один раз"""
+    if collect not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, collect)
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return request.path
+    return match.view_name or match._func_path
+
+
+class QueryBudgetMiddleware:
+    """
+    Подключается сразу после StaticFilesMiddleware, чтобы в счёт попали
+    запросы сессии и пользователя. Ответы со статикой до неё не доходят.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        with track_queries() as queries:
+            response = self.get_response(request)
+        return self.report(request, response, queries)
+
+    async def __acall__(self, request):
+        with track_queries() as queries:
+            response = await self.get_response(request)
+        return self.report(request, response, queries)
+
+    def report(self, request, response, queries):
+        if settings.DEBUG:
+            response['X-DB-Queries'] = str(queries.count)
+            response['X-DB-Time'] = f"{queries.duration_ms:.1f}"
+            response['X-DB-Duplicates'] = str(queries.duplicate_count)
+
+        max_queries = settings.QUERY_BUDGET_LOG_QUERIES
+        max_time = settings.QUERY_BUDGET_LOG_TIME_MS
+        if (max_queries and queries.count > max_queries) or (max_time and queries.duration_ms > max_time):
+            logger.warning("%s %s (%s): %s", request.method, request.path, view_name(request),
+                           queries.summary())
+        return response
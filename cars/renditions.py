@@ -0,0 +1,191 @@
+"""
+Уменьшенные копии (рендишены) загруженных изображений.
+
+Для каждого оригинала рядом с ним в том же хранилище создаются копии
+фиксированной ширины в JPEG (PNG, если у оригинала есть прозрачность)
+и в WebP:
+
+    cars/bmw.jpg -> cars/bmw.jpg.320w.jpg, cars/bmw.jpg.320w.webp, ...
+    cars/logo.gif -> cars/logo.gif.320w.jpg, cars/logo.gif.320w.webp, ...
+
+и файл cars/bmw.jpg.meta.json с размерами оригинала, списком готовых ширин,
+расширением копий,
+доминирующим цветом и крошечным превью (data URI) для заглушки.
+Расширение оригинала остаётся в имени, чтобы у cars/bmw.jpg и cars/bmw.png
+не было общих копий.
+Метаданные кешируются, так что шаблонному тегу обычно не нужно
+обращаться к хранилищу.
+
+Копии создаются после сохранения модели (сигналы в cars.signals),
+а для старых файлов - лениво при первом выводе или командой
+generate_renditions.
+"""
+import base64
+import io
+import json
+import logging
+import posixpath
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+# Поля с изображениями, для которых строятся копии
+RENDITION_FIELDS = {
+    'cars.Cars': ('image',),
+    'cars.CarPhoto': ('image',),
+    'cars.Category': ('image',),
+    'cars.Manufacturer': ('logo',),
+    'cars.Article': ('image',),
+    'users.Profile': ('avatar',),
+}
+
+# Версия в префиксе: метаданные в кеше должны соответствовать схеме имён копий
+CACHE_PREFIX = 'rendition:2:'
+CACHE_TIMEOUT = 60 * 60 * 24
+FAILURE_TIMEOUT = 60 * 10
+PLACEHOLDER_WIDTH = 16
+
+
+def get_widths():
+    return tuple(getattr(settings, 'IMAGE_RENDITION_WIDTHS', (160, 320, 640, 1280)))
+
+
+def _split(name):
+    stem, ext = posixpath.splitext(name)
+    return stem, ext.lstrip('.').lower() or 'jpg'
+
+
+def rendition_name(name, width, ext):
+    return f"{name}.{width}w.{ext}"
+
+
+def meta_name(name):
+    return f"{name}.meta.json"
+
+
+def _save(storage, name, content):
+    # Перезаписываем файл, иначе хранилище добавит к имени случайный суффикс
+    if storage.exists(name):
+        storage.delete(name)
+    storage.save(name, ContentFile(content))
+
+
+def _encode(image, fmt, **options):
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, **options)
+    return buffer.getvalue()
+
+
+def generate(field_file):
+    """
+    Строит все копии для файла и возвращает метаданные.
+    Ширины больше оригинала пропускаются - растягивать картинку бессмысленно.
+    """
+    storage, name = field_file.storage, field_file.name
+    with storage.open(name, 'rb') as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        image.load()
+
+    keep_alpha = _split(name)[1] == 'png' and image.mode in ('RGBA', 'LA', 'P')
+    image = image.convert('RGBA' if keep_alpha else 'RGB')
+    original_format = 'PNG' if keep_alpha else 'JPEG'
+    # Расширение по формату, в который копия реально закодирована
+    ext = 'png' if keep_alpha else 'jpg'
+
+    widths = []
+    for width in get_widths():
+        if width >= image.width:
+            continue
+        height = round(image.height * width / image.width)
+        resized = image.resize((width, height), Image.Resampling.LANCZOS)
+        if original_format == 'JPEG':
+            content = _encode(resized, 'JPEG', quality=82, optimize=True, progressive=True)
+        else:
+            content = _encode(resized, 'PNG', optimize=True)
+        _save(storage, rendition_name(name, width, ext), content)
+        _save(storage, rendition_name(name, width, 'webp'), _encode(resized, 'WEBP', quality=80, method=4))
+        widths.append(width)
+
+    red, green, blue = image.convert('RGB').resize((1, 1), Image.Resampling.BOX).getpixel((0, 0))
+    tiny = image.convert('RGB').resize(
+        (PLACEHOLDER_WIDTH, max(1, round(image.height * PLACEHOLDER_WIDTH / image.width))),
+        Image.Resampling.BOX,
+    )
+    meta = {
+        'width': image.width,
+        'height': image.height,
+        'widths': widths,
+        'ext': ext,
+        'color': f"#{red:02x}{green:02x}{blue:02x}",
+        'placeholder': 'data:image/jpeg;base64,'
+                       + base64.b64encode(_encode(tiny, 'JPEG', quality=50)).decode(),
+    }
+    _save(storage, meta_name(name), json.dumps(meta).encode())
+    cache.set(CACHE_PREFIX + name, meta, CACHE_TIMEOUT)
+    return meta
+
+
+def get_meta(field_file, create=True):
+    """
+    Метаданные копий: из кеша, из .meta.json рядом с оригиналом
+    или (create=True) сгенерированные прямо сейчас. None - если
+    оригинал не читается как изображение.
+    """
+    if not field_file:
+        return None
+    name = field_file.name
+    meta = cache.get(CACHE_PREFIX + name)
+    if meta is not None:
+        # False - оригинал недоступен, не пытаемся снова до истечения кеша
+        return meta or None
+    storage = field_file.storage
+    try:
+        if storage.exists(meta_name(name)):
+            with storage.open(meta_name(name), 'rb') as handle:
+                meta = json.load(handle)
+            cache.set(CACHE_PREFIX + name, meta, CACHE_TIMEOUT)
+            return meta
+        if create:
+            return generate(field_file)
+    except FileNotFoundError:
+        # Файл удалён или не загружен - трассировка тут ничего не скажет
+        logger.warning("Нет файла изображения %s", name)
+        cache.set(CACHE_PREFIX + name, False, FAILURE_TIMEOUT)
+    except (OSError, ValueError, UnidentifiedImageError):
+        logger.warning("Не удалось построить копии изображения %s", name, exc_info=True)
+        cache.set(CACHE_PREFIX + name, False, FAILURE_TIMEOUT)
+    return None
+
+
+def srcset(field_file, meta, fmt=None):
+    """Строка srcset по готовым ширинам плюс оригинал"""
+    storage = field_file.storage
+    ext = fmt or meta['ext']
+    items = [f"{storage.url(rendition_name(field_file.name, width, ext))} {width}w"
+             for width in meta['widths']]
+    if fmt is None:
+        items.append(f"{field_file.url} {meta['width']}w")
+    return ', '.join(items)
+
+
+def rendition_url(field_file, width):
+    """URL наименьшей копии не уже width (или оригинала)"""
+    meta = get_meta(field_file)
+    if meta:
+        for candidate in meta['widths']:
+            if candidate >= width:
+                return field_file.storage.url(
+                    rendition_name(field_file.name, candidate, meta['ext']))
+    return field_file.url
+
+
+def generate_for_instance(instance):
+    """Строит копии для всех полей-изображений объекта, если их ещё нет"""
+    for field in RENDITION_FIELDS.get(instance._meta.label, ()):
+        field_file = getattr(instance, field)
+        if field_file:
+            get_meta(field_file)
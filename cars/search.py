@@ -0,0 +1,232 @@
+"""
+Полнотекстовый поиск по машинам и статьям.
+
+PostgreSQL: у таблиц cars_cars и cars_article есть генерируемые колонки
+search_vector (tsvector, словарь russian) с GIN-индексами - они
+пересчитываются самой БД при любом INSERT/UPDATE, включая bulk-операции.
+
+SQLite: одна виртуальная таблица FTS5 cars_search, которую поддерживают
+триггеры. rowid записи кодирует тип и id объекта: id * 2 для машин,
+id * 2 + 1 для статей.
+
+Если индекса нет (другая СУБД или SQLite без FTS5), поиск деградирует
+до icontains по тем же полям.
+
+Схема индекса создаётся миграцией 0004_search_index; триггеры, которые SQLite
+теряет при пересоздании таблиц миграциями, восстанавливает restore_triggers().
+"""
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+from .models import Article, Cars
+
+FTS_TABLE = 'cars_search'
+PG_CONFIG = 'russian'
+
+
+class SearchSpec:
+    """
+    Описание индексируемой модели:
+    kind - смещение rowid в FTS5, title/body - SQL-выражения для колонок FTS5,
+    weights - поля и веса (A-D) для tsvector в PostgreSQL
+    """
+
+    def __init__(self, kind, title, body, weights):
+        self.kind = kind
+        self.title = title
+        self.body = body
+        self.weights = weights
+
+    @property
+    def fields(self):
+        return [name for name, _ in self.weights]
+
+
+SEARCH_MODELS = {
+    Cars: SearchSpec(
+        kind=0,
+        title="name",
+        body="description",
+        weights=(('name', 'A'), ('description', 'B')),
+    ),
+    Article: SearchSpec(
+        kind=1,
+        title="title",
+        body="excerpt || ' ' || content",
+        weights=(('title', 'A'), ('excerpt', 'B'), ('content', 'C')),
+    ),
+}
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+_fts_available = {}
+
+
+def pg_vector_sql(spec):
+    """Выражение для генерируемой колонки search_vector"""
+    return ' || '.join(
+        f"setweight(to_tsvector('{PG_CONFIG}', coalesce({name}, '')), '{weight}')"
+        for name, weight in spec.weights
+    )
+
+
+def fts_available(alias='default'):
+    """Есть ли в SQLite-базе таблица FTS5 (результат кешируется на процесс)"""
+    if alias not in _fts_available:
+        connection = connections[alias]
+        _fts_available[alias] = (
+            connection.vendor == 'sqlite'
+            and FTS_TABLE in connection.introspection.table_names()
+        )
+    return _fts_available[alias]
+
+
+def fts_query(query):
+    """
+    Превращает пользовательский ввод в безопасный запрос FTS5:
+    каждое слово - префиксный терм в кавычках, все термы через AND
+    """
+    return ' '.join(f'"{token}"*' for token in _TOKEN_RE.findall(query))
+
+
+def search(queryset, query):
+    """
+    Фильтрует queryset по полнотекстовому запросу и добавляет аннотацию rank
+    (чем больше, тем релевантнее). Результат отсортирован по rank.
+    """
+    model = queryset.model
+    spec = SEARCH_MODELS[model]
+    table = model._meta.db_table
+    connection = connections[queryset.db]
+
+    if connection.vendor == 'postgresql':
+        tsquery = f"websearch_to_tsquery('{PG_CONFIG}', %s)"
+        queryset = queryset.filter(
+            RawSQL(f'"{table}".search_vector @@ {tsquery}', [query], output_field=BooleanField())
+        ).annotate(
+            rank=RawSQL(f'ts_rank_cd("{table}".search_vector, {tsquery})', [query],
+                        output_field=FloatField())
+        )
+    elif fts_available(queryset.db):
+        match = fts_query(query)
+        if not match:
+            return queryset.none()
+        queryset = queryset.filter(
+            pk__in=RawSQL(
+                f"SELECT rowid / 2 FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid %% 2 = %s",
+                [match, spec.kind],
+            )
+        ).annotate(
+            # bm25 тем меньше, чем лучше совпадение; заголовок весит в 10 раз больше текста
+            rank=RawSQL(
+                f'(SELECT -bm25({FTS_TABLE}, 10.0, 1.0) FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s AND rowid = "{table}".id * 2 + %s)',
+                [match, spec.kind], output_field=FloatField(),
+            )
+        )
+    else:
+        condition = Q()
+        for name in spec.fields:
+            condition |= Q(**{f'{name}__icontains': query})
+        queryset = queryset.filter(condition).annotate(rank=Value(0.0, output_field=FloatField()))
+    return queryset.order_by('-rank', '-pk')
+
+
+# DDL для миграции
+
+def create_index(schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        for model, spec in SEARCH_MODELS.items():
+            table = model._meta.db_table
+            schema_editor.execute(
+                f'ALTER TABLE "{table}" ADD COLUMN search_vector tsvector '
+                f'GENERATED ALWAYS AS ({pg_vector_sql(spec)}) STORED'
+            )
+            schema_editor.execute(
+                f'CREATE INDEX "{table}_search_gin" ON "{table}" USING GIN (search_vector)'
+            )
+    elif connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+            if not cursor.fetchone()[0]:
+                return
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+            f"title, body, tokenize='unicode61 remove_diacritics 2')"
+        )
+        restore_triggers(connection)
+    _fts_available.clear()
+
+
+def sqlite_triggers():
+    """{имя триггера: CREATE TRIGGER} для синхронизации FTS5 с таблицами"""
+    triggers = {}
+    for model, spec in SEARCH_MODELS.items():
+        table = model._meta.db_table
+        values = (f"new.id * 2 + {spec.kind}, "
+                  f"{_prefixed(spec.title, 'new')}, {_prefixed(spec.body, 'new')}")
+        delete = f"DELETE FROM {FTS_TABLE} WHERE rowid = old.id * 2 + {spec.kind};"
+        insert = f"INSERT INTO {FTS_TABLE}(rowid, title, body) VALUES ({values});"
+        triggers[f'{table}_search_ai'] = (
+            f'CREATE TRIGGER "{table}_search_ai" AFTER INSERT ON "{table}" BEGIN {insert} END'
+        )
+        triggers[f'{table}_search_au'] = (
+            f'CREATE TRIGGER "{table}_search_au" AFTER UPDATE OF {", ".join(spec.fields)} '
+            f'ON "{table}" BEGIN {delete} {insert} END'
+        )
+        triggers[f'{table}_search_ad'] = (
+            f'CREATE TRIGGER "{table}_search_ad" AFTER DELETE ON "{table}" BEGIN {delete} END'
+        )
+    return triggers
+
+
+def restore_triggers(connection):
+    """
+    Создаёт недостающие триггеры FTS5 и заново заполняет индекс.
+    SQLite молча удаляет триггеры, когда миграция пересоздаёт таблицу
+    (AddField с NOT NULL, ForeignKey и т.п.), поэтому функция вызывается
+    после каждого migrate (cars.apps) и ничего не делает, если триггеры на месте.
+    Возвращает имена созданных триггеров.
+    """
+    if connection.vendor != 'sqlite' or FTS_TABLE not in connection.introspection.table_names():
+        return []
+    triggers = sqlite_triggers()
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+        existing = {row[0] for row in cursor.fetchall()}
+        missing = [name for name in triggers if name not in existing]
+        if not missing:
+            return []
+        for name in missing:
+            cursor.execute(triggers[name])
+        # Пока триггеров не было, индекс мог разойтись с таблицами
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        for model, spec in SEARCH_MODELS.items():
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE}(rowid, title, body) '
+                f'SELECT id * 2 + {spec.kind}, {spec.title}, {spec.body} FROM "{model._meta.db_table}"'
+            )
+    return missing
+
+
+def drop_index(schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        for model in SEARCH_MODELS:
+            table = model._meta.db_table
+            schema_editor.execute(f'ALTER TABLE "{table}" DROP COLUMN IF EXISTS search_vector')
+    elif connection.vendor == 'sqlite':
+        for model in SEARCH_MODELS:
+            table = model._meta.db_table
+            for suffix in ('ai', 'au', 'ad'):
+                schema_editor.execute(f'DROP TRIGGER IF EXISTS "{table}_search_{suffix}"')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+    _fts_available.clear()
+
+
+def _prefixed(expression, row):
+    """Подставляет new./old. перед именами колонок в выражении триггера"""
+    return re.sub(r'\b(name|description|title|excerpt|content)\b', rf'{row}.\1', expression)
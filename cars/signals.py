@@ -0,0 +1,190 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import counters, likes, page_cache, renditions, similar, stats
+from .facets import facet_index
+from .models import Article, CarPhoto, CarVideo, Cars, Category, Comment, Manufacturer
+
+
+# Фасетный индекс обновляется только после фиксации транзакции,
+# чтобы откат не оставил в памяти несуществующих машин
+@receiver(post_save, sender=Cars)
+def update_facet_index(sender, instance, **kwargs):
+    transaction.on_commit(lambda: facet_index.upsert(instance))
+
+
+@receiver(post_save, sender=Cars)
+def mark_similar_cars_stale(sender, instance, created, **kwargs):
+    """
+    Соседей пересчитывает compute_similar_cars --stale вне запроса; новые
+    машины помечены по умолчанию, изменённые - если поменялись поля,
+    от которых зависят соседи
+    """
+    old_values = getattr(instance, '_old_similar_values', None)
+    if not created and old_values is not None and old_values != similar.tracked_values(instance):
+        similar.mark_stale(instance.pk)
+
+
+@receiver(post_delete, sender=Cars)
+def remove_from_facet_index(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: facet_index.remove(pk))
+
+
+# Счётчики каталога (cars/counters.py)
+
+@receiver(pre_save, sender=Cars)
+def remember_old_car(sender, instance, update_fields=None, **kwargs):
+    """
+    Запоминаем прежние категорию (чтобы перенести машину между счётчиками)
+    и поля, от которых зависят похожие машины
+    """
+    instance._old_cat_id = instance._old_similar_values = None
+    if instance.pk and (update_fields is None or not set(similar.TRACKED_FIELDS).isdisjoint(update_fields)):
+        old_values = (Cars._base_manager.filter(pk=instance.pk)
+                      .values_list(*similar.TRACKED_FIELDS).first())
+        if old_values is not None:
+            instance._old_similar_values = old_values
+            if update_fields is None or 'cat' in update_fields:
+                instance._old_cat_id = old_values[0]
+
+
+@receiver(post_save, sender=Cars)
+def count_car_in_category(sender, instance, created, **kwargs):
+    if created:
+        counters.bump(Category, instance.cat_id, 'cars_count', 1)
+        return
+    old_cat_id = getattr(instance, '_old_cat_id', None)
+    if old_cat_id is not None and old_cat_id != instance.cat_id:
+        counters.bump(Category, old_cat_id, 'cars_count', -1)
+        counters.bump(Category, instance.cat_id, 'cars_count', 1)
+
+
+@receiver(post_delete, sender=Cars)
+def uncount_car_in_category(sender, instance, **kwargs):
+    counters.bump(Category, instance.cat_id, 'cars_count', -1)
+
+
+@receiver(post_save, sender=CarPhoto)
+def count_car_photo(sender, instance, created, **kwargs):
+    if created:
+        counters.bump(Cars, instance.car_id, 'photos_count', 1)
+
+
+@receiver(post_delete, sender=CarPhoto)
+def uncount_car_photo(sender, instance, **kwargs):
+    counters.bump(Cars, instance.car_id, 'photos_count', -1)
+
+
+def _comment_targets(car_id, article_id, is_active):
+    """Счётчики, в которые входит комментарий (учитываются только активные)"""
+    if not is_active:
+        return set()
+    targets = set()
+    if car_id:
+        targets.add((Cars, car_id))
+    if article_id:
+        targets.add((Article, article_id))
+    return targets
+
+
+@receiver(pre_save, sender=Comment)
+def remember_comment_targets(sender, instance, **kwargs):
+    instance._old_targets = set()
+    if instance.pk:
+        old = (Comment._base_manager.filter(pk=instance.pk)
+               .values_list('car_id', 'article_id', 'is_active').first())
+        if old:
+            instance._old_targets = _comment_targets(*old)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, **kwargs):
+    old = getattr(instance, '_old_targets', set())
+    new = _comment_targets(instance.car_id, instance.article_id, instance.is_active)
+    for model, pk in old - new:
+        counters.bump(model, pk, 'comments_count', -1)
+    for model, pk in new - old:
+        counters.bump(model, pk, 'comments_count', 1)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    for model, pk in _comment_targets(instance.car_id, instance.article_id, instance.is_active):
+        counters.bump(model, pk, 'comments_count', -1)
+
+
+@receiver(m2m_changed, sender=Cars.likes.through)
+def count_likes(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Лайки через M2M-менеджер (админка, car.likes.add(...)).
+    post_add получает только реально добавленные id, поэтому здесь
+    достаточно инкремента; remove/clear пересчитываются точно.
+    """
+    if action == 'pre_clear':
+        # post_clear приходит с pk_set=None - запоминаем, кого касается очистка
+        if reverse:
+            instance._cleared_car_ids = list(instance.car_likes.values_list('pk', flat=True))
+        else:
+            instance._cleared_user_ids = list(instance.likes.values_list('pk', flat=True))
+    elif action == 'post_add' and pk_set:
+        if reverse:
+            counters.bump_many(Cars, pk_set, 'likes_count', 1)
+        else:
+            counters.bump(Cars, instance.pk, 'likes_count', len(pk_set))
+    elif action == 'post_remove' and pk_set:
+        counters.recount_likes(list(pk_set) if reverse else [instance.pk])
+    elif action == 'post_clear':
+        counters.recount_likes(getattr(instance, '_cleared_car_ids', []) if reverse else [instance.pk])
+
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        # Версия лайков пользователя входит в ETag страниц (cars/conditional.py)
+        if reverse:
+            user_ids = [instance.pk]
+        elif action == 'post_clear':
+            user_ids = getattr(instance, '_cleared_user_ids', [])
+        else:
+            user_ids = pk_set or ()
+        for user_id in user_ids:
+            likes.bump_user_likes(user_id)
+
+
+# Уменьшенные копии изображений (cars/renditions.py)
+
+def build_renditions(sender, instance, **kwargs):
+    transaction.on_commit(lambda: renditions.generate_for_instance(instance))
+
+
+for label in renditions.RENDITION_FIELDS:
+    post_save.connect(build_renditions, sender=label, dispatch_uid=f'renditions:{label}')
+
+
+# Версии для кеша страниц (cars/page_cache.py)
+
+def bump_page_cache_version(sender, **kwargs):
+    transaction.on_commit(lambda: page_cache.bump_version(sender))
+
+
+for model in (Category, Cars, CarPhoto, CarVideo, Article, Manufacturer, Comment):
+    post_save.connect(bump_page_cache_version, sender=model, dispatch_uid=f'page_cache:{model._meta.label}')
+    post_delete.connect(bump_page_cache_version, sender=model, dispatch_uid=f'page_cache_delete:{model._meta.label}')
+
+
+# Статистика сайта (cars/stats.py)
+
+SITE_STATS_FIELDS = {model: field for field, model in stats.STATS_FIELDS.items()}
+
+
+def count_in_site_stats(sender, created, **kwargs):
+    if created:
+        stats.bump(SITE_STATS_FIELDS[sender], 1)
+
+
+def uncount_in_site_stats(sender, **kwargs):
+    stats.bump(SITE_STATS_FIELDS[sender], -1)
+
+
+for model in SITE_STATS_FIELDS:
+    post_save.connect(count_in_site_stats, sender=model, dispatch_uid=f'site_stats:{model._meta.label}')
+    post_delete.connect(uncount_in_site_stats, sender=model, dispatch_uid=f'site_stats_delete:{model._meta.label}')
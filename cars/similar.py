@@ -0,0 +1,264 @@
+"""
+Похожие машины по характеристикам.
+
+Каждая активная машина - вектор из цены, года, мощности, объёма двигателя,
+разгона и максимальной скорости. Пропуски заменяются медианой колонки,
+цена и мощность берутся в логарифме (разброс на порядки), затем колонки
+приводятся к нулевому среднему и единичному разбросу. Расстояние -
+евклидово плюс штраф за другую категорию.
+
+Соседи считаются пачками строк матрицы (|a|^2 + |b|^2 - 2ab) командой
+compute_similar_cars и складываются в таблицу SimilarCar, которую
+страница машины читает одним запросом по индексу (car, -score).
+Размер пачки ограничен по памяти (SIMILAR_CARS_CHUNK_MEMORY_MB).
+
+Сохранение машины только помечает её (Cars.similar_stale, cars.signals),
+и то лишь когда изменились характеристики, категория или активность.
+Помеченные машины пересчитывает compute_similar_cars --stale, которую
+запускают по расписанию (например, cron раз в минуту): машина получает свой
+список и встаёт в списки тех, кому она ближе худшего из их соседей.
+Сдвиг нормировки со временем исправляет периодический полный пересчёт.
+"""
+import warnings
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min, Q
+
+from . import page_cache
+from .models import Cars, SimilarCar
+
+SPEC_FIELDS = ('price', 'year', 'horsepower', 'engine_volume', 'acceleration_0_100', 'top_speed')
+LOG_FIELDS = ('price', 'horsepower')
+# Добавка к квадрату расстояния для машин из разных категорий
+CATEGORY_PENALTY = 1.0
+# Поля, от которых зависят соседи: правка остальных пересчёта не требует
+TRACKED_FIELDS = ('cat', 'is_active') + SPEC_FIELDS
+# Пик памяти на ячейку матрицы расстояний: около трёх временных массивов float64
+BYTES_PER_CELL = 3 * 8
+BATCH_SIZE = 2000
+# Доля устаревших машин, начиная с которой выгоднее полный пересчёт
+FULL_REBUILD_SHARE = 0.2
+
+
+class SpecMatrix:
+    """Нормированные векторы характеристик активных машин"""
+
+    def __init__(self, ids, cats, values):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.cats = np.asarray(cats, dtype=np.int64)
+        self.vectors = self.normalize(np.asarray(values, dtype=np.float64).reshape(len(self.ids), len(SPEC_FIELDS)))
+        self.norms = np.einsum('ij,ij->i', self.vectors, self.vectors)
+        self.rows = {pk: row for row, pk in enumerate(self.ids.tolist())}
+
+    @classmethod
+    def load(cls):
+        ids, cats, values = [], [], []
+        rows = (Cars.objects.filter(is_active=True)
+                .order_by()
+                .values_list('pk', 'cat_id', *SPEC_FIELDS)
+                .iterator(chunk_size=5000))
+        for pk, cat_id, *specs in rows:
+            ids.append(pk)
+            cats.append(cat_id)
+            values.append([np.nan if value is None else float(value) for value in specs])
+        return cls(ids, cats, values)
+
+    @staticmethod
+    def normalize(values):
+        if not len(values):
+            return values
+        for column, field in enumerate(SPEC_FIELDS):
+            if field in LOG_FIELDS:
+                values[:, column] = np.log1p(np.clip(values[:, column], 0, None))
+        with warnings.catch_warnings():
+            # Колонка может быть пустой целиком - тогда медиана nan, заменяем нулём
+            warnings.simplefilter('ignore', RuntimeWarning)
+            medians = np.nanmedian(values, axis=0)
+        medians = np.where(np.isnan(medians), 0.0, medians)
+        values = np.where(np.isnan(values), medians, values)
+        std = values.std(axis=0)
+        return (values - values.mean(axis=0)) / np.where(std > 0, std, 1.0)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def distances(self, rows):
+        """Квадраты расстояний от строк rows до всех машин (len(rows) x n)"""
+        rows = np.asarray(rows)
+        distances = (self.norms[rows][:, None] + self.norms[None, :]
+                     - 2 * self.vectors[rows] @ self.vectors.T)
+        distances += CATEGORY_PENALTY * (self.cats[rows][:, None] != self.cats[None, :])
+        np.maximum(distances, 0, out=distances)
+        distances[np.arange(len(rows)), rows] = np.inf
+        return distances
+
+    def nearest(self, rows, k):
+        """Индексы k ближайших соседей для строк rows и их сходство, лучшие первыми"""
+        distances = self.distances(rows)
+        k = min(k, len(self) - 1)
+        if k <= 0:
+            return np.empty((len(rows), 0), dtype=np.int64), np.empty((len(rows), 0))
+        neighbours = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        picked = np.take_along_axis(distances, neighbours, axis=1)
+        order = np.argsort(picked, axis=1)
+        neighbours = np.take_along_axis(neighbours, order, axis=1)
+        return neighbours, score(np.take_along_axis(picked, order, axis=1))
+
+
+def score(squared_distance):
+    return 1.0 / (1.0 + np.sqrt(squared_distance))
+
+
+def get_k(k=None):
+    return k or settings.SIMILAR_CARS_COUNT
+
+
+def chunk_rows(total):
+    """
+    Строк матрицы расстояний за один проход: сколько помещается в
+    SIMILAR_CARS_CHUNK_MEMORY_MB, но не больше BATCH_SIZE, чтобы каждая
+    транзакция записи оставалась короткой
+    """
+    limit = settings.SIMILAR_CARS_CHUNK_MEMORY_MB * 1024 * 1024
+    return max(1, min(BATCH_SIZE, limit // (max(total, 1) * BYTES_PER_CELL)))
+
+
+def tracked_values(car):
+    """Значения полей, от которых зависят соседи машины"""
+    return tuple(getattr(car, Cars._meta.get_field(name).attname) for name in TRACKED_FIELDS)
+
+
+def mark_stale(car_id):
+    Cars._base_manager.filter(pk=car_id).update(similar_stale=True)
+
+
+def write_neighbours(matrix, rows, k):
+    """Списки соседей для строк rows матрицы; возвращает число записанных пар"""
+    total = 0
+    step = chunk_rows(len(matrix))
+    for start in range(0, len(rows), step):
+        chunk = rows[start:start + step]
+        neighbours, scores = matrix.nearest(chunk, k)
+        batch = [
+            SimilarCar(car_id=int(matrix.ids[row]), similar_id=int(matrix.ids[neighbour]), score=float(value))
+            for row, row_neighbours, row_scores in zip(chunk, neighbours, scores)
+            for neighbour, value in zip(row_neighbours, row_scores)
+        ]
+        SimilarCar.objects.bulk_create(batch, batch_size=BATCH_SIZE)
+        total += len(batch)
+    return total
+
+
+def rebuild(k=None):
+    """
+    Полный пересчёт таблицы соседей; возвращает число записанных пар.
+    Каждая пачка машин заменяет свои списки в отдельной транзакции,
+    так что страницы всё время видят полные списки, а блокировки короткие.
+    """
+    k = get_k(k)
+    # Флаги снимаются до чтения характеристик: правка во время пересчёта
+    # снова пометит машину
+    Cars._base_manager.filter(similar_stale=True).update(similar_stale=False)
+    matrix = SpecMatrix.load()
+    total, step = 0, chunk_rows(len(matrix))
+    for start in range(0, len(matrix), step):
+        rows = np.arange(start, min(start + step, len(matrix)))
+        with transaction.atomic():
+            SimilarCar.objects.filter(car_id__in=matrix.ids[rows].tolist()).delete()
+            total += write_neighbours(matrix, rows, k)
+    # Списки и соседи, выпавшие из активных машин
+    SimilarCar.objects.filter(Q(car__is_active=False) | Q(similar__is_active=False)).delete()
+    page_cache.bump_version(SimilarCar)
+    return total
+
+
+def refresh(matrix, car_ids, k):
+    """
+    Точечное обновление после правки машин car_ids: их списки и списки
+    машин, где они были соседями, считаются заново, а остальным машинам
+    изменённые машины добавляются, если они ближе худшего из соседей
+    """
+    car_ids = set(car_ids)
+    with transaction.atomic():
+        owners = set(SimilarCar.objects.filter(similar_id__in=car_ids).values_list('car_id', flat=True))
+        recompute = car_ids | owners
+        SimilarCar.objects.filter(car_id__in=recompute).delete()
+        write_neighbours(matrix, [matrix.rows[pk] for pk in recompute if pk in matrix.rows], k)
+
+        changed = np.array([matrix.rows[pk] for pk in car_ids if pk in matrix.rows], dtype=np.int64)
+        if not len(changed) or len(matrix) < 2:
+            return
+        # Худший сосед и размер списка у остальных машин. Машины без списка
+        # соседей ждут полного пересчёта
+        current = list(SimilarCar.objects.exclude(car_id__in=recompute).order_by()
+                       .values('car_id').annotate(total=Count('pk'), worst=Min('score'))
+                       .values_list('car_id', 'total', 'worst'))
+        others = np.array([matrix.rows.get(owner_id, -1) for owner_id, _, _ in current], dtype=np.int64)
+        known = others >= 0
+        others = others[known]
+        totals = np.array([total for _, total, _ in current], dtype=np.int64)[known]
+        worst = np.array([value for _, _, value in current], dtype=np.float64)[known]
+
+        # Расстояние симметрично: сходство изменённых машин со всеми остальными
+        to_changed = score(matrix.distances(changed))[:, others]
+        enters = (to_changed > worst) | (totals < k)
+        added = {}
+        pairs = []
+        for index, column in zip(*np.nonzero(enters)):
+            owner_id = int(matrix.ids[others[column]])
+            added[owner_id] = added.get(owner_id, 0) + 1
+            pairs.append(SimilarCar(car_id=owner_id, similar_id=int(matrix.ids[changed[index]]),
+                                    score=float(to_changed[index, column])))
+        SimilarCar.objects.bulk_create(pairs, batch_size=BATCH_SIZE)
+
+        # Лишние (худшие) соседи у тех, чей список переполнился
+        total_by_owner = dict(zip(matrix.ids[others].tolist(), totals.tolist()))
+        overflow = [owner_id for owner_id, count in added.items() if total_by_owner[owner_id] + count > k]
+        if overflow:
+            rows = (SimilarCar.objects.filter(car_id__in=overflow)
+                    .order_by('car_id', '-score', 'pk')
+                    .values_list('pk', 'car_id'))
+            seen, extra = {}, []
+            for pk, owner_id in rows:
+                seen[owner_id] = seen.get(owner_id, 0) + 1
+                if seen[owner_id] > k:
+                    extra.append(pk)
+            SimilarCar.objects.filter(pk__in=extra).delete()
+
+
+def refresh_stale(k=None):
+    """
+    Пересчёт машин, помеченных после правки (cars.signals); если их много,
+    выполняется полный пересчёт. Возвращает число обработанных машин.
+    """
+    k = get_k(k)
+    stale = list(Cars._base_manager.filter(similar_stale=True).order_by('pk').values_list('pk', flat=True))
+    if not stale:
+        return 0
+    if len(stale) > FULL_REBUILD_SHARE * Cars._base_manager.filter(is_active=True).count():
+        rebuild(k)
+        return len(stale)
+    Cars._base_manager.filter(pk__in=stale).update(similar_stale=False)
+    matrix = SpecMatrix.load()
+    step = chunk_rows(len(matrix))
+    for start in range(0, len(stale), step):
+        refresh(matrix, stale[start:start + step], k)
+    page_cache.bump_version(SimilarCar)
+    return len(stale)
+
+
+def similar_cars_queryset(car, limit=4):
+    return (SimilarCar.objects.filter(car=car, similar__is_active=True)
+            .select_related('similar')
+            .order_by('-score')[:limit])
+
+
+def similar_cars(car, limit=4):
+    """Похожие машины для страницы - одним запросом по индексу (car, -score)"""
+    return [pair.similar for pair in similar_cars_queryset(car, limit)]
+
+
+async def asimilar_cars(car, limit=4):
+    return [pair.similar async for pair in similar_cars_queryset(car, limit)]
@@ -0,0 +1,93 @@
+"""
+Слаги для URL.
+
+Названия на кириллице транслитерируются (slugify без allow_unicode
+выбросил бы их целиком, а маршруты <slug:...> принимают только ASCII).
+Уникальность обеспечивается суффиксами -2, -3, ...: для одной записи -
+unique_slug(), для массового импорта - SlugAllocator, который узнаёт
+занятые слаги одним запросом на пачку.
+"""
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+from django.utils.text import slugify
+
+TRANSLIT = str.maketrans({
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'e', 'ж': 'zh',
+    'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o',
+    'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u', 'ф': 'f', 'х': 'h', 'ц': 'ts',
+    'ч': 'ch', 'ш': 'sh', 'щ': 'sch', 'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu',
+    'я': 'ya',
+})
+
+# Запас под суффикс -NNNNNN в поле max_length=100
+MAX_BASE_LENGTH = 90
+
+
+def slug_base(text, fallback='item'):
+    """Слаг без учёта уникальности"""
+    slug = slugify(str(text).lower().translate(TRANSLIT))[:MAX_BASE_LENGTH].strip('-')
+    return slug or fallback
+
+
+def unique_slug(model, text, field='slug', exclude_pk=None, fallback='item'):
+    """Свободный слаг для одной записи: base, base-2, base-3, ..."""
+    allocator = SlugAllocator(model, field, fallback=fallback)
+    if exclude_pk is not None:
+        allocator.exclude_pk = exclude_pk
+    return allocator.allocate([text])[0]
+
+
+class SlugAllocator:
+    """
+    Раздаёт уникальные слаги пачкам названий. Для каждой новой основы
+    запросом на пачку загружаются занятые base и base-N, дальше
+    суффиксы выдаются из памяти - без запроса на каждую запись.
+    """
+
+    LOAD_CHUNK = 200
+
+    def __init__(self, model, field='slug', fallback='item'):
+        self.model = model
+        self.field = field
+        self.fallback = fallback
+        self.exclude_pk = None
+        self.taken = set()
+        self.next_suffix = {}
+
+    def _load(self, bases):
+        # Условия LIKE объединяются по LOAD_CHUNK штук: SQLite ограничивает глубину выражения
+        for start in range(0, len(bases), self.LOAD_CHUNK):
+            chunk = bases[start:start + self.LOAD_CHUNK]
+            condition = reduce(or_, (Q(**{f'{self.field}__startswith': f'{base}-'}) for base in chunk),
+                               Q(**{f'{self.field}__in': chunk}))
+            queryset = self.model._base_manager.filter(condition)
+            if self.exclude_pk is not None:
+                queryset = queryset.exclude(pk=self.exclude_pk)
+            self.taken.update(queryset.values_list(self.field, flat=True).iterator())
+        for base in bases:
+            self.next_suffix[base] = 2
+
+    def allocate(self, texts):
+        bases = [slug_base(text, self.fallback) for text in texts]
+        new_bases = sorted({base for base in bases if base not in self.next_suffix})
+        if new_bases:
+            self._load(new_bases)
+
+        slugs = []
+        for base in bases:
+            slug = base
+            if slug in self.taken:
+                number = self.next_suffix[base]
+                while f'{base}-{number}' in self.taken:
+                    number += 1
+                slug = f'{base}-{number}'
+                self.next_suffix[base] = number + 1
+            self.taken.add(slug)
+            slugs.append(slug)
+        return slugs
+
+    def reserve(self, slugs):
+        """Помечает слаги из файла импорта как занятые"""
+        self.taken.update(slugs)
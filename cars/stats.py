@@ -0,0 +1,84 @@
+"""
+Статистика сайта для страниц «О проекте» и списка категорий.
+
+Число машин, категорий и статей хранится в единственной строке SiteStats
+и сдвигается сигналами (cars.signals) на ±1 при создании и удалении.
+reconcile() пересчитывает строку заново; для очень больших таблиц
+на PostgreSQL вместо точного COUNT(*) можно взять оценку планировщика
+(pg_class.reltuples) - она обновляется VACUUM/ANALYZE и обходится
+без последовательного сканирования.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from . import counters
+from .models import Article, Cars, Category, SiteStats
+
+STATS_PK = 1
+
+# Поле SiteStats -> модель, строки которой считаются
+STATS_FIELDS = {
+    'cars': Cars,
+    'categories': Category,
+    'articles': Article,
+}
+
+
+def get_stats():
+    """Строка статистики; если её нет (пустая БД) - создаётся пересчётом"""
+    stats = SiteStats.objects.filter(pk=STATS_PK).first()
+    if stats is None:
+        stats = reconcile()
+    return stats
+
+
+async def aget_stats():
+    stats = await SiteStats.objects.filter(pk=STATS_PK).afirst()
+    if stats is None:
+        stats = await sync_to_async(reconcile)()
+    return stats
+
+
+def bump(field, delta):
+    counters.bump(SiteStats, STATS_PK, field, delta)
+
+
+def table_estimate(model):
+    """
+    Оценка числа строк из pg_class.reltuples или None, если оценки нет
+    (не PostgreSQL или таблицу ещё не анализировали)
+    """
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                       [model._meta.db_table])
+        row = cursor.fetchone()
+    if row is None or row[0] < 0:
+        return None
+    return row[0]
+
+
+def count_rows(model, estimate_threshold=None):
+    """
+    Точный COUNT(*), а для таблиц, оценка которых не меньше
+    estimate_threshold, - сама оценка планировщика
+    """
+    if estimate_threshold:
+        estimate = table_estimate(model)
+        if estimate is not None and estimate >= estimate_threshold:
+            return estimate
+    return model._base_manager.count()
+
+
+def reconcile(estimate_threshold=None):
+    """Пересчитывает строку статистики и возвращает её"""
+    if estimate_threshold is None:
+        estimate_threshold = settings.SITE_STATS_ESTIMATE_THRESHOLD
+    values = {field: count_rows(model, estimate_threshold) for field, model in STATS_FIELDS.items()}
+    stats, _ = SiteStats.objects.update_or_create(
+        pk=STATS_PK, defaults={**values, 'reconciled': timezone.now()},
+    )
+    return stats
@@ -0,0 +1,73 @@
+"""
+Хранилище статики для продакшена.
+
+collectstatic складывает файлы в STATIC_ROOT с хешем содержимого в имени
+(css/base.css -> css/base.3f2a9c1b7e4d.css) и рядом кладёт сжатые копии
+.gz и .br (brotli - если установлен пакет Brotli). Раз имя меняется
+вместе с содержимым, такие файлы можно кешировать в браузере навсегда;
+отдаёт их StaticFilesMiddleware (cars/middleware.py).
+"""
+import gzip
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.map', '.txt', '.xml', '.ico', '.ttf', '.eot')
+# Сжатие меньше пары сотен байт только добавляет заголовков
+MIN_COMPRESS_SIZE = 256
+
+
+def compress_file(path):
+    """
+    Пишет path.gz и path.br рядом с файлом. Копия не создаётся,
+    если она не меньше оригинала. Возвращает список созданных файлов.
+    """
+    with open(path, 'rb') as source:
+        content = source.read()
+    if len(content) < MIN_COMPRESS_SIZE:
+        return []
+
+    variants = [('.gz', gzip.compress(content, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(content, quality=11)))
+
+    written = []
+    for suffix, compressed in variants:
+        if len(compressed) >= len(content):
+            continue
+        with open(path + suffix, 'wb') as target:
+            target.write(compressed)
+        written.append(path + suffix)
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    manifest_strict = False
+    # Карты исходников (.map) в static/ не лежат - ссылки на них не переписываем
+    patterns = tuple(
+        (extension, tuple(pattern for pattern in extension_patterns
+                          if 'sourceMappingURL' not in str(pattern)))
+        for extension, extension_patterns in ManifestStaticFilesStorage.patterns
+    )
+
+    def stored_name(self, name):
+        # Шаблоны ссылаются и на картинки, которых нет в static/:
+        # для них отдаём исходный URL вместо ошибки рендера
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        for name in sorted(set(self.hashed_files.values())):
+            if os.path.splitext(name)[1].lower() in COMPRESS_EXTENSIONS:
+                for path in compress_file(self.path(name)):
+                    yield os.path.relpath(path, self.location), path, True
@@ -0,0 +1,341 @@
+"""
+Генератор синтетического каталога для проверки на больших объёмах.
+
+Данные детерминированы: одно и то же зерно даёт те же строки. Первичные
+ключи назначаются заранее (от текущего максимума), поэтому путь категории,
+ветки комментариев и связи M2M считаются в памяти, без чтения из БД.
+Строки копятся по таблицам и пишутся пачками: на PostgreSQL - через COPY
+(copy() в psycopg 3, copy_expert() в psycopg2), иначе через bulk_create. Ни то ни другое не отправляет сигналы
+на каждую строку (профили, счётчики, кеш), поэтому профили пишутся здесь же,
+денормализованные счётчики машин считаются при генерации, а счётчики
+категорий и статистика сайта пересчитываются в конце (finish()).
+"""
+import io
+import random
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import AutoField, Max
+from django.utils import timezone
+
+from users.models import Profile
+
+from .catalog_io import finish_import
+from .models import Article, CarPhoto, CarVideo, Cars, Category, Comment
+from .slugs import slug_base
+
+BRANDS = {
+    'Audi': ['A4', 'A6', 'Q5', 'RS6', 'TT'],
+    'BMW': ['M3', 'M5', 'X5', 'i8', 'Z4'],
+    'Chevrolet': ['Camaro', 'Corvette', 'Tahoe'],
+    'Ferrari': ['F8', 'Roma', 'SF90', '812'],
+    'Ford': ['Mustang', 'Focus', 'Raptor', 'GT'],
+    'Honda': ['Civic', 'Accord', 'NSX'],
+    'Lada': ['Vesta', 'Niva', 'Granta'],
+    'Lamborghini': ['Huracan', 'Urus', 'Aventador'],
+    'Mercedes-Benz': ['C-Class', 'E-Class', 'G-Class', 'AMG GT'],
+    'Nissan': ['GT-R', 'Skyline', 'Patrol'],
+    'Porsche': ['911', 'Cayenne', 'Taycan', 'Panamera'],
+    'Tesla': ['Model S', 'Model 3', 'Model X'],
+    'Toyota': ['Supra', 'Camry', 'Land Cruiser', 'GR86'],
+    'Volkswagen': ['Golf', 'Passat', 'Touareg'],
+}
+TRIMS = ['Base', 'Sport', 'Comfort', 'Premium', 'Track', 'Touring']
+CATEGORY_WORDS = ['Спорткары', 'Седаны', 'Кроссоверы', 'Внедорожники', 'Купе', 'Кабриолеты',
+                  'Электромобили', 'Гибриды', 'Классика', 'Пикапы', 'Хэтчбеки', 'Универсалы']
+COMMENT_TEXTS = ['Отличная машина!', 'Мечтаю о такой.', 'Дороговато для своих характеристик.',
+                 'Ездил на такой - впечатления лучшие.', 'А какой реальный расход?',
+                 'Дизайн спорный, но динамика впечатляет.']
+
+# Доля ответов среди комментариев и неактивных (скрытых) комментариев
+REPLY_SHARE = 0.3
+INACTIVE_SHARE = 0.05
+
+
+def uses_copy():
+    return connection.vendor == 'postgresql'
+
+
+def copy_value(value):
+    """Значение поля в текстовом виде, который понимает COPY; None - NULL"""
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return f"{value.total_seconds()} seconds"
+    return str(value)
+
+
+def copy_csv(rows):
+    """
+    Строки в формате COPY ... (FORMAT csv): значения в кавычках, NULL -
+    пустое поле без кавычек, поэтому пустая строка и NULL различаются
+    """
+    buffer = io.StringIO()
+    for row in rows:
+        values = (copy_value(value) for value in row)
+        buffer.write(','.join('' if value is None else '"' + value.replace('"', '""') + '"'
+                              for value in values))
+        buffer.write('\n')
+    buffer.seek(0)
+    return buffer
+
+
+def next_pk(model):
+    return (model._base_manager.aggregate(top=Max('pk'))['top'] or 0) + 1
+
+
+def spread(rng, count, average):
+    """Случайное число около average: целая часть плюс дробная с вероятностью"""
+    whole = int(average)
+    return min(count, whole + (rng.random() < average - whole)) if count else 0
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """
+    Отключает auto_now/auto_now_add, чтобы bulk_create сохранил сгенерированные
+    даты, а не время загрузки
+    """
+    fields = [(field, field.auto_now, field.auto_now_add)
+              for model in models for field in model._meta.concrete_fields
+              if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)]
+    for field, _, _ in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in fields:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class TableWriter:
+    """
+    Копит строки одной таблицы и пишет их пачкой. Пишутся все колонки
+    таблицы: default= у полей живёт в Python, а не в схеме БД, поэтому COPY
+    не заполнил бы пропущенные NOT NULL колонки. Колонки, которых нет в fields,
+    получают значение поля по умолчанию; автоинкрементный ключ, если он не
+    задан, назначает БД.
+    """
+
+    def __init__(self, model, fields, use_copy):
+        self.model = model
+        given = [model._meta.get_field(name) for name in fields]
+        defaulted = [field for field in model._meta.concrete_fields
+                     if field not in given and not isinstance(field, AutoField)]
+        self.fields = given + defaulted
+        self.defaults = tuple(field.get_default() for field in defaulted)
+        self.use_copy = use_copy
+        self.rows = []
+        self.written = 0
+
+    def add(self, *values):
+        self.rows.append(values + self.defaults)
+
+    def flush(self):
+        if not self.rows:
+            return
+        if self.use_copy:
+            self._copy()
+        else:
+            attnames = [field.attname for field in self.fields]
+            self.model._base_manager.bulk_create(
+                [self.model(**dict(zip(attnames, row))) for row in self.rows], batch_size=2000)
+        self.written += len(self.rows)
+        self.rows = []
+
+    def _copy(self):
+        from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        columns = ', '.join(connection.ops.quote_name(field.column) for field in self.fields)
+        with connection.cursor() as cursor:
+            if is_psycopg3:
+                with cursor.cursor.copy(f"COPY {table} ({columns}) FROM STDIN") as copy:
+                    for row in self.rows:
+                        copy.write_row(row)
+            else:
+                cursor.cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)",
+                                          copy_csv(self.rows))
+
+
+class CatalogGenerator:
+    """
+    Генерирует категории, пользователей, машины с фото, видео, лайками и
+    комментариями и статьи. Объёмы задаются в конструкторе, запись - generate().
+    """
+
+    def __init__(self, cars=10000, categories=200, users=1000, articles=None, depth=3,
+                 photos_per_car=1.0, videos_per_car=0.2, comments_per_car=2.0, likes_per_car=3.0,
+                 cars_per_article=3, batch_size=5000, seed=0, use_copy=None, log=None):
+        self.cars = cars
+        self.categories = categories
+        self.users = users
+        self.articles = cars // 100 if articles is None else articles
+        self.depth = max(1, depth)
+        self.photos_per_car = photos_per_car
+        self.videos_per_car = videos_per_car
+        self.comments_per_car = comments_per_car
+        self.likes_per_car = likes_per_car
+        self.cars_per_article = cars_per_article
+        self.batch_size = batch_size
+        self.rng = random.Random(seed)
+        self.use_copy = uses_copy() if use_copy is None else use_copy
+        self.log = log or (lambda message: None)
+        self.now = timezone.now()
+        self.writers = []
+
+    def writer(self, model, *fields):
+        writer = TableWriter(model, fields, self.use_copy)
+        self.writers.append(writer)
+        return writer
+
+    def flush(self):
+        with transaction.atomic():
+            for writer in self.writers:
+                writer.flush()
+
+    def moment(self, days=5 * 365):
+        """Случайный момент за последние days дней"""
+        return self.now - timedelta(seconds=self.rng.randrange(days * 24 * 3600))
+
+    def generate(self):
+        models = (User, Profile, Category, Cars, CarPhoto, CarVideo, Comment, Article)
+        with explicit_timestamps(*models):
+            category_ids = self.generate_categories()
+            user_ids = self.generate_users()
+            car_ids = self.generate_cars(category_ids, user_ids)
+            self.generate_articles(car_ids, user_ids)
+        self.finish(models)
+        return {writer.model._meta.label: writer.written for writer in self.writers}
+
+    def generate_categories(self):
+        writer = self.writer(Category, 'id', 'title', 'slug', 'description', 'image', 'parent',
+                             'path', 'depth', 'created', 'updated')
+        start = next_pk(Category)
+        # (id, path, depth) уже созданных категорий - кандидаты в родители
+        nodes = []
+        for pk in range(start, start + self.categories):
+            parents = [node for node in nodes if node[2] < self.depth - 1]
+            parent = self.rng.choice(parents) if parents and self.rng.random() < 0.8 else None
+            title = f"{self.rng.choice(CATEGORY_WORDS)} {pk}"
+            path = (parent[1] if parent else '') + Category.path_segment(pk)
+            depth = parent[2] + 1 if parent else 0
+            created = self.moment()
+            writer.add(pk, title, slug_base(title, 'category'), f"Синтетическая категория {pk}",
+                       'category/synthetic.jpg', parent[0] if parent else None, path, depth, created, created)
+            nodes.append((pk, path, depth))
+        self.flush()
+        self.log(f"Категорий: {writer.written}")
+        return [node[0] for node in nodes] or list(Category._base_manager.values_list('pk', flat=True))
+
+    def generate_users(self):
+        users = self.writer(User, 'id', 'username', 'email', 'password', 'is_active', 'date_joined')
+        profiles = self.writer(Profile, 'user', 'created', 'updated')
+        start = next_pk(User)
+        # Войти под синтетическим пользователем нельзя - пароль не задан
+        password = UNUSABLE_PASSWORD_PREFIX + 'synthetic'
+        for pk in range(start, start + self.users):
+            joined = self.moment()
+            users.add(pk, f"synthetic{pk}", f"synthetic{pk}@example.com", password, True, joined)
+            profiles.add(pk, joined, joined)
+            if len(users.rows) >= self.batch_size:
+                self.flush()
+        self.flush()
+        self.log(f"Пользователей: {users.written}")
+        return list(range(start, start + self.users))
+
+    def generate_cars(self, category_ids, user_ids):
+        cars = self.writer(Cars, 'id', 'name', 'slug', 'description', 'price', 'image', 'is_active',
+                           'created', 'updated', 'engine_volume', 'horsepower', 'year',
+                           'acceleration_0_100', 'top_speed', 'author', 'views', 'cat',
+                           'likes_count', 'photos_count', 'comments_count')
+        photos = self.writer(CarPhoto, 'car', 'image', 'title', 'is_main', 'created')
+        videos = self.writer(CarVideo, 'car', 'title', 'youtube_url', 'duration', 'views', 'created')
+        comments = self.writer(Comment, 'id', 'user', 'content', 'car', 'parent', 'root', 'depth',
+                               'is_active', 'created')
+        likes = self.writer(Cars.likes.through, 'cars', 'user')
+        rng = self.rng
+        start, comment_pk = next_pk(Cars), next_pk(Comment)
+        brands = list(BRANDS)
+
+        for pk in range(start, start + self.cars):
+            brand = rng.choice(brands)
+            name = f"{brand} {rng.choice(BRANDS[brand])} {rng.choice(TRIMS)} {rng.randrange(1990, 2026)}"
+            created = self.moment()
+            horsepower = rng.randrange(70, 1000)
+
+            photo_count = spread(rng, 10, self.photos_per_car)
+            for index in range(photo_count):
+                photos.add(pk, 'cars/gallery/synthetic.jpg', f"Фото {index + 1}", index == 0, created)
+            for index in range(spread(rng, 10, self.videos_per_car)):
+                videos.add(pk, f"{name}: обзор {index + 1}", f"https://www.youtube.com/watch?v=synthetic{pk}",
+                           timedelta(seconds=rng.randrange(60, 1800)), rng.randrange(10000), created)
+
+            liked_by = rng.sample(user_ids, spread(rng, len(user_ids), self.likes_per_car))
+            for user_id in liked_by:
+                likes.add(pk, user_id)
+
+            # (id, root_id, depth) комментариев этой машины - чтобы строить ветки ответов
+            thread, active = [], 0
+            for _ in range(spread(rng, 50, self.comments_per_car) if user_ids else 0):
+                parent = rng.choice(thread) if thread and rng.random() < REPLY_SHARE else None
+                root_id = (parent[1] or parent[0]) if parent else None
+                depth = parent[2] + 1 if parent else 0
+                is_active = rng.random() >= INACTIVE_SHARE
+                active += is_active
+                comments.add(comment_pk, rng.choice(user_ids), rng.choice(COMMENT_TEXTS), pk,
+                             parent[0] if parent else None, root_id, depth, is_active,
+                             created + timedelta(minutes=rng.randrange(1, 60 * 24 * 30)))
+                thread.append((comment_pk, root_id, depth))
+                comment_pk += 1
+
+            cars.add(pk, name, f"{slug_base(name, 'car')}-{pk}", f"Синтетическая машина {name}.",
+                     Decimal(rng.randrange(5000, 500000)), 'cars/synthetic.jpg', rng.random() >= 0.03,
+                     created, created + timedelta(days=rng.randrange(60)),
+                     Decimal(rng.randrange(10, 80)) / 10, horsepower, rng.randrange(1990, 2026),
+                     Decimal(rng.randrange(25, 150)) / 10, rng.randrange(150, 400),
+                     rng.choice(user_ids) if user_ids else None, rng.randrange(50000),
+                     rng.choice(category_ids), len(liked_by), photo_count, active)
+
+            if len(cars.rows) >= self.batch_size:
+                self.flush()
+                self.log(f"Машин: {cars.written}")
+        self.flush()
+        self.log(f"Машин: {cars.written}")
+        return range(start, start + self.cars)
+
+    def generate_articles(self, car_ids, user_ids):
+        if not self.articles or not user_ids:
+            return
+        articles = self.writer(Article, 'id', 'title', 'slug', 'content', 'excerpt', 'image', 'author',
+                               'views', 'is_published', 'created', 'updated')
+        links = self.writer(Article.cars.through, 'article', 'cars')
+        start = next_pk(Article)
+        for pk in range(start, start + self.articles):
+            title = f"Обзор рынка №{pk}"
+            created = self.moment()
+            articles.add(pk, title, f"article-{pk}", "Синтетическая статья. " * 20, "Синтетическая статья.",
+                         'articles/synthetic.jpg', self.rng.choice(user_ids), self.rng.randrange(100000),
+                         True, created, created)
+            for car_id in self.rng.sample(car_ids, min(len(car_ids), self.cars_per_article)):
+                links.add(pk, car_id)
+            if len(articles.rows) >= self.batch_size:
+                self.flush()
+        self.flush()
+        self.log(f"Статей: {articles.written}")
+
+    def finish(self, models):
+        # Ключи заданы явно, поэтому последовательности PostgreSQL нужно догнать
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), models):
+                cursor.execute(sql)
+        finish_import()
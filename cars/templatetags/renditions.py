@@ -0,0 +1,48 @@
+from django import template
+from django.utils.html import format_html
+
+from cars import renditions
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(field_file, sizes='100vw', alt='', css_class='', style='', loading='lazy'):
+    """
+    <picture> с WebP-источником и srcset по готовым копиям изображения.
+    Пока картинка грузится, вместо неё виден доминирующий цвет.
+    Пример: {% responsive_image car.image sizes="(max-width: 768px) 100vw, 25vw" alt=car.name %}
+    """
+    if not field_file:
+        return ''
+    meta = renditions.get_meta(field_file)
+    if not meta or not meta['widths']:
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" style="{}" loading="{}">',
+            field_file.url, alt, css_class, style, loading,
+        )
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" alt="{}" class="{}" '
+        'style="background-color: {}; {}" loading="{}" decoding="async">'
+        '</picture>',
+        renditions.srcset(field_file, meta, 'webp'), sizes,
+        renditions.rendition_url(field_file, 640), renditions.srcset(field_file, meta), sizes,
+        meta['width'], meta['height'], alt, css_class, meta['color'], style, loading,
+    )
+
+
+@register.filter
+def rendition(field_file, width):
+    """URL уменьшенной копии: {{ photo.image|rendition:160 }}"""
+    if not field_file:
+        return ''
+    return renditions.rendition_url(field_file, int(width))
+
+
+@register.filter
+def placeholder(field_file):
+    """data URI крошечного превью для фона-заглушки"""
+    meta = renditions.get_meta(field_file) if field_file else None
+    return meta['placeholder'] if meta else ''
@@ -0,0 +1,114 @@
+"""
+Общие помощники тестов cars и users: наполнение каталога, временный
+MEDIA_ROOT с его изображениями и базовый класс для проверки бюджета
+SQL-запросов страниц.
+"""
+import io
+import tempfile
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from .models import Article, CarPhoto, Cars, Category, Comment, Manufacturer
+from .query_budget import track_queries
+from .view_counter import view_counter
+
+
+# Общий на весь прогон каталог для файлов тестов; удаляется при выходе
+MEDIA_DIR = tempfile.TemporaryDirectory(prefix='autovault-media-')
+
+# Изображения, на которые ссылается seed_catalog
+CATALOG_IMAGES = ('category/sport.jpg', 'category/coupe.jpg', 'cars/car.jpg',
+                  'cars/gallery/photo.jpg', 'articles/article.jpg')
+
+
+def seed_images():
+    """Кладёт в хранилище изображения каталога, которых там ещё нет"""
+    for name in CATALOG_IMAGES:
+        if not default_storage.exists(name):
+            buffer = io.BytesIO()
+            Image.new('RGB', (64, 48), 'gray').save(buffer, 'JPEG')
+            default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+@override_settings(MEDIA_ROOT=MEDIA_DIR.name)
+class CatalogTestCase(TestCase):
+    """
+    Тесты с каталогом seed_catalog: файлы пишутся во временный MEDIA_ROOT,
+    а не в media/ проекта, кеш перед каждым тестом пуст
+    """
+
+    def setUp(self):
+        # Кеш процесса переживает откат транзакции теста, а версии кеша
+        # страниц двигаются только в on_commit, которого в TestCase нет:
+        # без очистки тест получил бы данные предыдущего под тем же ключом
+        cache.clear()
+        super().setUp()
+
+
+def seed_catalog(rows, user, prefix='car'):
+    """
+    Две категории (родитель и дочерняя) и по rows машин в каждой с лайками,
+    фото и комментариями; все машины одного производителя. Вызывается
+    из CatalogTestCase, изображения создаются в его MEDIA_ROOT.
+    """
+    seed_images()
+    parent, _ = Category.objects.get_or_create(
+        slug='sport', defaults={'title': 'Sport', 'description': 'Спорткары', 'image': 'category/sport.jpg'})
+    child, _ = Category.objects.get_or_create(
+        slug='coupe', defaults={'title': 'Coupe', 'description': 'Купе', 'image': 'category/coupe.jpg',
+                                'parent': parent})
+    brand, _ = Manufacturer.objects.get_or_create(
+        slug='porsche', defaults={'name': 'Porsche', 'country': 'Германия', 'founded': 1931, 'description': ''})
+    start = Cars.objects.count()
+    for index in range(start, start + rows * 2):
+        car = Cars.objects.create(
+            name=f"{prefix} {index}", slug=f"{prefix}-{index}", description="Описание",
+            price=10000 + index * 100, year=2000 + index % 25, horsepower=100 + index,
+            engine_volume=2.0, acceleration_0_100=5.5, top_speed=200 + index,
+            image='cars/car.jpg', cat=parent if index % 2 else child, manufacturer=brand, author=user,
+        )
+        car.likes.add(user)
+        CarPhoto.objects.create(car=car, image='cars/gallery/photo.jpg', title="Фото")
+        comment = Comment.objects.create(user=user, car=car, content="Комментарий")
+        Comment.objects.create(user=user, car=car, parent=comment, content="Ответ")
+    article = Article.objects.create(
+        title=f"Статья {start}", slug=f"article-{start}", content="Текст", excerpt="Кратко",
+        image='articles/article.jpg', author=user)
+    article.cars.add(*Cars.objects.all()[:3])
+    return parent, child
+
+
+# Реплика-зеркало на отдельном соединении не видит данных, записанных внутри
+# транзакции TestCase, поэтому страницы в тестах читают с основной БД
+@override_settings(DEBUG=False, DATABASE_REPLICAS=[])
+class QueryBudgetTestCase(CatalogTestCase):
+    """
+    Рендерит страницы и проверяет, что число SQL-запросов укладывается
+    в бюджет представления и не растёт вместе с числом строк в каталоге
+    """
+
+    def tearDown(self):
+        # Страницы копят просмотры в буфере процесса; после тестов их
+        # некуда записать - тестовая БД уже удалена
+        view_counter.clear()
+        super().tearDown()
+
+    def measure(self, url, client=None, method='get', data=None, warm_up=True):
+        client = client or self.client
+        if warm_up:
+            # Фасетный индекс и прочие ленивые структуры строятся один раз на процесс
+            getattr(client, method)(url, data)
+        cache.clear()
+        with track_queries() as queries:
+            response = getattr(client, method)(url, data)
+        self.assertLess(response.status_code, 400, f"{url}: ответ {response.status_code}")
+        return queries
+
+    def assertQueryBudget(self, url, budget, **kwargs):
+        queries = self.measure(url, **kwargs)
+        self.assertLessEqual(queries.count, budget, f"{url}: {queries.summary()}")
+        return queries
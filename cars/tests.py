@@ -1,3 +1,1015 @@
-from django.test import TestCase
+import base64
+import gzip
+import importlib
+import io
+import json
+import tempfile
+from decimal import Decimal
+from pathlib import Path
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import CommandError, call_command
+from django.db.models import AutoField
+from django.templatetags.static import static
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import clear_url_caches, resolve, reverse
+from django.utils import timezone
+from PIL import Image
+
+from . import async_views, catalog_io, counters, db_router, likes, renditions, similar, stats
+from . import urls as cars_urls
+from .comments import load_thread
+from .facets import facet_index
+from .management.commands import bench_site
+from .manufacturers import BrandMatcher, backfill, brand_stats
+from .models import Article, CarPhoto, Cars, Category, Comment, Manufacturer, SimilarCar, SiteStats
+from .pagination import KeysetPaginator
+from .synthetic import CatalogGenerator
+from .query_budget import track_queries
+from .search import search
+from .test_utils import CatalogTestCase, QueryBudgetTestCase, seed_catalog, seed_images
+from .view_counter import flush_views, record_view, view_counter
+
+
+class CatalogQueryBudgetTests(QueryBudgetTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('driver', 'driver@example.com', 'secret-pass-123')
+        cls.staff = User.objects.create_user('staff', 'staff@example.com', 'secret-pass-123', is_staff=True)
+        cls.parent, cls.child = seed_catalog(6, cls.user)
+
+    def setUp(self):
+        super().setUp()
+        facet_index._built_at = None
+        self.car = Cars.objects.order_by('pk').first()
+
+    def catalog_urls(self):
+        """(адрес, бюджет) для каждой страницы cars.urls, открываемой GET-запросом"""
+        return [
+            (reverse('cars:index'), 0),
+            (reverse('cars:category'), 3),
+            (reverse('cars:cars', args=[self.parent.slug]) + '?subcategories=1', 4),
+            (reverse('cars:cars', args=[self.child.slug]), 5),
+            (reverse('cars:car_detail', args=[self.car.slug]), 7),
+            (reverse('cars:manufacturer', args=['porsche']), 3),
+            (reverse('cars:compare') + f'?cars={self.car.slug},car-1,car-2', 3),
+            (reverse('cars:about'), 1),
+            (reverse('cars:filter') + '?year_min=2000', 2),
+            (reverse('cars:filter_json') + '?year_min=2000', 1),
+            (reverse('cars:search') + '?q=car', 1),
+            (reverse('cars:search') + '?q=Статья&type=articles', 1),
+        ]
+
+    def test_anonymous_pages(self):
+        for url, budget in self.catalog_urls():
+            with self.subTest(url=url):
+                self.assertQueryBudget(url, budget)
+
+    def test_authenticated_pages(self):
+        self.client.force_login(self.user)
+        for url, budget in self.catalog_urls():
+            with self.subTest(url=url):
+                # Сессия, пользователь и лайки текущего пользователя
+                self.assertQueryBudget(url, budget + 3)
+
+    def test_like_and_unlike(self):
+        self.client.force_login(self.user)
+        for name in ('car_unlike', 'car_like'):
+            with self.subTest(action=name):
+                self.assertQueryBudget(reverse(f'cars:{name}', args=[self.car.slug]), 8, method='post')
+
+    def test_staff_export(self):
+        self.client.force_login(self.staff)
+        with track_queries() as queries:
+            response = self.client.get(reverse('cars:export') + '?format=jsonl')
+            lines = b''.join(response.streaming_content).splitlines()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(lines), Cars.objects.count())
+        self.assertLessEqual(queries.count, 4, queries.summary())
+
+    def test_budget_does_not_grow_with_rows(self):
+        self.client.force_login(self.user)
+        urls = [url for url, _ in self.catalog_urls()]
+        before = {url: self.measure(url).count for url in urls}
+        seed_catalog(15, self.user, prefix='extra')
+        after = {url: self.measure(url).count for url in urls}
+        self.assertEqual(before, after)
+
+    def test_car_page_etag(self):
+        car = Cars.objects.order_by('pk').first()
+        url = reverse('cars:car_detail', args=[car.slug])
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 304)
+        # Повторный визит с 304 - тоже просмотр
+        self.assertEqual(view_counter.pending(car), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            CarPhoto.objects.filter(car=car).first().save()
+        response = self.client.get(url, headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        similar.rebuild(k=2)
+        self.assertEqual(self.client.get(url, headers={'if-none-match': etag}).status_code, 200)
+
+    def test_comment_edit_refreshes_car_page(self):
+        car = Cars.objects.order_by('pk').first()
+        url = reverse('cars:car_detail', args=[car.slug])
+        response = self.client.get(url)
+        # Время изменения не покрывает счётчики и версии - только ETag
+        self.assertNotIn('Last-Modified', response)
+        self.assertEqual(self.client.get(url, headers={'if-modified-since': 'Sun, 01 Jan 2090 00:00:00 GMT'})
+                         .status_code, 200)
+
+        comment = car.comments.first()
+        comment.content = 'Исправленный комментарий'
+        with self.captureOnCommitCallbacks(execute=True):
+            comment.save()
+        response = self.client.get(url, headers={'if-none-match': response['ETag']})
+        self.assertContains(response, 'Исправленный комментарий')
+
+
+class CatalogApiTests(QueryBudgetTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('driver', 'driver@example.com', 'secret-pass-123')
+        cls.parent, cls.child = seed_catalog(6, cls.user)
+
+    def test_list_pages_with_cursor(self):
+        url = reverse('api:car_list') + '?limit=5&fields=slug,photos'
+        seen = []
+        while url:
+            queries = self.measure(url, warm_up=False)
+            data = self.client.get(url).json()
+            # Страница и фото всей страницы одним запросом
+            self.assertLessEqual(queries.count, 2, queries.summary())
+            self.assertTrue(all(set(row) == {'slug', 'photos'} for row in data['results']))
+            seen += [row['slug'] for row in data['results']]
+            url = data['next']
+        self.assertEqual(sorted(seen), sorted(Cars.objects.values_list('slug', flat=True)))
+
+    def test_unchanged_catalog_answers_304_without_queries(self):
+        url = reverse('api:car_detail', args=[Cars.objects.first().slug])
+        etag = self.client.get(url)['ETag']
+        with track_queries() as queries:
+            response = self.client.get(url, headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(queries.count, 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            Cars.objects.first().save()
+        self.assertEqual(self.client.get(url, headers={'if-none-match': etag}).status_code, 200)
+
+    def test_counters_refresh_etag_and_body(self):
+        car = Cars.objects.order_by('pk').first()
+        url = reverse('api:car_detail', args=[car.slug]) + '?fields=slug,likes,views'
+        response = self.client.get(url)
+        self.assertEqual((response.json()['likes'], response.json()['views']), (1, 0))
+        fan = User.objects.create_user('fan')
+        with self.captureOnCommitCallbacks(execute=True):
+            likes.like(car.pk, fan)
+        self.assertEqual(self.client.get(url, headers={'if-none-match': response['ETag']}).status_code, 200)
+        self.assertEqual(self.client.get(url).json()['likes'], 2)
+
+        etag = self.client.get(url)['ETag']
+        record_view(car)
+        flush_views()
+        self.assertEqual(self.client.get(url, headers={'if-none-match': etag}).json()['views'], 1)
+
+    @override_settings(VIEW_COUNTER_FLUSH_INTERVAL=0)
+    def test_views_flushed_after_request(self):
+        car = Cars.objects.order_by('pk').first()
+        self.client.get(reverse('cars:car_detail', args=[car.slug]))
+        self.assertEqual(view_counter.pending(car), 0)
+        car.refresh_from_db()
+        self.assertEqual(car.views, 1)
+
+    def test_views_do_not_invalidate_responses_without_them(self):
+        car = Cars.objects.order_by('pk').first()
+        url = reverse('api:car_detail', args=[car.slug]) + '?fields=slug,likes'
+        etag = self.client.get(url)['ETag']
+        record_view(car)
+        flush_views()
+        self.assertEqual(self.client.get(url, headers={'if-none-match': etag}).status_code, 304)
+
+    def test_errors(self):
+        self.assertEqual(self.client.get(reverse('api:car_list') + '?fields=owner').status_code, 400)
+        self.assertEqual(self.client.get(reverse('api:car_list') + '?cursor=broken').status_code, 400)
+        self.assertEqual(self.client.get(reverse('api:car_detail', args=['missing'])).status_code, 404)
+
+
+@override_settings(DATABASE_REPLICAS=[])
+class AsyncViewTests(CatalogTestCase):
+    """Страницы каталога под ASYNC_VIEWS отдаются асинхронными версиями (cars/async_views.py)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('driver', 'driver@example.com', 'secret-pass-123')
+        cls.parent, cls.child = seed_catalog(2, cls.user)
+
+    @staticmethod
+    def reload_urls():
+        # Выбор между views и async_views делается при импорте cars.urls;
+        # корневой URLconf держит уже собранные маршруты, его тоже перечитываем
+        importlib.reload(cars_urls)
+        importlib.reload(importlib.import_module(settings.ROOT_URLCONF))
+        clear_url_caches()
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(self.reload_urls)
+        self.enterContext(override_settings(ASYNC_VIEWS=True))
+        self.reload_urls()
+
+    def tearDown(self):
+        view_counter.clear()
+
+    async def test_catalog_pages(self):
+        car = await Cars.objects.select_related('cat').order_by('pk').afirst()
+        await self.async_client.aforce_login(self.user)
+        pages = {
+            reverse('cars:category'): async_views.CategoryList,
+            reverse('cars:cars', args=[self.child.slug]): async_views.CarsList,
+            reverse('cars:car_detail', args=[car.slug]): async_views.CarDetail,
+            reverse('cars:about'): async_views.AboutView,
+        }
+        for url, view_class in pages.items():
+            with self.subTest(url=url):
+                self.assertIs(resolve(url).func.view_class, view_class)
+                response = await self.async_client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+        response = await self.async_client.get(reverse('cars:car_detail', args=[car.slug]))
+        self.assertContains(response, car.name)
+        self.assertEqual(response.context['related_cars'], [])
+        self.assertEqual(len(response.context['comments']), 1)
+        self.assertEqual((await self.async_client.get(reverse('cars:car_detail', args=['missing']))).status_code, 404)
+        response = await self.async_client.get(reverse('cars:cars', args=[self.child.slug]), {'cursor': 'x'})
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(DEBUG=True)
+    def test_middleware_is_not_adapted(self):
+        # При DEBUG Django пишет в django.request, когда оборачивает
+        # middleware в sync_to_async/async_to_sync
+        with self.assertNoLogs('django.request', 'DEBUG'):
+            ASGIHandler()
+
+    @override_settings(DEBUG=True)
+    async def test_queries_of_async_views_are_counted(self):
+        car = await Cars.objects.order_by('pk').afirst()
+        response = await self.async_client.get(reverse('cars:car_detail', args=[car.slug]))
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(int(response['X-DB-Queries']), 0)
+
+
+@override_settings(DATABASE_REPLICAS=[])
+class KeysetPaginationTests(CatalogTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('driver', 'driver@example.com', 'secret-pass-123')
+        cls.parent, cls.child = seed_catalog(4, cls.user)
+
+    def test_pages_are_strictly_after_cursor_on_ties(self):
+        Cars.objects.update(created=timezone.now())
+        paginator = KeysetPaginator(Cars.objects.all(), 3)
+        seen, cursor = [], None
+        while True:
+            page = paginator.get_page(cursor)
+            seen.extend(car.pk for car in page)
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, sorted(Cars.objects.values_list('pk', flat=True), reverse=True))
+
+    def test_invalid_cursor_is_404(self):
+        paginator = KeysetPaginator(Cars.objects.all(), 3)
+        valid = paginator.get_page().next_cursor
+        tampered = [
+            'не-курсор',
+            valid[:-2],
+            base64.urlsafe_b64encode(b'["2026-01-01T00:00:00Z"]').decode(),
+            base64.urlsafe_b64encode(b'["yesterday","1"]').decode(),
+            base64.urlsafe_b64encode(b'{"id":1}').decode(),
+            base64.urlsafe_b64encode(b'[1,1]').decode(),
+            base64.urlsafe_b64encode(b'[null,1]').decode(),
+            base64.urlsafe_b64encode(b'["",""]').decode(),
+        ]
+        urls = {
+            reverse('cars:cars', args=[self.child.slug]): 404,
+            reverse('cars:manufacturer', args=['porsche']): 404,
+            reverse('api:car_list'): 400,
+        }
+        for url, status in urls.items():
+            self.assertEqual(self.client.get(url, {'cursor': valid}).status_code, 200)
+            for cursor in tampered:
+                with self.subTest(url=url, cursor=cursor):
+                    self.assertEqual(self.client.get(url, {'cursor': cursor}).status_code, status)
+
+
+class CategoryTreeTests(TestCase):
+
+    @staticmethod
+    def category(slug, parent=None):
+        return Category.objects.create(title=slug, slug=slug, description='', image='category/x.jpg', parent=parent)
+
+    def test_moving_subtree_rewrites_paths(self):
+        cars, trucks = self.category('cars'), self.category('trucks')
+        sport = self.category('sport', cars)
+        coupe = self.category('coupe', sport)
+        self.assertEqual(coupe.path, f"{cars.path}{sport.path_segment(sport.pk)}{coupe.path_segment(coupe.pk)}")
+        self.assertEqual(coupe.depth, 2)
+
+        sport.parent = trucks
+        sport.save()
+        coupe.refresh_from_db()
+        self.assertEqual(coupe.path, f"{trucks.path}{sport.path_segment(sport.pk)}{coupe.path_segment(coupe.pk)}")
+        self.assertEqual(coupe.depth, 2)
+        self.assertEqual([category.slug for category in coupe.get_ancestors()], ['trucks', 'sport'])
+        self.assertEqual(set(trucks.get_descendants().values_list('slug', flat=True)), {'sport', 'coupe'})
+        self.assertFalse(cars.get_descendants().exists())
+
+        sport.parent = None
+        sport.save()
+        coupe.refresh_from_db()
+        self.assertEqual((coupe.path, coupe.depth), (sport.path + coupe.path_segment(coupe.pk), 1))
+
+    def test_category_cannot_move_into_own_subtree(self):
+        cars = self.category('cars')
+        sport = self.category('sport', cars)
+        cars.parent = sport
+        with self.assertRaises(ValueError):
+            cars.save()
+
+
+@override_settings(DATABASE_REPLICAS=[], FACET_INDEX_TTL=3600)
+class FacetIndexTests(CatalogTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('driver', 'driver@example.com', 'secret-pass-123')
+        cls.parent, cls.child = seed_catalog(2, cls.user)
+
+    def setUp(self):
+        super().setUp()
+        facet_index.build()
+        self.addCleanup(setattr, facet_index, '_built_at', None)
+
+    def counts(self, **kwargs):
+        result = facet_index.query(**kwargs)
+        return result.total, result.facets['category']
+
+    def test_counts_follow_committed_changes(self):
+        self.assertEqual(self.counts(), (4, {self.parent.pk: 2, self.child.pk: 2}))
+        car = Cars.objects.filter(cat=self.child).first()
+
+        with self.captureOnCommitCallbacks(execute=False):
+            car.cat = self.parent
+            car.save()
+        # До фиксации транзакции индекс не меняется
+        self.assertEqual(self.counts(), (4, {self.parent.pk: 2, self.child.pk: 2}))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            car.save()
+        self.assertEqual(self.counts(), (4, {self.parent.pk: 3, self.child.pk: 1}))
+        # Фасет категории считается без собственного фильтра
+        self.assertEqual(self.counts(categories={self.child.pk}), (1, {self.parent.pk: 3, self.child.pk: 1}))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            car.is_active = False
+            car.save()
+        self.assertEqual(self.counts(), (3, {self.parent.pk: 2, self.child.pk: 1}))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Cars.objects.filter(cat=self.child).delete()
+        self.assertEqual(self.counts(), (2, {self.parent.pk: 2}))
+
+    def test_price_facet_ignores_own_filter(self):
+        result = facet_index.query(ranges={'price': (10000, 10100)})
+        self.assertEqual(result.total, 2)
+        self.assertEqual(result.facets['price'][0], {'from': 0, 'to': 20_000, 'count': 4})
+
+
+@override_settings(DATABASE_REPLICAS=[])
+class ManufacturerTests(CatalogTestCase):
+
+    def setUp(self):
+        super().setUp()
+        seed_images()
+        category = Category.objects.create(title='Sport', description='', image='category/sport.jpg')
+        self.brands = {name: Manufacturer.objects.create(name=name, slug=slug, country='', founded=1900,
+                                                         description='')
+                       for name, slug in [('Mercedes', 'mercedes'), ('Mercedes-AMG', 'mercedes-amg'),
+                                          ('Mini', 'mini'), ('Kia', 'kia')]}
+        for name, price, horsepower in [('Mercedes-AMG GT', 150000, 585), ('Mercedes E 200', 50000, 197),
+                                        ('Mini Cooper', 30000, 136), ('Lamborghini Urus', 230000, 650),
+                                        ('Kia Rio', 15000, 100)]:
+            Cars.objects.create(name=name, description='', price=price, horsepower=horsepower,
+                                image='cars/car.jpg', cat=category)
+
+    def test_matcher_prefers_whole_words_and_longest_name(self):
+        matcher = BrandMatcher((brand.pk, brand.name) for brand in self.brands.values())
+        self.assertEqual(matcher.match('Mercedes-AMG GT'), self.brands['Mercedes-AMG'].pk)
+        self.assertEqual(matcher.match('mercedes e 200'), self.brands['Mercedes'].pk)
+        # "Kia" внутри другого слова - не бренд
+        self.assertIsNone(matcher.match('Nakia Roadster'))
+
+    def test_backfill_in_batches(self):
+        self.assertEqual(backfill(batch_size=2), 4)
+        assigned = dict(Cars.objects.values_list('name', 'manufacturer__name'))
+        self.assertEqual(assigned['Mercedes-AMG GT'], 'Mercedes-AMG')
+        self.assertEqual(assigned['Mercedes E 200'], 'Mercedes')
+        self.assertIsNone(assigned['Lamborghini Urus'])
+        # Повторный запуск трогает только машины без производителя
+        self.assertEqual(backfill(), 0)
+
+    def test_brand_stats_single_query(self):
+        backfill()
+        with track_queries() as queries:
+            stats = brand_stats()
+            brand_stats()
+        self.assertEqual(queries.count, 1)
+        mercedes = stats[self.brands['Mercedes'].pk]
+        self.assertEqual((mercedes['cars'], mercedes['price_min'], mercedes['horsepower_avg']), (1, 50000, 197))
+        # Машины без производителя в сводку не попадают
+        self.assertEqual(sum(row['cars'] for row in stats.values()), 4)
+
+
+class AdminPerformanceTests(QueryBudgetTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'secret-pass-123')
+        seed_catalog(6, cls.admin)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.admin)
+
+    def changelist_queries(self):
+        return {name: self.measure(reverse(f'admin:cars_{name}_changelist')).count
+                for name in ('cars', 'comment', 'article', 'carphoto')}
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        before = self.changelist_queries()
+        seed_catalog(15, self.admin, prefix='extra')
+        self.assertEqual(before, self.changelist_queries())
+
+    @override_settings(ADMIN_LARGE_TABLE_ROWS=5)
+    def test_large_changelist_pages_by_cursor(self):
+        url = reverse('admin:cars_cars_changelist')
+        seen = []
+        response = self.client.get(url)
+        while True:
+            changelist = response.context['cl']
+            self.assertIsNotNone(changelist.keyset_page)
+            seen += [car.pk for car in changelist.result_list]
+            if not changelist.keyset_page.has_next():
+                break
+            response = self.client.get(url + changelist.next_page_url())
+        self.assertEqual(sorted(seen), sorted(Cars.objects.values_list('pk', flat=True)))
+        # Сортировка по колонке возвращает обычные номера страниц
+        self.assertIsNone(self.client.get(url + '?o=3').context['cl'].keyset_page)
+
+    def test_price_range_filter(self):
+        url = reverse('admin:cars_cars_changelist')
+        # Цены машин seed_catalog - от $10 000 до $11 100
+        self.assertEqual(self.client.get(url + '?price_range=-20000').context['cl'].result_count, 12)
+        self.assertEqual(self.client.get(url + '?price_range=20000-50000').context['cl'].result_count, 0)
+
+
+@override_settings(DATABASE_REPLICAS=[])
+class CompareTests(CatalogTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('driver', 'driver@example.com', 'secret-pass-123')
+        seed_catalog(2, cls.user)
+
+    def compare(self, slugs):
+        return self.client.get(reverse('cars:compare') + '?cars=' + ','.join(slugs)).context['comparison']
+
+    def test_table_highlights_best_and_worst(self):
+        comparison = self.compare(['car-2', 'car-0', 'missing'])
+        self.assertEqual([car['slug'] for car in comparison['cars']], ['car-2', 'car-0'])
+        price = comparison['rows'][0]
+        # Дешевле - лучше: car-0 стоит $10 000, car-2 - $10 200
+        self.assertEqual([(cell['best'], cell['worst']) for cell in price['cells']], [(False, True), (True, False)])
+
+    def test_cached_table_follows_car_updates(self):
+        self.compare(['car-0', 'car-1'])
+        with track_queries() as queries:
+            self.compare(['car-1', 'car-0'])
+        # Только метки updated - таблица из кеша
+        self.assertEqual(queries.count, 1)
+        car = Cars.objects.get(slug='car-1')
+        car.price = 1
+        car.save()
+        self.assertEqual(self.compare(['car-0', 'car-1'])['rows'][0]['cells'][1]['value'], 1)
+
+    def test_likes_row_follows_likes(self):
+        self.compare(['car-0', 'car-1'])
+        likes.like(Cars.objects.get(slug='car-1').pk, User.objects.create_user('fan'))
+        row = self.compare(['car-0', 'car-1'])['rows'][-1]
+        self.assertEqual([cell['value'] for cell in row['cells']], [1, 2])
+        self.assertTrue(row['cells'][1]['best'])
+
+
+@override_settings(DATABASE_REPLICAS=[])
+class SearchTests(TestCase):
+
+    def setUp(self):
+        self.category = Category.objects.create(title='Sport', description='', image='category/sport.jpg')
+
+    def test_saved_car_is_found(self):
+        car = Cars.objects.create(name='Ferrari Roma', description='Гран туризмо', image='cars/car.jpg',
+                                  cat=self.category)
+        self.assertEqual(list(search(Cars.objects.all(), 'Ferrari')), [car])
+        car.name = 'Maserati GranTurismo'
+        car.save()
+        self.assertEqual(list(search(Cars.objects.all(), 'Ferrari')), [])
+        self.assertEqual(list(search(Cars.objects.all(), 'Maserati')), [car])
+
+    def test_article_is_found(self):
+        user = User.objects.create_user('author')
+        article = Article.objects.create(title='Обзор', slug='review', excerpt='Кратко', content='Электромобили',
+                                         image='articles/article.jpg', author=user)
+        self.assertEqual(list(search(Article.objects.all(), 'электромобили')), [article])
+
+
+@override_settings(DATABASE_REPLICAS=[])
+class PageCacheTests(CatalogTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('driver', 'driver@example.com', 'secret-pass-123')
+        cls.fan = User.objects.create_user('fan', 'fan@example.com', 'secret-pass-123')
+        cls.parent, cls.child = seed_catalog(1, cls.user)
+
+    def like_counts(self, url):
+        response = self.client.get(url)
+        return sorted(car.likes_count for car in response.context['cars']) if response.context else None
+
+    def test_like_invalidates_cached_list(self):
+        url = reverse('cars:cars', args=[self.child.slug])
+        self.assertEqual(self.like_counts(url), [1])
+        # Из кеша ответ приходит без контекста шаблона
+        self.assertIsNone(self.like_counts(url))
+        with self.captureOnCommitCallbacks(execute=True):
+            likes.like(Cars.objects.get(cat=self.child).pk, self.fan)
+        self.assertEqual(self.like_counts(url), [2])
+
+
+@override_settings(DATABASE_REPLICAS=[])
+class CounterTests(CatalogTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('driver', 'driver@example.com', 'secret-pass-123')
+        cls.parent, cls.child = seed_catalog(2, cls.user)
+
+    def test_signals_keep_counters(self):
+        car = Cars.objects.filter(cat=self.child).first()
+        self.assertEqual((car.likes_count, car.photos_count, car.comments_count), (1, 1, 2))
+        self.assertEqual(Category.objects.get(pk=self.child.pk).cars_count, 2)
+        Comment.objects.filter(car=car).first().delete()
+        car.cat = self.parent
+        car.save()
+        car.refresh_from_db()
+        self.assertEqual(car.comments_count, 1)
+        self.assertEqual(Category.objects.get(pk=self.child.pk).cars_count, 1)
+        self.assertEqual(Category.objects.get(pk=self.parent.pk).cars_count, 3)
+
+    def test_reconcile_repairs_drift(self):
+        Cars.objects.update(likes_count=99, photos_count=0, comments_count=7)
+        Category.objects.update(cars_count=0)
+        counters.reconcile()
+        self.assertEqual(set(Cars.objects.values_list('likes_count', 'photos_count', 'comments_count')), {(1, 1, 2)})
+        self.assertEqual(set(Category.objects.values_list('cars_count', flat=True)), {2})
+
+    def test_clearing_likes_bumps_user_like_versions(self):
+        car = Cars.objects.first()
+        before = likes.user_likes_version(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            car.likes.clear()
+        car.refresh_from_db()
+        self.assertEqual(car.likes_count, 0)
+        self.assertNotEqual(likes.user_likes_version(self.user), before)
+
+
+
+
+@override_settings(DATABASE_REPLICAS=[])
+class LikeTests(CatalogTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('driver', 'driver@example.com', 'secret-pass-123')
+        cls.fan = User.objects.create_user('fan', 'fan@example.com', 'secret-pass-123')
+        seed_catalog(1, cls.user)
+        cls.car = Cars.objects.order_by('pk').first()
+
+    def post(self, action):
+        return self.client.post(reverse(f'cars:car_{action}', args=[self.car.slug])).json()
+
+    def test_repeated_like_is_idempotent(self):
+        self.client.force_login(self.fan)
+        self.assertEqual(self.post('like'), {'liked': True, 'likes': 2})
+        self.assertEqual(self.post('like'), {'liked': True, 'likes': 2})
+        self.assertFalse(likes.like(self.car.pk, self.fan))
+        self.assertEqual(self.car.likes.count(), 2)
+
+        self.assertEqual(self.post('unlike'), {'liked': False, 'likes': 1})
+        self.assertEqual(self.post('unlike'), {'liked': False, 'likes': 1})
+        self.assertFalse(likes.unlike(self.car.pk, self.fan))
+
+    def test_anonymous_like_is_rejected(self):
+        response = self.client.post(reverse('cars:car_like', args=[self.car.slug]))
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(Cars.objects.get(pk=self.car.pk).likes_count, 1)
+
+
+class CommentThreadTests(CatalogTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('driver', 'driver@example.com', 'secret-pass-123')
+        seed_catalog(1, cls.user)
+        cls.car = Cars.objects.order_by('pk').first()
+
+    def reply(self, parent, content="Ответ"):
+        return Comment.objects.create(user=self.user, car=self.car, parent=parent, content=content)
+
+    def test_replies_get_root_and_depth(self):
+        root = Comment.objects.filter(car=self.car, parent__isnull=True).get()
+        first = Comment.objects.get(parent=root)
+        second = self.reply(first)
+        third = self.reply(second)
+        self.assertEqual([(comment.root_id, comment.depth) for comment in (root, first, second, third)],
+                         [(None, 0), (root.pk, 1), (root.pk, 2), (root.pk, 3)])
+
+    def test_thread_nests_replies_up_to_max_depth(self):
+        root = Comment.objects.filter(car=self.car, parent__isnull=True).get()
+        first = Comment.objects.get(parent=root)
+        second = self.reply(first)
+        self.reply(second)
+        hidden = self.reply(root, "Скрытый")
+        hidden.is_active = False
+        hidden.save()
+        self.reply(hidden)
+
+        with track_queries() as queries:
+            [node] = load_thread(car=self.car, max_depth=2)
+        self.assertEqual(queries.count, 2)
+        self.assertEqual(node.pk, root.pk)
+        self.assertEqual([reply.pk for reply in node.children], [first.pk])
+        self.assertEqual([reply.pk for reply in node.children[0].children], [second.pk])
+        self.assertEqual(node.children[0].children[0].children, [])
+
+
+@override_settings(DATABASE_REPLICAS=[])
+class SiteStatsTests(CatalogTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('driver', 'driver@example.com', 'secret-pass-123')
+        cls.parent, cls.child = seed_catalog(2, cls.user)
+
+    def current(self):
+        row = SiteStats.objects.get(pk=stats.STATS_PK)
+        return row.cars, row.categories, row.articles
+
+    def test_signals_keep_stats(self):
+        self.assertEqual(self.current(), (4, 2, 1))
+        Cars.objects.filter(cat=self.child).first().delete()
+        Category.objects.create(title="Кабриолеты", slug='cabrio', description='', image='category/x.jpg')
+        Article.objects.filter(cars__isnull=False).distinct().get().delete()
+        self.assertEqual(self.current(), (3, 3, 0))
+
+    def test_missing_or_drifted_row_is_recounted(self):
+        SiteStats.objects.all().delete()
+        self.assertEqual((stats.get_stats().cars, stats.get_stats().categories), (4, 2))
+        SiteStats.objects.update(cars=100, articles=0)
+        stats.reconcile()
+        self.assertEqual(self.current(), (4, 2, 1))
+
+    def test_about_page_uses_stats_row(self):
+        SiteStats.objects.update(cars=40, categories=5, articles=7)
+        context = self.client.get(reverse('cars:about')).context
+        self.assertEqual((context['total_cars'], context['total_categories'], context['total_articles']),
+                         (40, 5, 7))
+
+class RenditionTests(TestCase):
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name, IMAGE_RENDITION_WIDTHS=(8,)))
+        cache.clear()
+
+    @staticmethod
+    def upload(name, image, fmt):
+        buffer = io.BytesIO()
+        image.save(buffer, fmt)
+        return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+    def test_extension_follows_output_format(self):
+        sources = {
+            'cars/plain.png': (Image.new('RGB', (32, 16), 'red'), 'PNG', 'jpg'),
+            'cars/alpha.png': (Image.new('RGBA', (32, 16), (0, 0, 0, 0)), 'PNG', 'png'),
+            'cars/anim.gif': (Image.new('P', (32, 16)), 'GIF', 'jpg'),
+            'cars/photo.webp': (Image.new('RGB', (32, 16), 'blue'), 'WEBP', 'jpg'),
+        }
+        for name, (image, fmt, ext) in sources.items():
+            with self.subTest(name=name):
+                field_file = Cars(image=self.upload(name, image, fmt)).image
+                meta = renditions.generate(field_file)
+                copy = renditions.rendition_name(field_file.name, 8, ext)
+                self.assertEqual(meta['ext'], ext)
+                self.assertTrue(default_storage.exists(copy))
+                self.assertEqual(Image.open(default_storage.open(copy)).format, 'PNG' if ext == 'png' else 'JPEG')
+                self.assertEqual(renditions.rendition_url(field_file, 8), default_storage.url(copy))
+
+    def test_originals_with_same_stem_keep_own_renditions(self):
+        jpeg = Cars(image=self.upload('cars/bmw.jpg', Image.new('RGB', (32, 16), 'red'), 'JPEG')).image
+        png = Cars(image=self.upload('cars/bmw.png', Image.new('RGBA', (16, 16), (0, 0, 255, 128)), 'PNG')).image
+        jpeg_meta, png_meta = renditions.get_meta(jpeg), renditions.get_meta(png)
+        self.assertNotEqual(renditions.meta_name(jpeg.name), renditions.meta_name(png.name))
+        self.assertEqual((jpeg_meta['width'], png_meta['width']), (32, 16))
+        self.assertNotEqual(renditions.rendition_url(jpeg, 8), renditions.rendition_url(png, 8))
+        cache.clear()
+        self.assertEqual(renditions.get_meta(jpeg)['width'], 32)
+
+    def test_missing_original_is_logged_without_traceback(self):
+        field_file = Cars(image='cars/missing.jpg').image
+        with self.assertLogs('cars.renditions', 'WARNING') as logs:
+            self.assertIsNone(renditions.get_meta(field_file))
+        self.assertIsNone(logs.records[0].exc_info)
+
+    def test_forced_failures_are_logged_with_pk(self):
+        category = Category.objects.create(title="Битая", slug='broken', description='', image='category/missing.jpg')
+        with self.assertLogs('cars.management.commands.generate_renditions', 'ERROR') as logs:
+            call_command('generate_renditions', '--force', stdout=io.StringIO())
+        self.assertIn(f"cars.Category pk={category.pk}", logs.output[0])
+
+
+class StaticPipelineTests(TestCase):
+
+    def setUp(self):
+        source, root = tempfile.TemporaryDirectory(), tempfile.TemporaryDirectory()
+        self.addCleanup(source.cleanup)
+        self.addCleanup(root.cleanup)
+        css, img = Path(source.name, 'css'), Path(source.name, 'img')
+        css.mkdir()
+        img.mkdir()
+        (img / 'bg.png').write_bytes(b'\x89PNG' + bytes(64))
+        (css / 'site.css').write_text("body { background: url('../img/bg.png'); }\n" + ".card { margin: 0; }\n" * 40)
+        self.enterContext(override_settings(
+            STATIC_ROOT=root.name, STATICFILES_DIRS=[source.name],
+            STATICFILES_FINDERS=['django.contrib.staticfiles.finders.FileSystemFinder'],
+        ))
+        call_command('collectstatic', interactive=False, verbosity=0)
+        self.hashed = static('css/site.css')
+
+    def test_collectstatic_hashes_and_compresses(self):
+        self.assertRegex(self.hashed, r'^/static/css/site\.[0-9a-f]{12}\.css$')
+        path = Path(settings.STATIC_ROOT, self.hashed.removeprefix('/static/'))
+        self.assertEqual(gzip.decompress(Path(f"{path}.gz").read_bytes()), path.read_bytes())
+        # Ссылки внутри CSS тоже ведут на файлы с хешем
+        self.assertRegex(path.read_text(), r'url\("\.\./img/bg\.[0-9a-f]{12}\.png"\)')
+
+    def test_middleware_serves_compressed_immutable_files(self):
+        response = self.client.get(self.hashed, headers={'accept-encoding': 'br;q=0, gzip'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content))[:4], b'body')
+
+        plain = self.client.get('/static/css/site.css')
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertEqual(plain['Cache-Control'], 'public, max-age=3600')
+        response = self.client.get(self.hashed, headers={'if-modified-since': plain['Last-Modified']})
+        self.assertEqual(response.status_code, 304)
+
+
+class BenchSiteTests(TestCase):
+    """bench_site пишет в настроенную БД только по явному флагу"""
+
+    @override_settings(DEBUG=False)
+    def test_refuses_without_debug(self):
+        with self.assertRaisesMessage(CommandError, 'DEBUG'):
+            call_command('bench_site', '--requests', '1', stdout=io.StringIO())
+
+    @override_settings(DEBUG=True)
+    def test_writes_need_flag(self):
+        with self.assertRaisesMessage(CommandError, '--allow-writes'):
+            call_command('bench_site', '--seed-cars', '5', stdout=io.StringIO())
+        self.assertFalse(Category.objects.exists())
+
+    def test_login_routes_are_reported_as_skipped(self):
+        skipped = bench_site.Command.skipped_routes
+        for options in ({'server': None, 'allow_writes': False},
+                        {'server': 'http://127.0.0.1:8000', 'allow_writes': True}):
+            with self.subTest(**options):
+                self.assertEqual(set(skipped(bench_site.DEFAULT_MIX, options)), bench_site.LOGIN_REQUIRED)
+        self.assertEqual(skipped(bench_site.DEFAULT_MIX, {'server': None, 'allow_writes': True}), {})
+        self.assertTrue({'users:password_reset', 'users:profile_edit'} <= bench_site.DEFAULT_MIX.keys())
+
+
+class SyntheticCatalogTests(TestCase):
+
+    def test_writers_fill_every_required_column(self):
+        generator = CatalogGenerator(cars=6, categories=3, users=3, articles=2, use_copy=False)
+        written = generator.generate()
+        self.assertEqual(written['cars.Cars'], 6)
+        # Тесты идут на SQLite, где COPY не используется: проверяем, что любой
+        # writer передал бы в COPY каждую NOT NULL колонку и значение для неё
+        for writer in generator.writers:
+            with self.subTest(model=writer.model._meta.label):
+                columns = [field.column for field in writer.fields]
+                self.assertEqual(len(columns), len(set(columns)))
+                required = {field.column for field in writer.model._meta.concrete_fields
+                            if not field.null and not isinstance(field, AutoField)}
+                self.assertLessEqual(required, set(columns))
+                defaulted = writer.fields[len(writer.fields) - len(writer.defaults):]
+                for field, value in zip(defaulted, writer.defaults):
+                    self.assertTrue(value is not None or field.null, field.name)
+        self.assertFalse(Cars.objects.filter(similar_stale=False).exists())
+
+
+class CatalogImportTests(CatalogTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('driver', 'driver@example.com', 'secret-pass-123')
+        seed_catalog(1, cls.user)
+
+    def test_bad_jsonl_lines_are_reported_and_skipped(self):
+        lines = [
+            json.dumps({'name': "Новая 1", 'slug': 'new-1', 'category': 'sport'}),
+            '{"name": "Битая",',
+            '',
+            '["не", "объект"]',
+            json.dumps({'name': "Без категории", 'category': 'trucks'}),
+            json.dumps({'name': "Новая 2", 'slug': 'new-2', 'category': 'coupe', 'price': '25000'}),
+        ]
+        rows = catalog_io.read_rows(io.StringIO('\n'.join(lines) + '\n'), 'jsonl')
+        result = catalog_io.import_rows(rows, batch_size=2)
+        self.assertEqual((result.created, result.updated, result.skipped), (2, 0, 3))
+        self.assertEqual([error.split(':')[0] for error in result.errors], ['строка 2', 'строка 4', 'строка 5'])
+        self.assertEqual(Cars.objects.get(slug='new-2').price, 25000)
+
+    def test_values_the_database_would_reject_are_reported(self):
+        rows = [
+            {'name': "Категория числом", 'category': 5},
+            {'name': "Из прошлого", 'category': 'sport', 'year': -5},
+            {'name': "Дорогая", 'category': 'sport', 'price': '1' * 20},
+            {'name': "Список", 'category': 'sport', 'horsepower': [300]},
+            {'name': "Длинная" * 20, 'category': 'sport'},
+            {'name': "Картинка", 'category': 'sport', 'image': 'cars/' + 'x' * 200},
+            {'name': "Годная", 'slug': 'fine', 'category': 'sport', 'year': 2024, 'price': 30000.5},
+        ]
+        result = catalog_io.import_rows(enumerate(rows, start=1), batch_size=3)
+        self.assertEqual((result.created, result.skipped), (1, 6))
+        self.assertEqual([error.split(':')[0] for error in result.errors], [f'строка {line}' for line in range(1, 7)])
+        self.assertIn("поле «year»", result.errors[1])
+        car = Cars.objects.get(slug='fine')
+        self.assertEqual((car.year, car.price), (2024, Decimal('30000.50')))
+
+    def test_csv_errors_carry_file_line(self):
+        stream = io.StringIO("name,slug,category,year\n"
+                             "Купе,car-0,coupe,2020\n"
+                             "Кривая,bad slug,coupe,2020\n")
+        result = catalog_io.import_rows(catalog_io.read_rows(stream, 'csv'))
+        self.assertEqual((result.created, result.updated, result.skipped), (0, 1, 1))
+        self.assertTrue(result.errors[0].startswith('строка 3:'))
+        self.assertEqual(Cars.objects.get(slug='car-0').year, 2020)
+
+
+class SimilarCarsTests(CatalogTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('driver', 'driver@example.com', 'secret-pass-123')
+        cls.parent, cls.child = seed_catalog(5, cls.user)
+
+    @staticmethod
+    def pairs():
+        return set(SimilarCar.objects.values_list('car_id', 'similar_id'))
+
+    def test_only_tracked_changes_mark_car_stale(self):
+        self.assertFalse(Cars.objects.filter(similar_stale=False).exists())
+        similar.rebuild(k=3)
+        car = Cars.objects.first()
+        self.assertFalse(car.similar_stale)
+        car.description = "Новое описание"
+        car.save()
+        self.assertFalse(Cars.objects.get(pk=car.pk).similar_stale)
+        car.horsepower += 50
+        car.save(update_fields=['horsepower'])
+        self.assertTrue(Cars.objects.get(pk=car.pk).similar_stale)
+        self.assertEqual(similar.refresh_stale(k=3), 1)
+        self.assertFalse(Cars.objects.filter(similar_stale=True).exists())
+
+    def test_refresh_matches_rebuild(self):
+        similar.rebuild(k=3)
+        car = Cars.objects.filter(cat=self.child).first()
+        car.cat = self.parent
+        car.save()
+        similar.refresh_stale(k=3)
+        refreshed = self.pairs()
+        similar.rebuild(k=3)
+        self.assertEqual(refreshed, self.pairs())
+        self.assertEqual(SimilarCar.objects.filter(car=car).count(), 3)
+
+    def test_chunks_follow_memory_cap(self):
+        with override_settings(SIMILAR_CARS_CHUNK_MEMORY_MB=1):
+            self.assertEqual(similar.chunk_rows(20000), 2)
+            self.assertEqual(similar.chunk_rows(10), similar.BATCH_SIZE)
+        similar.rebuild(k=3)
+        expected = self.pairs()
+        with override_settings(SIMILAR_CARS_CHUNK_MEMORY_MB=0):
+            self.assertEqual(similar.chunk_rows(10), 1)
+            self.assertEqual(similar.rebuild(k=3), 30)
+        self.assertEqual(self.pairs(), expected)
+
+
+@override_settings(DATABASE_REPLICAS=[])
+class TrackQueriesTests(TestCase):
+
+    def test_counts_duplicates(self):
+        with track_queries() as queries:
+            for pk in (1, 2, 3):
+                Cars.objects.filter(pk=pk).exists()
+            Category.objects.count()
+        self.assertEqual(queries.count, 4)
+        self.assertEqual(queries.duplicate_count, 2)
+        self.assertEqual(len(queries.duplicates), 1)
+
+    @override_settings(DEBUG=True)
+    def test_debug_headers(self):
+        response = self.client.get(reverse('cars:about'))
+        self.assertIn('X-DB-Queries', response)
+        self.assertIn('X-DB-Time', response)
+        self.assertIn('X-DB-Duplicates', response)
+
+    @override_settings(QUERY_BUDGET_LOG_QUERIES=1)
+    def test_logs_pages_over_threshold(self):
+        with self.assertLogs('cars.query_budget', level='WARNING') as logs:
+            self.client.get(reverse('cars:category'))
+        self.assertIn('cars:category', logs.output[0])
+
+
+class ReplicaRoutingTests(CatalogTestCase):
+    """Роль реплики в тестах играет сама основная БД"""
+
+    def setUp(self):
+        super().setUp()
+        seed_images()
+        self.middleware = db_router.ReplicaRoutingMiddleware(lambda request: None)
+        self.addCleanup(db_router._read_alias.set, None)
+
+    def route(self, path, method='get', cookies=None):
+        request = getattr(RequestFactory(), method)(path)
+        request.COOKIES.update(cookies or {})
+        request.resolver_match = resolve(path)
+        self.middleware.process_view(request, None, (), {})
+        return db_router.read_alias()
+
+    def test_auth_models_always_read_from_primary(self):
+        db_router._read_alias.set('replica1')
+        router = db_router.ReplicaRouter()
+        self.assertEqual(router.db_for_read(User), 'default')
+        self.assertEqual(router.db_for_read(Cars), 'replica1')
+        self.assertEqual(router.db_for_write(Cars), 'default')
+
+    @override_settings(DATABASE_REPLICAS=['default'])
+    def test_catalog_reads_go_to_replica(self):
+        self.assertEqual(self.route(reverse('cars:category')), 'default')
+        db_router._read_alias.set(None)
+        self.assertIsNone(self.route(reverse('users:login')))
+        self.assertIsNone(self.route(reverse('cars:category'), cookies={db_router.PIN_COOKIE: '1'}))
+
+    @override_settings(DATABASE_REPLICAS=['default'])
+    def test_write_pins_client_to_primary(self):
+        user = User.objects.create_user('driver', 'driver@example.com', 'secret-pass-123')
+        category = Category.objects.create(title='Sport', description='', image='category/sport.jpg')
+        car = Cars.objects.create(name='Car', description='', image='cars/car.jpg', cat=category)
+        self.client.force_login(user)
+        response = self.client.post(reverse('cars:car_like', args=[car.slug]))
+        self.assertEqual(response.cookies[db_router.PIN_COOKIE]['max-age'], 5)
+        response = self.client.get(reverse('cars:category'))
+        self.assertNotIn(db_router.PIN_COOKIE, response.cookies)
+
+    @override_settings(DATABASE_REPLICAS=['replica'])
+    def test_unavailable_replica_falls_back_to_primary(self):
+        # Реплика недавно не ответила и ещё не проверяется заново
+        db_router._unhealthy['replica'] = float('inf')
+        self.addCleanup(db_router._unhealthy.pop, 'replica', None)
+        self.assertIsNone(self.route(reverse('cars:category')))
@@ -1,15 +1,27 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
 
 app_name = 'cars'
 
+# Под ASGI страницы каталога могут обслуживаться асинхронными версиями
+catalog = async_views if settings.ASYNC_VIEWS else views
+
 
 urlpatterns = [
-    path("", views.Template.as_view(), name='index'),
-    path("categories/", views.CategoryList.as_view(), name='category'),
-    path("categories/<slug:cat_slug>/", views.CarsList.as_view(), name='cars'),
-    path("car/<slug:car_slug>/", views.CarDetail.as_view(), name='car_detail'),
-    path("about/", views.AboutView.as_view(), name='about'),
+    path("", catalog.Template.as_view(), name='index'),
+    path("categories/", catalog.CategoryList.as_view(), name='category'),
+    path("categories/<slug:cat_slug>/", catalog.CarsList.as_view(), name='cars'),
+    path("car/<slug:car_slug>/", catalog.CarDetail.as_view(), name='car_detail'),
+    path("manufacturers/<slug:manufacturer_slug>/", views.ManufacturerCars.as_view(), name='manufacturer'),
+    path("car/<slug:car_slug>/like/", views.CarLikeView.as_view(action='like'), name='car_like'),
+    path("car/<slug:car_slug>/unlike/", views.CarLikeView.as_view(action='unlike'), name='car_unlike'),
+    path("about/", catalog.AboutView.as_view(), name='about'),
+    path("filter/", views.CarFilterView.as_view(), name='filter'),
+    path("filter/json/", views.CarFilterJson.as_view(), name='filter_json'),
+    path("search/", views.SearchView.as_view(), name='search'),
+    path("compare/", views.CompareView.as_view(), name='compare'),
+    path("export/", views.CarExportView.as_view(), name='export'),
 ]
 
 
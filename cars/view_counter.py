@@ -0,0 +1,137 @@
+"""
+Буферизованный (write-behind) счётчик просмотров.
+
+Вместо UPDATE на каждый просмотр страницы инкременты копятся в памяти
+процесса и раз в VIEW_COUNTER_FLUSH_INTERVAL секунд сбрасываются в БД
+пакетными UPDATE через F(). Срок проверяется по сигналу request_finished,
+то есть уже после отправки ответа, и при завершении процесса. Подходит
+для любых моделей с полем views (Cars, Article, CarVideo).
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import DatabaseError, transaction
+from django.db.models import F
+from django.dispatch import receiver
+
+from . import page_cache
+
+logger = logging.getLogger(__name__)
+
+# Сколько pk обновлять одним UPDATE ... WHERE id IN (...)
+FLUSH_BATCH_SIZE = 500
+
+
+class ViewCounterBuffer:
+    """
+    Потокобезопасный буфер инкрементов просмотров
+    Ключ - (модель, pk), значение - число ещё не записанных просмотров
+    """
+
+    def __init__(self, flush_interval=None):
+        self._lock = threading.Lock()
+        self._pending = defaultdict(int)
+        self._last_flush = time.monotonic()
+        self._flush_interval = flush_interval
+
+    @property
+    def flush_interval(self):
+        if self._flush_interval is not None:
+            return self._flush_interval
+        return getattr(settings, 'VIEW_COUNTER_FLUSH_INTERVAL', 30)
+
+    def record(self, obj):
+        """
+        Учитывает один просмотр объекта.
+        Возвращает число просмотров, ещё не попавших в БД (включая этот),
+        чтобы страница могла показать актуальное значение.
+        """
+        key = (type(obj), obj.pk)
+        with self._lock:
+            self._pending[key] += 1
+            return self._pending[key]
+
+    def pending(self, obj):
+        """Число незаписанных просмотров объекта"""
+        with self._lock:
+            return self._pending.get((type(obj), obj.pk), 0)
+
+    def clear(self):
+        """Отбрасывает незаписанные просмотры (тесты: БД может исчезнуть раньше atexit)"""
+        with self._lock:
+            self._pending = defaultdict(int)
+
+    def maybe_flush(self):
+        """Сбрасывает буфер, если с прошлого сброса прошло достаточно времени"""
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """
+        Записывает накопленные просмотры в БД.
+        Объекты группируются по величине инкремента, так что на каждую
+        модель уходит по одному UPDATE на каждое различное значение.
+        Возвращает число обновлённых объектов.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(int)
+            self._last_flush = time.monotonic()
+        if not pending:
+            return 0
+
+        groups = defaultdict(lambda: defaultdict(list))
+        for (model, pk), count in pending.items():
+            groups[model][count].append(pk)
+
+        try:
+            with transaction.atomic():
+                for model, by_count in groups.items():
+                    for count, pks in by_count.items():
+                        # Сортировка pk - единый порядок блокировок между воркерами
+                        pks.sort()
+                        for start in range(0, len(pks), FLUSH_BATCH_SIZE):
+                            model._base_manager.filter(
+                                pk__in=pks[start:start + FLUSH_BATCH_SIZE]
+                            ).update(views=F('views') + count)
+        except DatabaseError:
+            # Возвращаем инкременты в буфер, чтобы не потерять их
+            with self._lock:
+                for key, count in pending.items():
+                    self._pending[key] += count
+            logger.exception("Не удалось записать счётчики просмотров")
+            return 0
+        for model in groups:
+            page_cache.bump_key_version(page_cache.views_key(model))
+        return len(pending)
+
+
+view_counter = ViewCounterBuffer()
+
+
+def record_view(obj):
+    """Учитывает просмотр объекта в общем буфере процесса"""
+    return view_counter.record(obj)
+
+
+def flush_views():
+    """Принудительно сбрасывает буфер просмотров (хук для shutdown/тестов)"""
+    return view_counter.flush()
+
+
+@receiver(request_finished)
+def flush_after_request(sender, **kwargs):
+    """Сброс по времени после ответа, а не только при следующем просмотре"""
+    view_counter.maybe_flush()
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        flush_views()
+    except Exception:
+        logger.exception("Ошибка сброса счётчиков просмотров при завершении")
@@ -1,65 +1,369 @@
-from django.views.generic import TemplateView, ListView, DetailView
+from django.conf import settings
+from django.contrib.auth.mixins import UserPassesTestMixin
+from django.views.generic import TemplateView, ListView, DetailView, View
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
 from django.shortcuts import get_object_or_404
-from .models import Category, Cars, Article
+from django.urls import reverse
+from django.db.models import Count, Max, Subquery, Sum
+from . import catalog_io, likes, page_cache
+from .comments import load_thread
+from .compare import get_comparison, parse_slugs
+from .conditional import ConditionalGetMixin
+from .facets import facet_index
+from .forms import CarFilterForm
+from .manufacturers import brand_summary
+from .models import Category, Cars, Article, CarPhoto, Comment, Manufacturer, SimilarCar
+from .page_cache import CachedPageMixin
+from .pagination import InvalidCursor, KeysetPaginator
+from .search import search
+from .similar import similar_cars
+from .stats import get_stats
+from .view_counter import record_view
 
 
-class Template(TemplateView):
+class Template(CachedPageMixin, TemplateView):
     '''Главная страница'''
     template_name = 'cars/index.html'
 
 
-class CategoryList(ListView):
+class CategoryList(ConditionalGetMixin, CachedPageMixin, ListView):
     '''Список категорий'''
     model = Category
+    cache_models = (Category, Cars)
+
+    def get_validators(self):
+        summary = Category.objects.aggregate(
+            updated=Max('updated'), total=Count('pk'), cars_total=Sum('cars_count'),
+        )
+        return summary['updated'], (summary['total'], summary['cars_total'])
     context_object_name = "category"
     template_name = 'cars/category_list.html'
 
     def get_queryset(self):
-        return Category.objects.all().order_by('-created')
+        return Category.objects.select_related('parent').order_by('-created')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['total_cars'] = Cars.objects.count()
+        context['total_cars'] = get_stats().cars
         return context
 
 
-class CarsList(ListView):
+class KeysetPaginationMixin:
+    '''Страницы списка по курсору (cars/pagination.py) вместо номера страницы'''
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(queryset, page_size, ordering=self.ordering)
+        try:
+            page = paginator.get_page(self.request.GET.get('cursor'))
+        except InvalidCursor:
+            raise Http404("Некорректный курсор страницы")
+        return paginator, page, page.object_list, page.has_other_pages()
+
+
+class CarsList(ConditionalGetMixin, KeysetPaginationMixin, CachedPageMixin, ListView):
     context_object_name = 'cars'
+    cache_models = (Category, Cars, CarPhoto)
     template_name = 'cars/cars_list.html'
+    paginate_by = 24
+    # Сортировка совпадает с индексом (cat, -created, -id)
+    ordering = ('-created', '-id')
 
     def get_queryset(self):
-        category_slug = self.kwargs.get('cat_slug')
-        category = get_object_or_404(Category, slug=category_slug)
-        return Cars.objects.filter(cat=category).order_by('-created')
+        # Категория загружается один раз и переиспользуется в контексте
+        self.category = get_object_or_404(Category, slug=self.kwargs.get('cat_slug'))
+        if self.include_subcategories():
+            # Все подкатегории одним запросом по префиксу материализованного пути
+            return self.category.subtree_cars()
+        return Cars.objects.filter(cat=self.category)
+
+    def include_subcategories(self):
+        return self.request.GET.get('subcategories') == '1'
+
+    def get_validators(self):
+        # Категория и её машины (с подкатегориями - всё поддерево) одним запросом
+        categories = Category.objects.filter(slug=self.kwargs.get('cat_slug'))
+        if self.include_subcategories():
+            categories = Category.objects.filter(path__startswith=Subquery(categories.values('path')[:1]))
+        summary = categories.aggregate(
+            updated=Max('updated'), cars_updated=Max('cars__updated'),
+            total=Count('cars'), likes=Sum('cars__likes_count'),
+        )
+        if summary['updated'] is None:
+            return None
+        last_modified = max(filter(None, (summary['updated'], summary['cars_updated'])))
+        return last_modified, (self.request.GET.urlencode(), summary['total'], summary['likes'])
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        category_slug = self.kwargs.get('cat_slug')
-        context['category'] = get_object_or_404(Category, slug=category_slug)
+        context['category'] = self.category
+        context['liked_ids'] = likes.liked_car_ids(self.request.user, context['cars'])
+        context['category_ancestors'] = self.category.get_ancestors()
+        context['has_subcategories'] = self.category.children.exists()
+        context['include_subcategories'] = self.include_subcategories()
         return context
 
 
-class CarDetail(DetailView):
+class CarDetail(ConditionalGetMixin, DetailView):
     model = Cars
+    queryset = Cars.objects.select_related('cat', 'author', 'manufacturer')
     context_object_name = 'car'
     template_name = 'cars/car_detail.html'
     slug_field = 'slug'
     slug_url_kwarg = 'car_slug'
 
+    def get_validators(self):
+        row = (Cars.objects.filter(slug=self.kwargs.get(self.slug_url_kwarg))
+               .values_list('pk', 'updated', 'cat__updated', 'manufacturer_id',
+                            'likes_count', 'photos_count', 'comments_count')
+               .first())
+        if row is None:
+            return None
+        self.car_id, updated, cat_updated, *counts = row
+        # Фото, комментарии, похожие машины и производитель меняются без updated машины
+        version = page_cache.get_version(CarPhoto, Comment, SimilarCar, Manufacturer)
+        return max(updated, cat_updated), (self.request.GET.urlencode(), *counts, version)
+
+    def get_comments(self):
+        try:
+            return load_thread(car=self.object, cursor=self.request.GET.get('comments'))
+        except InvalidCursor:
+            return load_thread(car=self.object)
+
+    def not_modified(self, request):
+        # Повторный визит с 304 - тоже просмотр
+        record_view(Cars(pk=self.car_id))
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        self.object.views += 1
-        self.object.save(update_fields=['views'])
+        context['category_ancestors'] = self.object.cat.get_ancestors()
+        context['is_liked'] = bool(likes.liked_car_ids(self.request.user, [self.object]))
+        context['related_cars'] = similar_cars(self.object)
+        context['comments'] = self.get_comments()
+        # Просмотр попадает в буфер и пишется в БД пакетно, см. view_counter
+        self.object.views += record_view(self.object)
         return context
 
 
-class AboutView(TemplateView):
+class ManufacturerCars(KeysetPaginationMixin, CachedPageMixin, ListView):
+    '''Машины производителя'''
+    context_object_name = 'cars'
+    cache_models = (Manufacturer, Cars, CarPhoto)
+    template_name = 'cars/manufacturer_cars.html'
+    paginate_by = 24
+    # Сортировка совпадает с индексом (manufacturer, -created, -id)
+    ordering = ('-created', '-id')
+
+    def get_queryset(self):
+        self.manufacturer = get_object_or_404(Manufacturer, slug=self.kwargs.get('manufacturer_slug'))
+        return Cars.objects.filter(manufacturer=self.manufacturer, is_active=True)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['manufacturer'] = self.manufacturer
+        context['brand_stats'] = brand_summary(self.manufacturer)
+        context['liked_ids'] = likes.liked_car_ids(self.request.user, context['cars'])
+        return context
+
+
+class CompareView(TemplateView):
+    '''Сравнение характеристик нескольких машин (?cars=слаг,слаг,...)'''
+    template_name = 'cars/compare.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        slugs = parse_slugs(self.request.GET.get('cars', ''), settings.COMPARE_MAX_CARS)
+        comparison = get_comparison(slugs) if slugs else None
+        if comparison:
+            shown = [car['slug'] for car in comparison['cars']]
+            for car in comparison['cars']:
+                # Адрес того же сравнения без этой машины
+                car['without'] = ','.join(slug for slug in shown if slug != car['slug'])
+        context['slugs'] = slugs
+        context['comparison'] = comparison
+        context['max_cars'] = settings.COMPARE_MAX_CARS
+        return context
+
+
+class CarLikeView(View):
+    '''
+    Лайк/анлайк машины (POST, JSON). Повторный запрос ничего не меняет,
+    в ответе всегда текущее состояние и число лайков
+    '''
+    http_method_names = ['post']
+    action = 'like'
+
+    def post(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Требуется авторизация'}, status=401)
+        car_id = (Cars.objects.filter(slug=kwargs['car_slug'])
+                  .values_list('pk', flat=True).first())
+        if car_id is None:
+            raise Http404("Автомобиль не найден")
+
+        if self.action == 'like':
+            likes.like(car_id, request.user)
+        else:
+            likes.unlike(car_id, request.user)
+        count = Cars.objects.filter(pk=car_id).values_list('likes_count', flat=True).get()
+        return JsonResponse({'liked': self.action == 'like', 'likes': count})
+
+
+class AboutView(CachedPageMixin, TemplateView):
     template_name = 'cars/about.html'
+    cache_models = (Category, Cars, Article)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        # Добавляем статистику для страницы "О проекте"
-        context['total_cars'] = Cars.objects.count()
-        context['total_categories'] = Category.objects.count()
-        context['total_articles'] = Article.objects.count()
-        return context
\ No newline at end of file
+        # Статистика для страницы "О проекте" - одна строка вместо трёх COUNT(*)
+        stats = get_stats()
+        context['total_cars'] = stats.cars
+        context['total_categories'] = stats.categories
+        context['total_articles'] = stats.articles
+        return context
+
+
+class CarFilterMixin:
+    """
+    Общая часть HTML- и JSON-подбора: разбор фильтров и запрос к фасетному индексу
+    """
+    paginate_by = 24
+    result_fields = ('id', 'name', 'slug', 'price', 'year', 'horsepower', 'engine_volume',
+                     'acceleration_0_100', 'top_speed', 'cat_id')
+
+    def get_filter_result(self, form):
+        data = form.cleaned_data
+        page = data.get('page') or 1
+        result = facet_index.query(
+            ranges=form.get_ranges(),
+            categories=data.get('cat'),
+            sort=data.get('sort') or '-created',
+            offset=(page - 1) * self.paginate_by,
+            limit=self.paginate_by,
+        )
+        result.page = page
+        result.has_next = page * self.paginate_by < result.total
+        return result
+
+
+class CarFilterView(CarFilterMixin, TemplateView):
+    '''Подбор автомобилей по характеристикам с фасетами'''
+    template_name = 'cars/car_filter.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        form = CarFilterForm(self.request.GET)
+        if not form.is_valid():
+            # Некорректные параметры игнорируем и показываем весь каталог
+            form = CarFilterForm({})
+            form.is_valid()
+        result = self.get_filter_result(form)
+
+        cars = Cars.objects.in_bulk(result.ids)
+        titles = dict(Category.objects.filter(pk__in=result.facets['category'])
+                      .values_list('pk', 'title'))
+        query = self.request.GET.copy()
+        query.pop('page', None)
+
+        context['form'] = form
+        context['cars'] = [cars[pk] for pk in result.ids if pk in cars]
+        context['total'] = result.total
+        context['facets'] = result.facets
+        context['category_facets'] = sorted(
+            ({'id': pk, 'title': titles.get(pk, ''), 'count': count,
+              'selected': pk in form.cleaned_data['cat']}
+             for pk, count in result.facets['category'].items()),
+            key=lambda item: -item['count'],
+        )
+        context['page'] = result.page
+        context['has_next'] = result.has_next
+        context['querystring'] = query.urlencode()
+        return context
+
+
+class CarFilterJson(CarFilterMixin, View):
+    '''JSON-версия подбора: страница результатов и счётчики фасетов'''
+
+    def get(self, request, *args, **kwargs):
+        form = CarFilterForm(request.GET)
+        if not form.is_valid():
+            return JsonResponse({'errors': form.errors}, status=400)
+        result = self.get_filter_result(form)
+
+        rows = {row['id']: row for row in
+                Cars.objects.filter(pk__in=result.ids).values(*self.result_fields)}
+        results = []
+        for pk in result.ids:
+            row = rows.get(pk)
+            if row is not None:
+                row['url'] = reverse('cars:car_detail', args=[row['slug']])
+                results.append(row)
+        return JsonResponse({
+            'total': result.total,
+            'page': result.page,
+            'has_next': result.has_next,
+            'results': results,
+            'facets': result.facets,
+        })
+
+
+class SearchView(TemplateView):
+    '''Полнотекстовый поиск по машинам и статьям'''
+    template_name = 'cars/search.html'
+    paginate_by = 20
+
+    def get_page_number(self):
+        try:
+            return max(int(self.request.GET.get('page', 1)), 1)
+        except ValueError:
+            return 1
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        query = self.request.GET.get('q', '').strip()
+        kind = 'articles' if self.request.GET.get('type') == 'articles' else 'cars'
+        page = self.get_page_number()
+
+        results, has_next = [], False
+        if query:
+            if kind == 'articles':
+                queryset = Article.objects.filter(is_published=True)
+            else:
+                queryset = Cars.objects.filter(is_active=True).select_related('cat')
+            # Лишняя запись вместо COUNT(*) показывает, есть ли следующая страница
+            offset = (page - 1) * self.paginate_by
+            results = list(search(queryset, query)[offset:offset + self.paginate_by + 1])
+            has_next = len(results) > self.paginate_by
+            results = results[:self.paginate_by]
+
+        context['query'] = query
+        context['kind'] = kind
+        context['results'] = results
+        context['page'] = page
+        context['has_next'] = has_next
+        return context
+
+
+class CarExportView(UserPassesTestMixin, View):
+    '''
+    Выгрузка каталога для персонала (?format=csv|jsonl).
+    Ответ потоковый: строки читаются из БД курсором и отдаются по мере
+    готовности, весь файл в памяти не собирается
+    '''
+    http_method_names = ['get']
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request, *args, **kwargs):
+        fmt = request.GET.get('format', 'csv')
+        if fmt not in catalog_io.FORMATS:
+            fmt = 'csv'
+        content_type = 'application/x-ndjson' if fmt == 'jsonl' else 'text/csv'
+        response = StreamingHttpResponse(
+            catalog_io.serialize(catalog_io.export_rows(), fmt),
+            content_type=f'{content_type}; charset=utf-8',
+        )
+        filename = f"cars-{timezone.now():%Y%m%d}.{fmt}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
@@ -27,6 +27,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'cars.middleware.StaticFilesMiddleware',
+    'cars.query_budget.QueryBudgetMiddleware',
+    'cars.db_router.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -64,9 +67,49 @@ DATABASES = {
         'HOST': os.getenv('HOST'),
         'USER': os.getenv('USER'),
         'PORT': os.getenv('PORT'),
+        # Постоянные соединения с проверкой перед повторным использованием
+        'CONN_MAX_AGE': int(os.getenv('CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Реплики для чтения каталога (cars/db_router.py), через запятую: HOST или HOST:PORT,
+# для SQLite - путь к копии файла БД. В тестах реплики зеркалят основную БД
+DATABASE_REPLICAS = []
+for index, replica in enumerate(filter(None, os.getenv('DB_REPLICAS', '').split(',')), start=1):
+    alias = f'replica{index}'
+    if 'sqlite3' in (DATABASES['default']['ENGINE'] or ''):
+        location = {'NAME': replica.strip()}
+    else:
+        host, _, port = replica.strip().partition(':')
+        location = {'HOST': host, 'PORT': port or DATABASES['default']['PORT']}
+    DATABASES[alias] = {**DATABASES['default'], **location, 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['cars.db_router.ReplicaRouter']
+
+# Сколько секунд после записи клиент читает только с основной БД (и сколько
+# страница, собранная с реплики сразу после изменений, не попадает в кеш)
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 5))
+# Через сколько секунд снова пробовать недоступную реплику
+REPLICA_RETRY_SECONDS = int(os.getenv('REPLICA_RETRY_SECONDS', 30))
+
+# Кеш: по умолчанию в памяти процесса, в продакшене - общий (Redis, Memcached).
+# Кеш страниц (cars/page_cache.py) сбрасывается версиями в кеше, поэтому при
+# нескольких воркерах LocMemCache не годится: изменения увидит только один из них
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'autovault'),
+    }
+}
+
+# Асинхронные версии страниц каталога (cars/async_views.py) - для запуска под ASGI
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', '0') == '1'
+
+# Сколько секунд хранится закешированная страница каталога (cars/page_cache.py).
+# Устаревшие страницы отсекаются версиями моделей, TTL лишь ограничивает объём кеша
+PAGE_CACHE_TIMEOUT = int(os.getenv('PAGE_CACHE_TIMEOUT', 60 * 60))
 
 
 
@@ -99,11 +142,63 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
+# Сюда collectstatic собирает статику с хешами в именах и сжатыми копиями
+STATIC_ROOT = os.getenv('STATIC_ROOT', BASE_DIR / 'staticfiles')
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'cars.storage.CompressedManifestStaticFilesStorage',
+    },
+}
 
 MEDIA_URL = 'media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 AUTH_USER_MODEL = 'auth.User'
+# Пользователь загружается вместе с профилем одним запросом. ModelBackend
+# остаётся в списке: сессии, открытые до его замены, хранят путь этого
+# бэкенда, и без него пользователей выкинуло бы из аккаунта
+AUTHENTICATION_BACKENDS = [
+    'users.backends.ProfileModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
 LOGIN_REDIRECT_URL = 'cars:index'  # Куда перенаправлять после входа
 LOGOUT_REDIRECT_URL = 'cars:index' # Куда перенаправлять после выхода
 LOGIN_URL = 'users:login'          # URL для входа
+
+# Как часто (в секундах) буфер просмотров сбрасывается в БД; 0 - на каждый просмотр
+VIEW_COUNTER_FLUSH_INTERVAL = int(os.getenv('VIEW_COUNTER_FLUSH_INTERVAL', 30))
+
+# Через сколько секунд фасетный индекс перестраивается целиком (изменения из других процессов)
+FACET_INDEX_TTL = int(os.getenv('FACET_INDEX_TTL', 300))
+
+# С какого числа строк (по оценке планировщика PostgreSQL) статистика сайта
+# берёт оценку вместо точного COUNT(*) при пересчёте; 0 - всегда считать точно
+SITE_STATS_ESTIMATE_THRESHOLD = int(os.getenv('SITE_STATS_ESTIMATE_THRESHOLD', 0))
+
+# С какого числа строк список в админке считается большим: число строк
+# берётся из оценки планировщика PostgreSQL, страницы листаются курсором
+ADMIN_LARGE_TABLE_ROWS = int(os.getenv('ADMIN_LARGE_TABLE_ROWS', 10000))
+
+# Сколько машин можно сравнить на одной странице (/compare/)
+COMPARE_MAX_CARS = int(os.getenv('COMPARE_MAX_CARS', 4))
+
+# Версия выкладки: входит в ETag страниц, чтобы после обновления шаблонов
+# браузеры не получали 304 на старую разметку
+RELEASE_VERSION = os.getenv('RELEASE_VERSION', '')
+
+# Сколько похожих машин хранится для каждой машины (cars/similar.py)
+SIMILAR_CARS_COUNT = int(os.getenv('SIMILAR_CARS_COUNT', 8))
+# Память на одну пачку матрицы расстояний при пересчёте похожих машин, МБ
+SIMILAR_CARS_CHUNK_MEMORY_MB = int(os.getenv('SIMILAR_CARS_CHUNK_MEMORY_MB', 256))
+
+# Пороги, после которых запрос страницы попадает в лог cars.query_budget:
+# число SQL-запросов и суммарное время в БД (мс); 0 - не проверять
+QUERY_BUDGET_LOG_QUERIES = int(os.getenv('QUERY_BUDGET_LOG_QUERIES', 30))
+QUERY_BUDGET_LOG_TIME_MS = int(os.getenv('QUERY_BUDGET_LOG_TIME_MS', 500))
+
+# Ширины уменьшенных копий загруженных изображений (cars/renditions.py)
+IMAGE_RENDITION_WIDTHS = (160, 320, 640, 1280)
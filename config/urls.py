@@ -7,6 +7,7 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('cars.urls', namespace='cars')),
     path('users/', include('users.urls', namespace='users')),
+    path('api/v1/', include('cars.api_urls', namespace='api')),
 ]
 
 
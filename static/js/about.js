@@ -0,0 +1,79 @@
+document.addEventListener('DOMContentLoaded', function() {
+    // Анимация счетчиков
+    function animateCounter(element, target, duration = 2000) {
+        let start = 0;
+        const increment = target / (duration / 16);
+        const counter = setInterval(() => {
+            start += increment;
+            if (start >= target) {
+                element.textContent = Math.round(target);
+                clearInterval(counter);
+            } else {
+                element.textContent = Math.round(start);
+            }
+        }, 16);
+    }
+
+    // Анимируем статистику при прокрутке
+    const statsSection = document.querySelector('.stats-section');
+    if (statsSection) {
+        const observer = new IntersectionObserver((entries) => {
+            entries.forEach(entry => {
+                if (entry.isIntersecting) {
+                    const statNumbers = document.querySelectorAll('.stat-number');
+                    statNumbers.forEach(stat => {
+                        const target = parseInt(stat.getAttribute('data-count'));
+                        if (!isNaN(target)) {
+                            stat.textContent = '0';
+                            setTimeout(() => {
+                                animateCounter(stat, target);
+                            }, 300);
+                        }
+                    });
+                    observer.unobserve(entry.target);
+                }
+            });
+        }, { threshold: 0.5 });
+
+        observer.observe(statsSection);
+    }
+
+    // Параллакс эффект для героя
+    const hero = document.querySelector('.about-hero');
+    if (hero) {
+        window.addEventListener('scroll', function() {
+            const scrolled = window.pageYOffset;
+            const rate = scrolled * -0.3;
+            hero.style.backgroundPosition = `center ${rate}px`;
+        });
+    }
+
+    // Анимация карточек при наведении
+    const featureCards = document.querySelectorAll('.feature-card');
+    featureCards.forEach(card => {
+        card.addEventListener('mouseenter', function() {
+            this.style.transform = 'translateY(-15px)';
+        });
+
+        card.addEventListener('mouseleave', function() {
+            this.style.transform = 'translateY(-10px)';
+        });
+    });
+
+    // Плавный скролл к секциям
+    document.querySelectorAll('a[href^="#"]').forEach(anchor => {
+        anchor.addEventListener('click', function(e) {
+            const targetId = this.getAttribute('href');
+            if (targetId.startsWith('#')) {
+                e.preventDefault();
+                const targetElement = document.querySelector(targetId);
+                if (targetElement) {
+                    window.scrollTo({
+                        top: targetElement.offsetTop - 100,
+                        behavior: 'smooth'
+                    });
+                }
+            }
+        });
+    });
+});
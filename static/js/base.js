@@ -0,0 +1,129 @@
+// Эффект навигации при скролле
+window.addEventListener('scroll', function() {
+    const nav = document.getElementById('mainNav');
+    if (window.scrollY > 50) {
+        nav.classList.add('scrolled');
+    } else {
+        nav.classList.remove('scrolled');
+    }
+});
+
+// Анимация появления элементов
+const observer = new IntersectionObserver((entries) => {
+    entries.forEach(entry => {
+        if (entry.isIntersecting) {
+            entry.target.classList.add('animate-in');
+            observer.unobserve(entry.target);
+        }
+    });
+}, {
+    threshold: 0.1,
+    rootMargin: '0px 0px -50px 0px'
+});
+
+// Наблюдаем за всеми карточками, заголовками, стат-картами
+document.querySelectorAll('.card, h1, h2, h3, .stat-card, .animate-on-scroll').forEach(el => {
+    observer.observe(el);
+});
+
+// Анимация параллакса для фона
+document.addEventListener('mousemove', function(e) {
+    const x = e.clientX / window.innerWidth;
+    const y = e.clientY / window.innerHeight;
+
+    document.querySelectorAll('.parallax-element').forEach(el => {
+        const speed = el.dataset.speed || 0.1;
+        const xOffset = (x - 0.5) * 20 * speed;
+        const yOffset = (y - 0.5) * 20 * speed;
+        el.style.transform = `translate(${xOffset}px, ${yOffset}px)`;
+    });
+});
+
+// Анимация чисел в статистике
+function animateCounter(element, target, duration) {
+    let start = 0;
+    const increment = target / (duration / 16);
+    const timer = setInterval(() => {
+        start += increment;
+        if (start >= target) {
+            element.textContent = target + '+';
+            clearInterval(timer);
+        } else {
+            element.textContent = Math.floor(start) + '+';
+        }
+    }, 16);
+}
+
+// Запускаем анимацию счетчиков при скролле
+const counterObserver = new IntersectionObserver((entries) => {
+    entries.forEach(entry => {
+        if (entry.isIntersecting) {
+            const counter = entry.target;
+            const target = parseInt(counter.textContent);
+            animateCounter(counter, target, 2000);
+            counterObserver.unobserve(counter);
+        }
+    });
+}, { threshold: 0.5 });
+
+document.querySelectorAll('.counter').forEach(counter => {
+    counterObserver.observe(counter);
+});
+
+// Эффект набора текста для заголовков
+function typeWriter(element, text, speed = 50) {
+    let i = 0;
+    element.innerHTML = '';
+    function type() {
+        if (i < text.length) {
+            element.innerHTML += text.charAt(i);
+            i++;
+            setTimeout(type, speed);
+        }
+    }
+    type();
+}
+
+// Запускаем для заголовков с классом typewriter
+document.querySelectorAll('.typewriter').forEach(el => {
+    if (el.dataset.text) {
+        typeWriter(el, el.dataset.text);
+    }
+});
+// Лайки: POST на like/unlike, ответ {liked, likes}
+document.addEventListener('click', function(e) {
+    const button = e.target.closest('.like-button');
+    if (!button) return;
+    e.preventDefault();
+    if (button.dataset.loginUrl) {
+        window.location.href = button.dataset.loginUrl;
+        return;
+    }
+    const liked = button.classList.contains('liked');
+    fetch(liked ? button.dataset.unlikeUrl : button.dataset.likeUrl, {
+        method: 'POST',
+        headers: {'X-CSRFToken': document.querySelector('meta[name="csrf-token"]').content},
+        credentials: 'same-origin'
+    })
+        .then(response => response.json())
+        .then(data => {
+            button.classList.toggle('liked', data.liked);
+            const icon = button.querySelector('i');
+            icon.classList.toggle('bi-heart-fill', data.liked);
+            icon.classList.toggle('bi-heart', !data.liked);
+            button.querySelector('.like-count').textContent = data.likes;
+        });
+});
+
+document.addEventListener('DOMContentLoaded', function() {
+const currentPath = window.location.pathname;
+const navLinks = document.querySelectorAll('.nav-link');
+
+navLinks.forEach(link => {
+    const linkPath = link.getAttribute('href');
+    if (currentPath === linkPath ||
+        (linkPath !== '/' && currentPath.startsWith(linkPath))) {
+        link.classList.add('active');
+    }
+});
+});
@@ -0,0 +1,67 @@
+// Функция смены основного изображения
+function changeMainImage(imageUrl) {
+    const mainImage = document.getElementById('mainCarImage');
+    if (mainImage) {
+        // Плавное исчезновение
+        mainImage.style.opacity = '0.5';
+        mainImage.style.transition = 'opacity 0.3s ease';
+
+        setTimeout(() => {
+            mainImage.src = imageUrl;
+            mainImage.style.opacity = '1';
+        }, 300);
+
+        // Убираем активный класс со всех миниатюр
+        document.querySelectorAll('.thumbnail').forEach(thumb => {
+            thumb.classList.remove('active');
+        });
+
+        // Добавляем активный класс к нажатой миниатюре
+        event.target.closest('.thumbnail').classList.add('active');
+    }
+}
+
+// Функция показа всех фото
+function showAllPhotos() {
+    alert('Функция просмотра всех фотографий будет реализована в ближайшее время!');
+    // В будущем можно сделать модальное окно с галереей
+}
+
+// Предзагрузка изображений
+document.addEventListener('DOMContentLoaded', function() {
+    const mainImage = document.getElementById('mainCarImage');
+    if (mainImage) {
+        const img = new Image();
+        img.src = mainImage.src;
+        img.onload = function() {
+            console.log('Основное изображение загружено');
+            mainImage.style.opacity = '1';
+        };
+        img.onerror = function() {
+            mainImage.src = mainImage.dataset.fallback;
+        };
+    }
+
+    // Предзагрузка миниатюр
+    document.querySelectorAll('.thumbnail img').forEach(img => {
+        const preloadImg = new Image();
+        preloadImg.src = img.src;
+    });
+
+    // Анимация при наведении на карточки
+    document.querySelectorAll('.hover-lift').forEach(card => {
+        card.addEventListener('mouseenter', function() {
+            const img = this.querySelector('img');
+            if (img) {
+                img.style.transform = 'scale(1.05)';
+            }
+        });
+
+        card.addEventListener('mouseleave', function() {
+            const img = this.querySelector('img');
+            if (img) {
+                img.style.transform = 'scale(1)';
+            }
+        });
+    });
+});
@@ -0,0 +1,76 @@
+document.addEventListener('DOMContentLoaded', function() {
+    // Параллакс эффект для баннера
+    const banner = document.querySelector('.category-banner');
+    if (banner) {
+        window.addEventListener('scroll', function() {
+            const scrolled = window.pageYOffset;
+            const rate = scrolled * -0.2;
+            banner.style.transform = `translateY(${rate}px) perspective(1000px)`;
+        });
+    }
+
+    // Анимация наведения на карточки
+    const cards = document.querySelectorAll('.category-card');
+    cards.forEach(card => {
+        card.addEventListener('mouseenter', function(e) {
+            const rect = this.getBoundingClientRect();
+            const x = ((e.clientX - rect.left) / this.offsetWidth) - 0.5;
+            const y = ((e.clientY - rect.top) / this.offsetHeight) - 0.5;
+
+            this.style.transform = `
+                translateY(-15px)
+                rotateX(${y * 5}deg)
+                rotateY(${x * 5}deg)
+            `;
+
+            // Эффект светового луча
+            const overlay = this.querySelector('.image-overlay');
+            if (overlay) {
+                overlay.style.background = `
+                    linear-gradient(
+                        ${x * 45 + 45}deg,
+                        transparent 0%,
+                        rgba(139, 92, 246, 0.2) 30%,
+                        rgba(15, 15, 26, 0.9) 100%
+                    )
+                `;
+            }
+        });
+
+        card.addEventListener('mouseleave', function() {
+            this.style.transform = 'translateY(-15px)';
+
+            const overlay = this.querySelector('.image-overlay');
+            if (overlay) {
+                overlay.style.background = '';
+            }
+        });
+    });
+
+    // Анимация счетчиков
+    function animateCounter(element, target, duration = 1500) {
+        let start = 0;
+        const increment = target / (duration / 16);
+        const counter = setInterval(() => {
+            start += increment;
+            if (start >= target) {
+                element.textContent = Math.round(target);
+                clearInterval(counter);
+            } else {
+                element.textContent = Math.round(start);
+            }
+        }, 16);
+    }
+
+    // Анимируем основные счетчики
+    const statsCounters = document.querySelectorAll('.stats-counter');
+    statsCounters.forEach(counter => {
+        const target = parseInt(counter.textContent.replace('+', ''));
+        if (!isNaN(target)) {
+            counter.textContent = '0';
+            setTimeout(() => {
+                animateCounter(counter, target);
+            }, 500);
+        }
+    });
+});
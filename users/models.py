@@ -39,22 +39,29 @@ class Profile(models.Model):
         ordering = ['-created']
 
 
-# Сигналы для автоматического создания профиля при создании пользователя
-@receiver(post_save, sender=User)
-def create_user_profile(sender, instance, created, **kwargs):
+def get_profile(user):
     """
-    Создаем профиль автоматически при создании пользователя
+    Профиль пользователя; если его нет (пользователь создан в обход сигнала,
+    например массовой загрузкой), он создаётся при первом обращении.
+    Бэкенд users.backends.ProfileModelBackend загружает профиль вместе
+    с пользователем, поэтому обычно здесь нет запроса
     """
-    if created:
-        Profile.objects.create(user=instance)
+    try:
+        return user.profile
+    except Profile.DoesNotExist:
+        profile, _ = Profile.objects.get_or_create(user=user)
+        user.profile = profile
+        return profile
 
 
+# Сигнал для автоматического создания профиля при создании пользователя.
+# Отдельного сохранения профиля при каждом сохранении пользователя нет:
+# Django сохраняет пользователя и при каждом входе (last_login), а профиль
+# меняется только через форму профиля
 @receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
+def create_user_profile(sender, instance, created, **kwargs):
     """
-    Сохраняем профиль при сохранении пользователя
+    Создаем профиль автоматически при создании пользователя
     """
-    try:
-        instance.profile.save()
-    except Profile.DoesNotExist:
-        Profile.objects.create(user=instance)
+    if created:
+        Profile.objects.get_or_create(user=instance)
@@ -1,3 +1,78 @@
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from cars.query_budget import track_queries
+from cars.test_utils import QueryBudgetTestCase, seed_catalog
+
+from .models import Profile, get_profile
+
+
+class UsersQueryBudgetTests(QueryBudgetTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('driver', 'driver@example.com', 'secret-pass-123')
+        seed_catalog(3, cls.user)
+
+    def test_anonymous_pages(self):
+        for name, budget in (('register', 0), ('login', 0), ('password_reset', 0)):
+            with self.subTest(page=name):
+                self.assertQueryBudget(reverse(f'users:{name}'), budget)
+
+    def test_profile(self):
+        self.client.force_login(self.user)
+        self.assertQueryBudget(reverse('users:profile'), 3)
+
+    def test_profile_does_not_grow_with_rows(self):
+        self.client.force_login(self.user)
+        before = self.measure(reverse('users:profile')).count
+        seed_catalog(10, self.user, prefix='extra')
+        self.assertEqual(self.measure(reverse('users:profile')).count, before)
+
+    def test_logout(self):
+        self.client.force_login(self.user)
+        # Повторный выход уже ничего не делает, поэтому без прогрева
+        queries = self.assertQueryBudget(reverse('users:logout'), 4, warm_up=False)
+        self.assertGreater(queries.count, 0)
+
+
+class ProfileLifecycleTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('driver', 'driver@example.com', 'secret-pass-123')
+
+    def test_login_does_not_touch_profile(self):
+        with track_queries() as queries:
+            response = self.client.post(reverse('users:login'),
+                                        {'username': 'driver', 'password': 'secret-pass-123'})
+        self.assertRedirects(response, reverse('cars:index'), fetch_redirect_response=False)
+        profile_table = Profile._meta.db_table
+        self.assertFalse([sql for sql in queries.statements if profile_table in sql], queries.summary())
+        # Пользователь, last_login и сессия (с SAVEPOINT внутри транзакции теста);
+        # раньше профиль ещё читался и целиком перезаписывался
+        self.assertLessEqual(queries.count, 9, queries.summary())
+
+    def test_profile_loaded_with_user(self):
+        self.client.force_login(self.user)
+        with track_queries() as queries:
+            response = self.client.get(reverse('users:profile'))
+        self.assertEqual(response.status_code, 200)
+        # Сессия и пользователь вместе с профилем
+        self.assertEqual(queries.count, 2, queries.summary())
+
+    def test_sessions_of_model_backend_stay_logged_in(self):
+        # Сессии, открытые до перехода на ProfileModelBackend
+        self.client.force_login(self.user, backend='django.contrib.auth.backends.ModelBackend')
+        self.assertEqual(self.client.get(reverse('users:profile')).status_code, 200)
+
+    def test_user_save_does_not_save_profile(self):
+        with track_queries() as queries:
+            self.user.save(update_fields=['last_login'])
+        self.assertEqual(queries.count, 1)
+
+    def test_missing_profile_is_created_lazily(self):
+        Profile.objects.filter(user=self.user).delete()
+        user = User.objects.get(pk=self.user.pk)
+        self.assertEqual(get_profile(user).user_id, self.user.pk)
+        self.assertTrue(Profile.objects.filter(user=self.user).exists())
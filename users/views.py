@@ -14,7 +14,7 @@ from .forms import (
     ProfileUpdateForm,
     CustomPasswordChangeForm
 )
-from .models import Profile
+from .models import Profile, get_profile
 
 
 class RegisterView(CreateView):
@@ -107,7 +107,7 @@ class ProfileView(LoginRequiredMixin, TemplateView):
         Получаем данные профиля для отображения
         """
         context = super().get_context_data(**kwargs)
-        context['profile'] = self.request.user.profile
+        context['profile'] = get_profile(self.request.user)
         context['title'] = 'Мой профиль'
         return context
 
@@ -126,7 +126,7 @@ class ProfileUpdateView(LoginRequiredMixin, UpdateView):
         """
         Получаем объект профиля текущего пользователя
         """
-        return self.request.user.profile
+        return get_profile(self.request.user)
 
     def form_valid(self, form):
         """
@@ -162,8 +162,13 @@ class ProfileUpdateView(LoginRequiredMixin, UpdateView):
         """
         Обрабатываем обе формы
         """
-        profile_form.save()
-        user_form.save()
+        # Сохраняем только изменившиеся поля и только изменившиеся записи
+        if profile_form.has_changed():
+            profile = profile_form.save(commit=False)
+            profile.save(update_fields=[*profile_form.changed_data, 'updated'])
+        if user_form.has_changed():
+            user = user_form.save(commit=False)
+            user.save(update_fields=user_form.changed_data)
         messages.success(self.request, 'Профиль успешно обновлен!')
         return redirect(self.success_url)
 